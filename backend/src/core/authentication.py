@@ -0,0 +1,73 @@
+import hashlib
+
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+TOKEN_CACHE_KEY = "auth:token:{digest}"
+TOKEN_CACHE_TIMEOUT = 60
+
+_NOT_AUTHENTICATED = object()
+
+
+def token_cache_key(key):
+    # В кэше хранится только хэш токена, а не сам токен
+    return TOKEN_CACHE_KEY.format(digest=hashlib.sha256(key.encode()).hexdigest())
+
+
+def invalidate_token(key):
+    cache.delete(token_cache_key(key))
+
+
+def invalidate_user_tokens(user_id):
+    for key in Token.objects.filter(user_id=user_id).values_list("key", flat=True):
+        invalidate_token(key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+        TokenAuthentication с кэшированием
+
+        Особенности:
+            - Результат запоминается на HttpRequest: middleware и DRF в одном запросе
+              проверяют токен один раз (ошибка аутентификации запоминается так же)
+            - Пара (user, token) вместе с профилем пользователя хранится в кэше TOKEN_CACHE_TIMEOUT секунд
+            - Кэш сбрасывается при удалении токена (выход из системы) и изменении пользователя или профиля
+              (сигналы в users.models)
+    """
+
+    def authenticate(self, request):
+        http_request = getattr(request, "_request", request)
+
+        result = getattr(http_request, "_token_auth_result", _NOT_AUTHENTICATED)
+        if result is _NOT_AUTHENTICATED:
+            try:
+                result = super().authenticate(request)
+            except exceptions.AuthenticationFailed as exc:
+                result = exc
+            http_request._token_auth_result = result
+
+        if isinstance(result, exceptions.AuthenticationFailed):
+            raise result
+        return result
+
+    def authenticate_credentials(self, key):
+        cache_key = token_cache_key(key)
+
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        try:
+            token = self.get_model().objects.select_related("user__profile").get(key=key)
+        except self.get_model().DoesNotExist:
+            raise exceptions.AuthenticationFailed(_("Invalid token."))
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_("User inactive or deleted."))
+
+        result = (token.user, token)
+        cache.set(cache_key, result, TOKEN_CACHE_TIMEOUT)
+        return result
@@ -0,0 +1,312 @@
+import logging
+import os
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger("cache")
+
+_MISSING = object()
+
+# Состояние уровней кэша общее для всех потоков процесса (экземпляры бэкенда Django создаёт на поток)
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+
+class LocalLRU:
+    """
+        Потокобезопасный LRU-словарь процесса с временем жизни записей
+
+        Значения хранятся в pickle, чтобы изменение полученного объекта не портило кэш
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False, None
+            expires, payload = entry
+            if expires is not None and expires <= time.monotonic():
+                del self._data[key]
+                return False, None
+            self._data.move_to_end(key)
+        return True, pickle.loads(payload)
+
+    def set(self, key, value, ttl):
+        if ttl is not None and ttl <= 0:
+            self.delete(key)
+            return
+        payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        expires = None if ttl is None else time.monotonic() + ttl
+        with self._lock:
+            self._data[key] = (expires, payload)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class RedisInvalidationBus:
+    """
+        Рассылка инвалидаций L1 между воркерами через Redis Pub/Sub
+
+        Каждый процесс публикует изменённые ключи и слушает канал в фоновом потоке;
+        свои сообщения процесс пропускает по идентификатору отправителя.
+        L1 очищается целиком при обрыве подписки и при её восстановлении (сообщения за время
+        обрыва потеряны), но не на каждой попытке переподключения: пока Redis недоступен,
+        L1 работает с FALLBACK_TIMEOUT
+    """
+    reconnect_interval = 5
+
+    def __init__(self, location, channel, on_invalidate):
+        import redis
+
+        self.client = redis.Redis.from_url(location, socket_connect_timeout=0.5, socket_timeout=0.5)
+        self.channel = channel
+        self.on_invalidate = on_invalidate
+        self.sender = uuid.uuid4().hex
+        threading.Thread(target=self._listen, name="cache-invalidation", daemon=True).start()
+
+    def publish(self, key):
+        try:
+            self.client.publish(self.channel, f"{self.sender} {key}")
+        except Exception as exc:
+            logger.warning("Не удалось разослать инвалидацию %s: %s", key, exc)
+
+    def _listen(self):
+        failed = False
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                if failed:
+                    self.on_invalidate(None)
+                    failed = False
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is None:
+                        continue
+                    sender, _, key = message["data"].decode().partition(" ")
+                    if sender != self.sender:
+                        self.on_invalidate(key)
+            except Exception as exc:
+                if not failed:
+                    logger.warning("Подписка на инвалидации кэша прервана: %s", exc)
+                    self.on_invalidate(None)
+                    failed = True
+                time.sleep(self.reconnect_interval)
+
+
+class _TierState:
+    def __init__(self, max_entries):
+        self.local = LocalLRU(max_entries)
+        self.shared_down_until = 0.0
+        self.bus = None
+        self.bus_pid = None
+
+    def invalidate(self, key):
+        if key is None or key == "*":
+            self.local.clear()
+        else:
+            self.local.delete(key)
+
+
+class TieredCache(BaseCache):
+    """
+        Двухуровневый кэш: LRU в памяти воркера (L1) перед общим сетевым кэшем (L2)
+
+        Параметры OPTIONS:
+            - SHARED_ALIAS (str): Алиас общего кэша в CACHES (Redis в продакшене, LocMem в тестах)
+            - MAX_ENTRIES (int): Размер L1
+            - LOCAL_TIMEOUT (int): Время жизни записи L1, пока общий кэш доступен
+            - FALLBACK_TIMEOUT (int): Предельное время жизни записи, когда общий кэш недоступен
+            - RETRY_INTERVAL (int): Через сколько секунд снова пробовать общий кэш после ошибки
+            - BUS (str | None): Класс рассылки инвалидаций; по умолчанию Redis Pub/Sub,
+              если общий кэш - RedisCache, иначе рассылки нет и согласованность держится на LOCAL_TIMEOUT
+
+        Примечания:
+            - Запись идёт в L2, а изменённый ключ рассылается остальным воркерам для удаления из L1
+            - При недоступности L2 кэш продолжает работать только на L1 (без согласования между воркерами)
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self.location = location
+        self.shared_alias = options.get("SHARED_ALIAS", "shared")
+        self.local_timeout = options.get("LOCAL_TIMEOUT", 5)
+        self.fallback_timeout = options.get("FALLBACK_TIMEOUT", 120)
+        self.retry_interval = options.get("RETRY_INTERVAL", 30)
+        self.channel = options.get("CHANNEL", f"cache-invalidate:{location}")
+        self.bus_class = options.get("BUS", _MISSING)
+
+        with _tiers_lock:
+            if location not in _tiers:
+                _tiers[location] = _TierState(self._max_entries)
+            self.state = _tiers[location]
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    def _get_bus(self):
+        state = self.state
+        # После fork у воркера gunicorn свой поток-подписчик
+        if state.bus_pid == os.getpid():
+            return state.bus
+
+        with _tiers_lock:
+            if state.bus_pid != os.getpid():
+                state.bus = self._create_bus()
+                state.bus_pid = os.getpid()
+        return state.bus
+
+    def _create_bus(self):
+        shared_config = settings.CACHES[self.shared_alias]
+        bus_class = self.bus_class
+        if bus_class is _MISSING:
+            redis_backend = shared_config["BACKEND"].endswith("RedisCache")
+            bus_class = RedisInvalidationBus if redis_backend else None
+        if bus_class is None:
+            return None
+        if isinstance(bus_class, str):
+            bus_class = import_string(bus_class)
+
+        location = shared_config.get("LOCATION")
+        if isinstance(location, (list, tuple)):
+            location = location[0]
+        try:
+            return bus_class(location, self.channel, self.state.invalidate)
+        except Exception as exc:
+            logger.warning("Рассылка инвалидаций кэша недоступна: %s", exc)
+            return None
+
+    def _publish(self, key):
+        bus = self._get_bus()
+        if bus is not None:
+            bus.publish(key)
+
+    def _call_shared(self, method, *args, **kwargs):
+        """Вызов L2; при ошибке L2 считается недоступным на RETRY_INTERVAL секунд"""
+        if time.monotonic() < self.state.shared_down_until:
+            return False, None
+        try:
+            return True, getattr(self.shared, method)(*args, **kwargs)
+        except ValueError:
+            # Ошибка данных (например, incr несуществующего ключа), а не недоступность L2
+            raise
+        except Exception as exc:
+            logger.warning("Общий кэш недоступен, работаем только с локальным: %s", exc)
+            self.state.shared_down_until = time.monotonic() + self.retry_interval
+            return False, None
+
+    def _local_ttl(self, timeout, shared_ok):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        limit = self.local_timeout if shared_ok else self.fallback_timeout
+        if timeout is None:
+            return limit
+        return min(timeout, limit)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        ok, added = self._call_shared("add", key, value, timeout, version=version)
+        if not ok:
+            found, _ = self.state.local.get(local_key)
+            if found:
+                return False
+            added = True
+        if added:
+            self.state.local.set(local_key, value, self._local_ttl(timeout, ok))
+            if ok:
+                self._publish(local_key)
+        return added
+
+    def get(self, key, default=None, version=None):
+        # Подписка на инвалидации должна работать до первого чтения в L1
+        self._get_bus()
+        local_key = self.make_and_validate_key(key, version=version)
+        found, value = self.state.local.get(local_key)
+        if found:
+            return value
+
+        ok, value = self._call_shared("get", key, _MISSING, version=version)
+        if not ok or value is _MISSING:
+            return default
+
+        self.state.local.set(local_key, value, self.local_timeout)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        ok, _ = self._call_shared("set", key, value, timeout, version=version)
+        self.state.local.set(local_key, value, self._local_ttl(timeout, ok))
+        if ok:
+            self._publish(local_key)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        ok, touched = self._call_shared("touch", key, timeout, version=version)
+        if ok:
+            return touched
+        found, value = self.state.local.get(local_key)
+        if found:
+            self.state.local.set(local_key, value, self._local_ttl(timeout, ok))
+        return found
+
+    def delete(self, key, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        ok, deleted = self._call_shared("delete", key, version=version)
+        deleted_locally = self.state.local.delete(local_key)
+        if ok:
+            self._publish(local_key)
+            return deleted
+        return deleted_locally
+
+    def has_key(self, key, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        found, _ = self.state.local.get(local_key)
+        if found:
+            return True
+        ok, exists = self._call_shared("has_key", key, version=version)
+        return bool(ok and exists)
+
+    def incr(self, key, delta=1, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        ok, value = self._call_shared("incr", key, delta, version=version)
+        if ok:
+            self.state.local.delete(local_key)
+            self._publish(local_key)
+            return value
+
+        found, value = self.state.local.get(local_key)
+        if not found:
+            raise ValueError("Key '%s' not found" % key)
+        value += delta
+        self.state.local.set(local_key, value, self.fallback_timeout)
+        return value
+
+    def clear(self):
+        ok, _ = self._call_shared("clear")
+        self.state.local.clear()
+        if ok:
+            self._publish("*")
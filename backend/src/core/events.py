@@ -0,0 +1,139 @@
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger("events")
+
+DEFAULT_BUS = {"BACKEND": "core.events.InProcessEventBus"}
+
+_bus = None
+_bus_lock = threading.Lock()
+
+
+class InProcessSubscription:
+    def __init__(self, bus, channel, max_queued):
+        self.bus = bus
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=max_queued)
+
+    def offer(self, data):
+        # Выполняется в цикле событий подписчика; медленный подписчик теряет новые сообщения
+        if not self.queue.full():
+            self.queue.put_nowait(data)
+
+    async def get(self, timeout):
+        """Следующее сообщение или None, если за timeout секунд сообщений не было"""
+        try:
+            data = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        return json.loads(data)
+
+    async def close(self):
+        self.bus.unsubscribe(self)
+
+
+class InProcessEventBus:
+    """
+        Шина событий внутри одного процесса
+
+        Подходит для разработки и тестов: публикация и подписка должны идти в одном процессе
+    """
+    max_queued = 100
+
+    def __init__(self, location=None):
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def publish(self, channel, message):
+        data = json.dumps(message)
+        with self._lock:
+            subscriptions = list(self._subscriptions[channel])
+        for subscription in subscriptions:
+            # publish вызывается из потоков синхронных представлений
+            subscription.loop.call_soon_threadsafe(subscription.offer, data)
+
+    async def subscribe(self, channel):
+        subscription = InProcessSubscription(self, channel, self.max_queued)
+        with self._lock:
+            self._subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions[subscription.channel]
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.channel]
+
+
+class RedisSubscription:
+    def __init__(self, client, pubsub):
+        self.client = client
+        self.pubsub = pubsub
+
+    async def get(self, timeout):
+        """Следующее сообщение или None, если за timeout секунд сообщений не было"""
+        message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        if message is None:
+            return None
+        return json.loads(message["data"])
+
+    async def close(self):
+        await self.pubsub.aclose()
+        await self.client.aclose()
+
+
+class RedisEventBus:
+    """
+        Шина событий через Redis Pub/Sub: публикуют WSGI-воркеры, слушают ASGI-процессы
+
+        Ошибка публикации только логируется: событие - подсказка клиенту обновить данные,
+        а не единственный способ их получить
+    """
+
+    def __init__(self, location):
+        import redis
+
+        self.location = location
+        self.client = redis.Redis.from_url(location, socket_connect_timeout=0.5, socket_timeout=0.5)
+
+    def publish(self, channel, message):
+        try:
+            self.client.publish(channel, json.dumps(message))
+        except Exception as exc:
+            logger.warning("Не удалось опубликовать событие в %s: %s", channel, exc)
+
+    async def subscribe(self, channel):
+        import redis.asyncio
+
+        client = redis.asyncio.Redis.from_url(self.location)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(channel)
+        return RedisSubscription(client, pubsub)
+
+
+def get_event_bus():
+    """Шина из settings.EVENT_BUS ({"BACKEND": ..., "LOCATION": ...}), одна на процесс"""
+    global _bus
+    if _bus is None:
+        with _bus_lock:
+            if _bus is None:
+                config = getattr(settings, "EVENT_BUS", DEFAULT_BUS)
+                _bus = import_string(config["BACKEND"])(config.get("LOCATION"))
+    return _bus
+
+
+@receiver(setting_changed)
+def reset_event_bus(setting, **kwargs):
+    global _bus
+    if setting == "EVENT_BUS":
+        _bus = None
@@ -0,0 +1,126 @@
+import os
+import queue
+import threading
+import time
+from logging.handlers import TimedRotatingFileHandler
+
+
+class AsyncBatchFileHandler(TimedRotatingFileHandler):
+    """
+        Файловый лог с ежедневной ротацией, который пишется фоновым потоком пачками
+
+        Особенности:
+            - emit только кладёт запись в ограниченную очередь и не блокирует поток запроса:
+              файл (запись, ротация, flush) защищён своей блокировкой _io_lock, а не блокировкой
+              Handler, которую logging держит на время emit
+            - фоновый поток забирает до batch_size записей (или ждёт flush_interval секунд),
+              пишет их в файл и делает один flush на пачку
+            - при переполнении очереди новые записи отбрасываются; число отброшенных
+              попадает в счётчики и периодически пишется в тот же файл
+
+        Счётчики (stats()):
+            - accepted: записей принято в очередь
+            - dropped: записей отброшено из-за переполнения
+            - written: записей записано в файл
+    """
+
+    def __init__(self, filename, queue_size=10000, batch_size=200, flush_interval=1.0, **kwargs):
+        super().__init__(filename, **kwargs)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.accepted = 0
+        self.dropped = 0
+        self.written = 0
+        self._reported_dropped = 0
+        self._writer = None
+        self._writer_pid = None
+        self._writer_lock = threading.Lock()
+        self._io_lock = threading.RLock()
+        self._stopping = threading.Event()
+
+    def stats(self):
+        return {
+            "accepted": self.accepted,
+            "dropped": self.dropped,
+            "written": self.written,
+            "queued": self.queue.qsize(),
+        }
+
+    def emit(self, record):
+        self._ensure_writer()
+        try:
+            self.queue.put_nowait(record)
+            self.accepted += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_writer(self):
+        # Поток создаётся лениво: после fork у каждого воркера gunicorn должен быть свой
+        if self._writer_pid == os.getpid():
+            return
+        with self._writer_lock:
+            if self._writer_pid != os.getpid():
+                self._writer = threading.Thread(target=self._run, name="request-log-writer", daemon=True)
+                self._writer.start()
+                self._writer_pid = os.getpid()
+
+    def _run(self):
+        while not self._stopping.is_set() or not self.queue.empty():
+            batch = self._take_batch()
+            if batch:
+                self._write_batch(batch)
+
+    def _take_batch(self):
+        try:
+            batch = [self.queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write_batch(self, batch):
+        with self._io_lock:
+            for record in batch:
+                try:
+                    if self.shouldRollover(record):
+                        self.doRollover()
+                    if self.stream is None:
+                        self.stream = self._open()
+                    self.stream.write(self.format(record) + self.terminator)
+                    self.written += 1
+                except Exception:
+                    self.handleError(record)
+
+            dropped = self.dropped
+            if dropped != self._reported_dropped and self.stream is not None:
+                self.stream.write(
+                    f"{time.strftime('%Y-%m-%d %H:%M:%S')} - request log overflow: "
+                    f"dropped {dropped - self._reported_dropped} records (total {dropped}){self.terminator}"
+                )
+                self._reported_dropped = dropped
+
+            if self.stream is not None:
+                self.stream.flush()
+
+    def flush(self):
+        with self._io_lock:
+            if self.stream is not None:
+                self.stream.flush()
+
+    def close(self):
+        # Дописываем очередь перед закрытием файла (logging.shutdown при остановке воркера)
+        self._stopping.set()
+        if self._writer is not None and self._writer_pid == os.getpid():
+            self._writer.join(timeout=5)
+        with self._io_lock:
+            super().close()
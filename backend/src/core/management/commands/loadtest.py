@@ -0,0 +1,161 @@
+import http.client
+import os
+import statistics
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Самые частые чтения API: именно они переведены на асинхронные представления
+DEFAULT_PATHS = [
+    "/api/monitoring/indicators/current/",
+    "/api/reflection/questions/",
+    "/api/route/modules/",
+    "/api/main/random-quote/",
+    "/api/main/current/",
+]
+
+RSS_SAMPLE_INTERVAL = 0.5
+
+
+def process_tree_rss(pid):
+    """Суммарный RSS процесса и всех его потомков в КиБ (по /proc, только Linux)"""
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/status") as status:
+                for line in status:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1])
+                        break
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as children:
+                    pending.extend(int(child) for child in children.read().split())
+        except (FileNotFoundError, ProcessLookupError):
+            continue
+    return total
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный тест чтений API: concurrency клиентов с keep-alive в течение duration секунд. "
+        "Печатает пропускную способность, задержки и, с --pid, пиковую память сервера. "
+        "Для сравнения режимов запускается против WSGI и ASGI с одинаковым числом воркеров"
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://localhost:8000")
+        parser.add_argument("--token", default=os.environ.get("LOADTEST_TOKEN"),
+                            help="Токен пользователя (или переменная LOADTEST_TOKEN)")
+        parser.add_argument("--path", action="append", dest="paths",
+                            help="Путь для запросов, можно несколько раз (по умолчанию самые частые чтения)")
+        parser.add_argument("--concurrency", type=int, default=50)
+        parser.add_argument("--duration", type=float, default=30)
+        parser.add_argument("--timeout", type=float, default=30)
+        parser.add_argument("--pid", type=int,
+                            help="PID мастер-процесса сервера (gunicorn/uvicorn) для замера памяти")
+
+    def handle(self, *args, **options):
+        if not options["token"]:
+            raise CommandError("Нужен токен: --token или LOADTEST_TOKEN")
+
+        url = urlsplit(options["base_url"])
+        paths = options["paths"] or DEFAULT_PATHS
+        headers = {"Authorization": f"Token {options['token']}"}
+        deadline = time.monotonic() + options["duration"]
+
+        latencies = defaultdict(list)
+        errors = defaultdict(int)
+        lock = threading.Lock()
+
+        def client(number):
+            connection_class = http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection
+            connection = connection_class(url.hostname, url.port, timeout=options["timeout"])
+            # Клиенты начинают с разных путей, чтобы нагрузка распределялась равномерно
+            step = number
+            while time.monotonic() < deadline:
+                path = paths[step % len(paths)]
+                step += 1
+                started = time.perf_counter()
+                try:
+                    connection.request("GET", path, headers=headers)
+                    response = connection.getresponse()
+                    response.read()
+                    ok = response.status < 400
+                except (OSError, http.client.HTTPException):
+                    connection.close()
+                    ok = False
+                elapsed = time.perf_counter() - started
+
+                with lock:
+                    if ok:
+                        latencies[path].append(elapsed)
+                    else:
+                        errors[path] += 1
+            connection.close()
+
+        peak_rss = 0
+        stop_sampling = threading.Event()
+
+        def sample_rss():
+            nonlocal peak_rss
+            while not stop_sampling.wait(RSS_SAMPLE_INTERVAL):
+                peak_rss = max(peak_rss, process_tree_rss(options["pid"]))
+
+        sampler = None
+        if options["pid"]:
+            sampler = threading.Thread(target=sample_rss, daemon=True)
+            sampler.start()
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as executor:
+            for future in [executor.submit(client, number) for number in range(options["concurrency"])]:
+                future.result()
+        elapsed = time.monotonic() - started
+
+        if sampler is not None:
+            stop_sampling.set()
+            sampler.join()
+
+        self.report(paths, latencies, errors, elapsed, options, peak_rss)
+
+    def report(self, paths, latencies, errors, elapsed, options, peak_rss):
+        self.stdout.write(
+            f"{options['base_url']}: {options['concurrency']} клиентов, {elapsed:.1f} с\n"
+        )
+        self.stdout.write(f"{'path':<40} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+
+        total = []
+        for path in paths:
+            values = latencies[path]
+            total.extend(values)
+            self.stdout.write(self.row(path, values, errors[path], elapsed))
+
+        self.stdout.write(self.row("total", total, sum(errors.values()), elapsed))
+        if total:
+            self.stdout.write(f"mean latency: {statistics.mean(total) * 1000:.1f} ms")
+        if peak_rss:
+            self.stdout.write(f"peak RSS (pid {options['pid']} с потомками): {peak_rss / 1024:.1f} МиБ")
+
+    @staticmethod
+    def row(path, values, error_count, elapsed):
+        return (
+            f"{path:<40} {len(values) / elapsed:>8.1f} "
+            f"{percentile(values, 0.5) * 1000:>8.1f} "
+            f"{percentile(values, 0.95) * 1000:>8.1f} "
+            f"{percentile(values, 0.99) * 1000:>8.1f} "
+            f"{error_count:>7}"
+        )
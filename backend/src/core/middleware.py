@@ -1,19 +1,95 @@
 import logging
-from rest_framework.authentication import TokenAuthentication
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import connections
+from rest_framework.exceptions import AuthenticationFailed
+
+from core.authentication import CachedTokenAuthentication
 
 logger = logging.getLogger('request_logger')
 
+
+class QueryCounter:
+    """Счётчик SQL-запросов через execute_wrapper (работает и без DEBUG)"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def count_queries(stack, counter):
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(counter))
+
+
 class RequestLoggingMiddleware:
+    """
+        Журнал запросов: пользователь, статус, длительность и число SQL-запросов
+
+        Работает и под WSGI, и под ASGI: в асинхронном режиме асинхронные представления
+        не переводятся в поток ради middleware
+    """
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
-        self.token_auth = TokenAuthentication()
+        self.token_auth = CachedTokenAuthentication()
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
 
     def __call__(self, request):
-        user_auth_tuple = self.token_auth.authenticate(request)
+        if self.async_mode:
+            return self.__acall__(request)
+
+        self.authenticate(request)
+
+        counter = QueryCounter()
+        started = time.perf_counter()
+
+        with ExitStack() as stack:
+            count_queries(stack, counter)
+            response = self.get_response(request)
+
+        self.log(request, response, counter, started)
+        return response
+
+    async def __acall__(self, request):
+        await sync_to_async(self.authenticate)(request)
+
+        counter = QueryCounter()
+        started = time.perf_counter()
+
+        # Соединения с БД у каждого потока свои; синхронный код и асинхронный ORM
+        # в рамках запроса выполняются в одном потоке, обёртка ставится на его соединения
+        stack = ExitStack()
+        await sync_to_async(count_queries)(stack, counter)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+
+        self.log(request, response, counter, started)
+        return response
+
+    def authenticate(self, request):
+        # Результат запоминается на запросе, DRF повторно токен не проверяет
+        try:
+            user_auth_tuple = self.token_auth.authenticate(request)
+        except AuthenticationFailed:
+            # Ответ 401 сформирует DRF при обработке запроса
+            user_auth_tuple = None
         if user_auth_tuple is not None:
             request.user, _ = user_auth_tuple
 
-        response = self.get_response(request)
+    def log(self, request, response, counter, started):
+        duration_ms = (time.perf_counter() - started) * 1000
 
         user = (
             request.user.username
@@ -23,17 +99,18 @@ class RequestLoggingMiddleware:
 
         ip = self.get_client_ip(request)
 
+        # Запись только ставится в очередь, в файл её пишет фоновый поток (core.log_handlers)
         logger.info('', extra={
             'user': user,
             'ip': ip,
             'path': request.path,
-            'status': response.status_code
+            'status': response.status_code,
+            'duration_ms': round(duration_ms, 1),
+            'queries': counter.count,
         })
 
-        return response
-
     def get_client_ip(self, request):
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
         if x_forwarded_for:
             return x_forwarded_for.split(',')[0]
-        return request.META.get('REMOTE_ADDR')
\ No newline at end of file
+        return request.META.get('REMOTE_ADDR')
@@ -0,0 +1,224 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import date, datetime
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetCursorPagination(BasePagination):
+    """
+        Курсорная (keyset) пагинация по составному ключу сортировки
+
+        Особенности:
+            - Ключ сортировки берётся из OrderingFilter представления (если он подключён),
+              иначе из view.ordering или из атрибута ordering пагинатора
+            - К ключу всегда добавляется поле-разрешитель (по умолчанию id), поэтому
+              записи с одинаковыми created_at / title не теряются и не дублируются
+            - Курсор непрозрачный: base64 от JSON со значениями ключа последней записи
+            - Страница выбирается условием WHERE (key) > (cursor) LIMIT n,
+              поэтому N-я страница стоит столько же, сколько первая
+
+        Примечания:
+            - Поля сортировки должны быть NOT NULL, иначе условие по ключу теряет строки
+            - tiebreaker = None допустим, только если ключ сортировки сам уникален
+              в выборке (например, .values('period').distinct()), иначе записи
+              с одинаковым ключом на границе страниц теряются
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    ordering = ('-created_at',)
+    tiebreaker = 'id'
+    invalid_cursor_message = 'Некорректный курсор'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        position, reverse = self.decode_cursor(request)
+
+        if reverse:
+            queryset = queryset.order_by(*[_invert(field) for field in self.ordering])
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if position is not None:
+            try:
+                queryset = queryset.filter(self.get_keyset_filter(position, reverse))
+            except (ValidationError, TypeError, ValueError):
+                # Значение курсора не подходит к типу поля сортировки (строка вместо даты и т.п.)
+                raise NotFound(self.invalid_cursor_message)
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        return self.page
+
+    def get_page_size(self, request):
+        value = request.query_params.get(self.page_size_query_param)
+        if value is None:
+            return self.page_size
+        try:
+            size = int(value)
+        except ValueError:
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def get_ordering(self, request, queryset, view):
+        ordering = None
+
+        for backend in getattr(view, 'filter_backends', []):
+            if issubclass(backend, OrderingFilter):
+                ordering = backend().get_ordering(request, queryset, view)
+                break
+
+        if not ordering:
+            ordering = getattr(view, 'ordering', None) or self.ordering
+
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+
+        ordering = [field for field in ordering if field.lstrip('-') != self.tiebreaker]
+        last_desc = ordering[-1].startswith('-') if ordering else False
+        if self.tiebreaker:
+            ordering.append(f"-{self.tiebreaker}" if last_desc else self.tiebreaker)
+
+        return ordering
+
+    def get_keyset_filter(self, position, reverse):
+        """
+            Строит условие (f1 > v1) OR (f1 = v1 AND f2 > v2) OR ... для ключа сортировки
+        """
+        condition = Q()
+        equal = Q()
+
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            descending = field.startswith('-') != reverse
+            lookup = 'lt' if descending else 'gt'
+
+            condition |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+
+        return condition
+
+    def get_position(self, obj):
+        position = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            value = obj[name] if isinstance(obj, dict) else getattr(obj, name)
+            if isinstance(value, (datetime, date)):
+                value = value.isoformat()
+            position.append(value)
+        return position
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+
+        try:
+            padding = '=' * (-len(encoded) % 4)
+            payload = json.loads(urlsafe_b64decode(encoded + padding).decode('utf-8'))
+            position = payload['p']
+            reverse = bool(payload.get('r', 0))
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        if any(isinstance(value, (list, dict)) for value in position):
+            raise NotFound(self.invalid_cursor_message)
+
+        return position, reverse
+
+    def encode_cursor(self, position, reverse):
+        payload = {'p': position}
+        if reverse:
+            payload['r'] = 1
+        encoded = urlsafe_b64encode(
+            json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        ).decode('ascii').rstrip('=')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.get_position(self.page[-1]), reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.get_position(self.page[0]), reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {
+                    'type': 'string',
+                    'nullable': True,
+                    'format': 'uri',
+                    'example': f'http://api.example.org/accounts/?{self.cursor_query_param}=eyJwIjpbXX0',
+                },
+                'previous': {
+                    'type': 'string',
+                    'nullable': True,
+                    'format': 'uri',
+                    'example': f'http://api.example.org/accounts/?{self.cursor_query_param}=eyJwIjpbXX0',
+                },
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Курсор страницы',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': f'Количество записей на странице (не более {self.max_page_size})',
+                'schema': {'type': 'integer'},
+            },
+        ]
+
+
+def _invert(field):
+    return field[1:] if field.startswith('-') else f"-{field}"
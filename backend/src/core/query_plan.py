@@ -0,0 +1,55 @@
+from django.db.models import Prefetch
+from rest_framework.serializers import BaseSerializer, ListSerializer
+
+
+def plan_queryset(queryset, serializer_class, prefix=''):
+    """
+        Применяет к queryset select_related/prefetch_related, необходимые сериализатору
+
+        Источники требований:
+            - атрибуты сериализатора select_related_fields / prefetch_related_fields
+              (для полей вида ReadOnlyField(source='author.username'), которые нельзя вывести автоматически)
+            - вложенные сериализаторы: одиночные (FK) подтягиваются через select_related,
+              many=True - через Prefetch с queryset, к которому план применяется рекурсивно
+
+        Итог: дерево любого размера загружается за число запросов,
+        равное числу many-уровней вложенности + 1
+    """
+    select = [prefix + name for name in getattr(serializer_class, 'select_related_fields', ())]
+    prefetch = [prefix + name for name in getattr(serializer_class, 'prefetch_related_fields', ())]
+
+    for name, field in getattr(serializer_class, '_declared_fields', {}).items():
+        if not isinstance(field, BaseSerializer):
+            continue
+
+        source = field.source or name
+        if source == '*':
+            continue
+        lookup = prefix + source.replace('.', '__')
+
+        if isinstance(field, ListSerializer):
+            child_class = type(field.child)
+            model = getattr(getattr(child_class, 'Meta', None), 'model', None)
+            if model is None:
+                prefetch.append(lookup)
+                continue
+            prefetch.append(Prefetch(lookup, queryset=plan_queryset(model._default_manager.all(), child_class)))
+        else:
+            select.append(lookup)
+            queryset = plan_queryset(queryset, type(field), prefix=lookup + '__')
+
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset
+
+
+class QueryPlanMixin:
+    """
+        Миксин для GenericAPIView: get_queryset автоматически дополняется планом выборки
+        из сериализатора представления (см. plan_queryset)
+    """
+
+    def get_queryset(self):
+        return plan_queryset(super().get_queryset(), self.get_serializer_class())
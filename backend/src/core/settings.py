@@ -58,13 +58,14 @@ INSTALLED_APPS = [
     'main',
     'reflection',
     'practicum',
-    'monitoring'
+    'monitoring',
+    'media',
 ]
 
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_AUTHENTICATION_CLASSES': [  # Аутентификация
-        'rest_framework.authentication.TokenAuthentication',  # Для Android
+        'core.authentication.CachedTokenAuthentication',  # Для Android
         'rest_framework.authentication.SessionAuthentication',  # Для Web'а
     ],
 }
@@ -81,11 +82,33 @@ MIDDLEWARE = [
     'core.middleware.RequestLoggingMiddleware'
 ]
 
+# Двухуровневый кэш: небольшой LRU в памяти воркера перед общим Redis.
+# Без Redis (локальная разработка) кэш работает только на локальном уровне
 CACHES = {
     "default": {
-        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
-        "LOCATION": "unique-snowflake",
-    }
+        "BACKEND": "core.cache.TieredCache",
+        "LOCATION": "default",
+        "OPTIONS": {
+            "SHARED_ALIAS": "shared",
+            "MAX_ENTRIES": 1000,
+            "LOCAL_TIMEOUT": 5,
+            "FALLBACK_TIMEOUT": 120,
+        },
+    },
+    "shared": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": env('REDIS_URL', default='redis://redis:6379/1'),
+        "OPTIONS": {
+            "socket_connect_timeout": 0.5,
+            "socket_timeout": 0.5,
+        },
+    },
+}
+
+# Шина событий (core.events): WSGI-воркеры публикуют, ASGI-процесс (core.asgi) отдаёт события клиентам
+EVENT_BUS = {
+    "BACKEND": "core.events.RedisEventBus",
+    "LOCATION": env('REDIS_URL', default='redis://redis:6379/1'),
 }
 
 ROOT_URLCONF = 'core.urls'
@@ -111,6 +134,9 @@ DATABASES = {
     'default': env.db(),
 }
 
+# Миграции созданы с BigAutoField (значение по умолчанию Django 6); явно - для совпадения на любой версии
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
 # TODO добавить bcrypt
 
 # гуглить PwnedPasswordValidator
@@ -143,6 +169,16 @@ STATIC_ROOT = '/var/www/static/'
 MEDIA_URL = 'media/'
 MEDIA_ROOT = '/var/www/media/'
 
+# Закрытые файлы (library.downloads) после проверки прав отдаёт nginx: internal-location с этим префиксом.
+# Пустое значение - файл отдаёт сам Django (разработка без прокси)
+MEDIA_ACCEL_REDIRECT = env('MEDIA_ACCEL_REDIRECT', default='' if DEBUG else '/protected/')
+
+# Те же обработчики, что по умолчанию, но с подсчётом SHA-256 при приёме (см. library.storage)
+FILE_UPLOAD_HANDLERS = [
+    'core.upload_handlers.HashingMemoryFileUploadHandler',
+    'core.upload_handlers.HashingTemporaryFileUploadHandler',
+]
+
 SPECTACULAR_SETTINGS = {
     'APPEND_COMPONENTS': {
         "securitySchemes": {
@@ -164,19 +200,22 @@ LOGGING = {
     'disable_existing_loggers': False,
     'formatters': {
         'request_formatter': {
-            'format': '{asctime} - {user} - {ip} - {path} - {status}',
+            'format': '{asctime} - {user} - {ip} - {path} - {status} - {duration_ms}ms - {queries}q',
             'style': '{',
         },
     },
     'handlers': {
         'daily_file': {
             'level': 'INFO',
-            'class': 'logging.handlers.TimedRotatingFileHandler',
+            'class': 'core.log_handlers.AsyncBatchFileHandler',  # запись в фоновом потоке пачками
             'filename': os.path.join(LOG_DIR, 'requests.log'),
             'when': 'midnight',  # новый файл каждый день
             'backupCount': 90,  # хранить 90 старых файлов
             'formatter': 'request_formatter',
             'encoding': 'utf-8',
+            'queue_size': 10000,  # при переполнении записи отбрасываются (со счётчиком)
+            'batch_size': 200,
+            'flush_interval': 1.0,
         },
     },
     'loggers': {
@@ -0,0 +1,71 @@
+import re
+
+from django.db import connection, transaction
+from django.db.models import BigIntegerField, Case, Max, Q, Value, When
+from django.db.models.functions import Cast, Substr
+from pytils.translit import slugify
+
+
+def lock_slug(model, base):
+    """
+        Транзакционная advisory-блокировка PostgreSQL на базовый slug модели
+
+        Одновременные вставки с одинаковым base выполняются по очереди до фиксации транзакции,
+        поэтому следующая видит slug предыдущей. Вставки с разными base друг друга не ждут
+    """
+    if connection.vendor != "postgresql":
+        # SQLite и так выполняет пишущие транзакции по одной
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [f"{model._meta.db_table}:{base}"])
+
+
+def next_slug(queryset, field, base):
+    """
+        Свободный slug вида base, base-1, base-2, ... одним запросом
+
+        Ищутся только base и base-<число>: условие startswith идёт по индексу
+        varchar_pattern_ops уникального поля, наибольший суффикс считается в БД
+    """
+    suffix = Case(
+        When(**{field: base}, then=Value(0)),
+        default=Cast(Substr(field, len(base) + 2), BigIntegerField()),
+        output_field=BigIntegerField(),
+    )
+    taken = queryset.filter(
+        Q(**{field: base}) | Q(**{
+            f"{field}__startswith": f"{base}-",
+            f"{field}__regex": rf"^{re.escape(base)}-[0-9]{{1,18}}$",
+        })
+    ).aggregate(suffix=Max(suffix))["suffix"]
+
+    return base if taken is None else f"{base}-{taken + 1}"
+
+
+class UniqueSlugMixin:
+    """
+        Миксин модели: уникальный slug из поля-источника при создании записи
+
+        Параметры (атрибуты класса):
+            - slug_field (str): Поле slug, должно быть unique
+            - slug_source (str): Поле, из которого транслитерируется slug
+            - slug_max_length (int): Длина базы slug без суффикса
+
+        Особенности:
+            - Число запросов не зависит от числа записей с тем же названием:
+              блокировка base (lock_slug) и один запрос за наибольшим суффиксом (next_slug)
+            - Заданный вручную slug не меняется
+    """
+    slug_field = "slug"
+    slug_source = "title"
+    slug_max_length = 200
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding or getattr(self, self.slug_field):
+            return super().save(*args, **kwargs)
+
+        base = slugify(getattr(self, self.slug_source))[:self.slug_max_length]
+        with transaction.atomic():
+            lock_slug(type(self), base)
+            setattr(self, self.slug_field, next_slug(type(self)._default_manager.all(), self.slug_field, base))
+            return super().save(*args, **kwargs)
@@ -0,0 +1,418 @@
+import asyncio
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from unittest import mock
+from base64 import urlsafe_b64encode
+from urllib.parse import parse_qs, urlsplit
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed, NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from . import cache as tiered
+from .authentication import CachedTokenAuthentication, token_cache_key
+from .events import InProcessEventBus, RedisEventBus
+from .log_handlers import AsyncBatchFileHandler
+from .pagination import KeysetCursorPagination
+from .views import iterate_in_thread
+
+
+class NamePagination(KeysetCursorPagination):
+    page_size = 2
+    ordering = ('first_name',)
+
+
+class NameDescPagination(NamePagination):
+    ordering = ('-first_name',)
+
+
+class JoinedPagination(NamePagination):
+    ordering = ('-date_joined',)
+
+
+class KeysetCursorPaginationTest(TestCase):
+    """Курсорная пагинация: переходы по ссылкам, разрешитель id, обратный порядок, порча курсора"""
+
+    def setUp(self):
+        # Одинаковые first_name: без разрешителя записи на границе страниц терялись бы
+        self.users = [
+            User.objects.create_user(username=f"user-{i}", first_name=name)
+            for i, name in enumerate(["a", "b", "b", "b", "c"])
+        ]
+
+    def paginate(self, pagination_class, url='/items/'):
+        paginator = pagination_class()
+        request = Request(APIRequestFactory().get(url))
+        page = paginator.paginate_queryset(User.objects.all(), request)
+        return paginator, [user.id for user in page]
+
+    def walk(self, pagination_class):
+        ids = []
+        paginator, page = self.paginate(pagination_class)
+        ids.extend(page)
+        while paginator.get_next_link():
+            link = urlsplit(paginator.get_next_link())
+            paginator, page = self.paginate(pagination_class, f"{link.path}?{link.query}")
+            ids.extend(page)
+        return ids
+
+    def test_pages_follow_key_with_id_tiebreaker(self):
+        expected = [user.id for user in sorted(self.users, key=lambda user: (user.first_name, user.id))]
+        self.assertEqual(self.walk(NamePagination), expected)
+
+    def test_descending_ordering(self):
+        expected = [user.id for user in sorted(self.users, key=lambda user: (user.first_name, user.id), reverse=True)]
+        self.assertEqual(self.walk(NameDescPagination), expected)
+
+    def test_cursor_round_trip_and_previous_link(self):
+        first, first_page = self.paginate(NamePagination)
+        self.assertIsNone(first.get_previous_link())
+
+        cursor = parse_qs(urlsplit(first.get_next_link()).query)['cursor'][0]
+        self.assertEqual(first.decode_cursor(Request(APIRequestFactory().get('/', {'cursor': cursor}))),
+                         (['b', first_page[-1]], False))
+
+        second, _ = self.paginate(NamePagination, f"/items/?cursor={cursor}")
+        link = urlsplit(second.get_previous_link())
+        previous, previous_page = self.paginate(NamePagination, f"{link.path}?{link.query}")
+        self.assertEqual(previous_page, first_page)
+
+    def test_invalid_cursor(self):
+        def encode(payload):
+            return urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+        for cursor in ['garbage', encode([1, 2]), encode({'x': 1}), encode({'p': ['b']}), encode({'p': 'b'})]:
+            with self.subTest(cursor=cursor), self.assertRaises(NotFound):
+                self.paginate(NamePagination, f"/items/?cursor={cursor}")
+
+    def test_cursor_value_of_wrong_type(self):
+        def encode(position):
+            return urlsafe_b64encode(json.dumps({'p': position}).encode()).decode().rstrip('=')
+
+        cases = [
+            (JoinedPagination, ['вчера', 1]),
+            (JoinedPagination, ['2026-01-01T00:00:00+00:00', 'abc']),
+            (NamePagination, ['b', {'id': 1}]),
+        ]
+        for pagination_class, position in cases:
+            with self.subTest(position=position), self.assertRaises(NotFound):
+                self.paginate(pagination_class, f"/items/?cursor={encode(position)}")
+
+        # Через представление: 404, а не 500
+        client = APIClient()
+        client.force_authenticate(self.users[0])
+        response = client.get('/api/library/files/', {'cursor': encode(['вчера', 1])})
+        self.assertEqual(response.status_code, 404)
+
+
+class FakeBus:
+    """Рассылка инвалидаций внутри процесса: каждый экземпляр TieredCache изображает отдельный воркер"""
+    subscribers = []
+
+    def __init__(self, location, channel, on_invalidate):
+        self.channel = channel
+        self.on_invalidate = on_invalidate
+        self.subscribers.append(self)
+
+    def publish(self, key):
+        for bus in self.subscribers:
+            if bus is not self and bus.channel == self.channel:
+                bus.on_invalidate(key)
+
+
+@override_settings(CACHES={
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "shared": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "tiered-test"},
+})
+class TieredCacheTest(SimpleTestCase):
+    """Двухуровневый кэш: попадания в L1, чтение из L2, инвалидации через шину, предел LRU"""
+
+    def setUp(self):
+        FakeBus.subscribers = []
+        tiered._tiers.clear()
+        caches["shared"].clear()
+        self.addCleanup(tiered._tiers.clear)
+
+    def worker(self, name, max_entries=100):
+        return tiered.TieredCache(name, {"OPTIONS": {
+            "SHARED_ALIAS": "shared",
+            "MAX_ENTRIES": max_entries,
+            "LOCAL_TIMEOUT": 60,
+            "CHANNEL": "test",
+            "BUS": "core.tests.FakeBus",
+        }})
+
+    def test_local_hit_and_miss(self):
+        first, second = self.worker("first"), self.worker("second")
+        first.set("key", "value")
+
+        # L1 отвечает, не обращаясь к L2
+        caches["shared"].set("key", "changed behind the cache")
+        self.assertEqual(first.get("key"), "value")
+
+        # Промах L1: значение читается из L2 и запоминается локально
+        self.assertEqual(second.get("key"), "changed behind the cache")
+        caches["shared"].delete("key")
+        self.assertEqual(second.get("key"), "changed behind the cache")
+
+        self.assertIsNone(second.get("missing"))
+        self.assertEqual(second.get("missing", "default"), "default")
+
+    def test_invalidation_reaches_other_workers(self):
+        first, second = self.worker("first"), self.worker("second")
+        first.set("key", 1)
+        self.assertEqual(second.get("key"), 1)
+
+        first.set("key", 2)
+        self.assertEqual(second.get("key"), 2)
+
+        second.delete("key")
+        self.assertIsNone(first.get("key"))
+
+        first.set("other", "value")
+        self.assertEqual(second.get("other"), "value")
+        first.clear()
+        self.assertIsNone(second.get("other"))
+
+    def test_lru_eviction_bound(self):
+        cache = self.worker("bounded", max_entries=3)
+        for key in ["a", "b", "c"]:
+            cache.set(key, key)
+        cache.get("a")
+        cache.set("d", "d")
+
+        local = cache.state.local
+        self.assertEqual(len(local._data), 3)
+        # Вытеснена давно не использованная запись "b", а не прочитанная недавно "a"
+        self.assertEqual(
+            [key for key in ["a", "b", "c", "d"] if local.get(cache.make_key(key))[0]],
+            ["a", "c", "d"]
+        )
+
+
+@override_settings(CACHES={
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    # Порт 1 закрыт: соединение с общим кэшем сразу отклоняется
+    "shared": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": "redis://127.0.0.1:1/0"},
+})
+class TieredCacheSharedDownTest(SimpleTestCase):
+    """Общий кэш недоступен: работа только на L1 со сроком FALLBACK_TIMEOUT, без попыток на каждый запрос"""
+
+    def setUp(self):
+        tiered._tiers.clear()
+        self.addCleanup(tiered._tiers.clear)
+        self.cache = tiered.TieredCache("fallback", {"OPTIONS": {
+            "SHARED_ALIAS": "shared",
+            "LOCAL_TIMEOUT": 5,
+            "FALLBACK_TIMEOUT": 120,
+            "RETRY_INTERVAL": 30,
+            "BUS": None,
+        }})
+
+    def test_local_only_fallback(self):
+        with self.assertLogs("cache", level="WARNING") as logs:
+            self.cache.set("key", "value")
+        self.assertEqual(len(logs.output), 1)
+
+        with mock.patch.object(caches["shared"], "get") as shared_get:
+            self.assertEqual(self.cache.get("key"), "value")
+            self.assertIsNone(self.cache.get("missing"))
+        # До RETRY_INTERVAL общий кэш не опрашивается
+        shared_get.assert_not_called()
+
+        expires, _ = self.cache.state.local._data[self.cache.make_key("key")]
+        self.assertGreater(expires - tiered.time.monotonic(), 60)
+
+        self.cache.delete("key")
+        self.assertIsNone(self.cache.get("key"))
+
+
+class FlakyPubSub:
+    """Подписка, которая не подключается attempts раз, затем получает одно сообщение и завершает поток"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def subscribe(self, channel):
+        self.client.attempts -= 1
+        if self.client.attempts >= 0:
+            raise ConnectionError("Redis недоступен")
+
+    def get_message(self, timeout):
+        if self.client.delivered:
+            # SystemExit не перехватывается циклом _listen
+            raise SystemExit
+        self.client.delivered = True
+        return {"data": b"other-worker key"}
+
+
+class FlakyRedis:
+    def __init__(self, attempts):
+        self.attempts = attempts
+        self.delivered = False
+
+    def pubsub(self, **kwargs):
+        return FlakyPubSub(self)
+
+
+class RedisInvalidationBusTest(SimpleTestCase):
+    """Подписка на инвалидации: L1 очищается при обрыве и восстановлении, а не на каждой попытке"""
+
+    def test_local_cleared_once_per_outage(self):
+        with mock.patch.object(tiered.threading, "Thread"):
+            invalidated = []
+            bus = tiered.RedisInvalidationBus("redis://127.0.0.1:1/0", "channel", invalidated.append)
+        bus.client = FlakyRedis(attempts=3)
+
+        with mock.patch.object(tiered.time, "sleep"), self.assertLogs("cache", level="WARNING") as logs, \
+                self.assertRaises(SystemExit):
+            bus._listen()
+
+        self.assertEqual(invalidated, [None, None, "key"])
+        self.assertEqual(len(logs.output), 1)
+
+
+class AsyncBatchFileHandlerTest(SimpleTestCase):
+    """Лог запросов: запись файла не держит поток, вызвавший logging"""
+
+    def test_emit_does_not_wait_for_file_io(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        handler = AsyncBatchFileHandler(os.path.join(directory, "requests.log"), flush_interval=0.05, when="midnight")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        record = logging.LogRecord("request", logging.INFO, __file__, 1, "GET /api/", None, None)
+
+        # Пока фоновый поток занят файлом, handle (под блокировкой Handler) отрабатывает сразу
+        with handler._io_lock:
+            done = threading.Event()
+            threading.Thread(target=lambda: (handler.handle(record), done.set())).start()
+            self.assertTrue(done.wait(timeout=1))
+
+        handler.close()
+        with open(os.path.join(directory, "requests.log")) as log:
+            self.assertEqual(log.read(), "GET /api/\n")
+        self.assertEqual(handler.stats()["written"], 1)
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class CachedTokenAuthenticationTest(TestCase):
+    """Кэш токенов: повторная проверка без запросов к БД, сброс при выходе и изменении пользователя"""
+
+    def setUp(self):
+        caches["default"].clear()
+        self.user = User.objects.create_user(username="teacher")
+        self.token = Token.objects.create(user=self.user)
+
+    def authenticate(self):
+        request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        return CachedTokenAuthentication().authenticate(Request(request))
+
+    def test_cached_between_requests(self):
+        user, _ = self.authenticate()
+        self.assertEqual(user, self.user)
+        with self.assertNumQueries(0):
+            user, token = self.authenticate()
+        self.assertEqual((user, token.key), (self.user, self.token.key))
+
+    def test_token_delete_revokes(self):
+        self.authenticate()
+        key = self.token.key
+        self.token.delete()
+        self.token.key = key
+
+        self.assertIsNone(caches["default"].get(token_cache_key(key)))
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_profile_save_evicts(self):
+        self.authenticate()
+        self.user.profile.full_name = "Новое имя"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.profile.save()
+
+        self.assertIsNone(caches["default"].get(token_cache_key(self.token.key)))
+        user, _ = self.authenticate()
+        self.assertEqual(user.profile.full_name, "Новое имя")
+
+    def test_deactivated_user_rejected(self):
+        self.authenticate()
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+
+class EventBusTest(SimpleTestCase):
+    """Шины событий: доставка по каналам, потеря сообщений медленным подписчиком, сбой Redis"""
+
+    async def test_in_process_delivery(self):
+        bus = InProcessEventBus()
+        subscription = await bus.subscribe("first")
+        other = await bus.subscribe("second")
+
+        # publish вызывается из потока синхронного представления
+        await asyncio.to_thread(bus.publish, "first", {"status": "ok"})
+        self.assertEqual(await subscription.get(1), {"status": "ok"})
+        self.assertIsNone(await other.get(0.01))
+
+        await subscription.close()
+        await other.close()
+        self.assertEqual(dict(bus._subscriptions), {})
+
+    async def test_slow_subscriber_drops_new_messages(self):
+        bus = InProcessEventBus()
+        bus.max_queued = 2
+        subscription = await bus.subscribe("channel")
+
+        for number in range(3):
+            bus.publish("channel", number)
+        await asyncio.sleep(0)
+
+        self.assertEqual([await subscription.get(0.01) for _ in range(3)], [0, 1, None])
+        await subscription.close()
+
+    def test_redis_publish_failure_is_logged(self):
+        bus = RedisEventBus("redis://127.0.0.1:1/0")
+        with self.assertLogs("events", level="WARNING"):
+            bus.publish("channel", {"status": "ok"})
+
+
+class IterateInThreadTest(SimpleTestCase):
+    """Синхронный поток частей ответа под ASGI: части готовятся в другом потоке, генератор закрывается"""
+
+    async def test_parts_prepared_in_thread(self):
+        loop_thread = threading.get_ident()
+        threads = []
+
+        def parts():
+            for part in [b"a", b"b"]:
+                threads.append(threading.get_ident())
+                yield part
+
+        self.assertEqual([part async for part in iterate_in_thread(parts())], [b"a", b"b"])
+        self.assertNotIn(loop_thread, threads)
+
+    async def test_early_close_closes_iterator(self):
+        closed = []
+
+        def parts():
+            try:
+                yield b"a"
+                yield b"b"
+            finally:
+                closed.append(True)
+
+        stream = iterate_in_thread(parts())
+        self.assertEqual(await anext(stream), b"a")
+        await stream.aclose()
+        self.assertEqual(closed, [True])
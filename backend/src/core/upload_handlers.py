@@ -0,0 +1,38 @@
+import hashlib
+
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+
+
+class HashingUploadMixin:
+    """
+        SHA-256 загружаемого файла считается по мере приёма частей multipart
+
+        Результат - атрибут sha256 у загруженного файла; его использует хранилище
+        library.storage, чтобы не читать файл второй раз
+    """
+
+    def new_file(self, *args, **kwargs):
+        # До super(): MemoryFileUploadHandler.new_file завершается исключением StopFutureHandlers
+        self.digest = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        result = super().receive_data_chunk(raw_data, start)
+        # None - часть принята этим обработчиком, а не передана следующему
+        if result is None:
+            self.digest.update(raw_data)
+        return result
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.sha256 = self.digest.hexdigest()
+        return file
+
+
+class HashingMemoryFileUploadHandler(HashingUploadMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(HashingUploadMixin, TemporaryFileUploadHandler):
+    pass
@@ -0,0 +1,90 @@
+from functools import update_wrapper
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+
+
+class AsyncAPIViewMixin:
+    """
+        Асинхронная обработка запроса для APIView и ViewSet (ставится в MRO перед ними)
+
+        Особенности:
+            - Под ASGI запрос обрабатывается в цикле событий: асинхронные обработчики (async def get ...)
+              читают данные через асинхронный ORM и не занимают поток
+            - Аутентификация, права и троттлинг (initial) выполняются в потоке через sync_to_async
+            - Синхронные обработчики (например, запись) тоже допустимы, они выполняются в потоке запроса
+            - Под WSGI Django выполняет такое представление через async_to_sync
+    """
+    # Обработчики могут быть и синхронными: dispatch сам переводит их в поток
+    view_is_async = True
+
+    @classmethod
+    def as_view(cls, *args, **initkwargs):
+        view = super().as_view(*args, **initkwargs)
+        if iscoroutinefunction(view):
+            return view
+
+        # ViewSetMixin.as_view собирает view без проверки view_is_async
+        async def async_view(request, *args, **kwargs):
+            return await view(request, *args, **kwargs)
+
+        # Атрибуты cls, initkwargs, actions и csrf_exempt нужны роутеру и схеме
+        return update_wrapper(async_view, view)
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            if iscoroutinefunction(handler):
+                response = await handler(request, *args, **kwargs)
+            else:
+                response = await sync_to_async(handler)(request, *args, **kwargs)
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+async def iterate_in_thread(iterator):
+    """
+        Синхронный итератор частей ответа как асинхронный (для StreamingHttpResponse под ASGI)
+
+        Синхронный итератор Django под ASGI сначала читает целиком в список. Здесь каждая часть
+        готовится в потоке запроса (sync_to_async): курсор БД остаётся в одном потоке, а цикл
+        событий не занят сериализацией и только отдаёт готовые части
+    """
+    next_part = sync_to_async(next)
+    end = object()
+    try:
+        while (part := await next_part(iterator, end)) is not end:
+            yield part
+    finally:
+        # Клиент отключился раньше: генератор закрывается в том же потоке, курсор освобождается
+        if hasattr(iterator, "close"):
+            await sync_to_async(iterator.close)()
+
+
+def streaming_content(request, iterator):
+    """
+        Части ответа для StreamingHttpResponse в режиме текущего процесса
+
+        Под WSGI (web) синхронный итератор отдаётся как есть, а асинхронный Django прочитал бы
+        в память целиком; под ASGI (events, опционально web) - наоборот, поэтому там
+        итератор оборачивается в iterate_in_thread
+    """
+    if isinstance(getattr(request, "_request", request), ASGIRequest):
+        return iterate_in_thread(iterator)
+    return iterator
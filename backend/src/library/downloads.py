@@ -0,0 +1,147 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+from core.views import streaming_content
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+DOWNLOAD_BLOCK_SIZE = 256 * 1024
+
+
+def file_etag(stat):
+    """
+        Сильный ETag в формате nginx ("mtime-size" в hex)
+
+        Файлы хранилища не перезаписываются на месте (library.storage), поэтому пара
+        время изменения + размер однозначно задаёт содержимое. Формат совпадает с nginx:
+        ETag не меняется при переключении между X-Accel-Redirect и отдачей из Django
+    """
+    return f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+
+
+def parse_range(header, size):
+    """
+        Диапазон из заголовка Range: (start, end) включительно, None - отдать файл целиком
+
+        Поддерживается один диапазон; на несколько (bytes=0-1,5-6) RFC 9110 разрешает
+        ответить всем файлом. Невыполнимый диапазон - ValueError (ответ 416)
+    """
+    match = RANGE_RE.match(header.replace(" ", ""))
+    if match is None:
+        return None
+
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        # bytes=-500: последние 500 байт
+        length = int(last)
+        if not length:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError(header)
+    return start, end
+
+
+def file_blocks(path, start, length):
+    """Блоки файла с позиции start; файл закрывается и при обрыве передачи (close генератора)"""
+    with open(path, "rb") as file:
+        file.seek(start)
+        while length > 0:
+            block = file.read(min(DOWNLOAD_BLOCK_SIZE, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+
+
+def serve_file(request, storage, name, filename, as_attachment=True):
+    """
+        Ответ с файлом хранилища после проверки прав в представлении
+
+        Параметры:
+            - storage: Хранилище файла, name - имя файла в нём
+            - filename (str): Имя файла для Content-Disposition
+            - as_attachment (bool): Скачивание (attachment) или показ в браузере (inline)
+
+        Особенности:
+            - С settings.MEDIA_ACCEL_REDIRECT передача отдаётся nginx (internal-location):
+              Range, If-Range и условные запросы обрабатывает он, воркер сразу свободен
+            - Без прокси файл отдаёт Django: ETag/Last-Modified, 304/412,
+              один диапазон Range (206/416) с учётом If-Range
+    """
+    try:
+        path = storage.path(name)
+        stat = os.stat(path)
+    except (FileNotFoundError, ValueError):
+        raise Http404("Файл не найден")
+
+    content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    disposition = content_disposition_header(as_attachment, filename)
+
+    if settings.MEDIA_ACCEL_REDIRECT:
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = settings.MEDIA_ACCEL_REDIRECT + quote(name)
+        response["Content-Disposition"] = disposition
+        response["Cache-Control"] = "private"
+        return response
+
+    etag = file_etag(stat)
+    last_modified = int(stat.st_mtime)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = file_response(request, path, stat.st_size, etag, last_modified)
+        response["Content-Type"] = content_type
+        response["Content-Disposition"] = disposition
+
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    response["Accept-Ranges"] = "bytes"
+    response["Cache-Control"] = "private"
+    return response
+
+
+def if_range_matches(request, etag, last_modified):
+    """If-Range: диапазон отдаётся, только если у клиента та же версия файла"""
+    condition = request.headers.get("If-Range")
+    if condition is None:
+        return True
+    if condition.startswith('"'):
+        return condition == etag
+    return parse_http_date_safe(condition) == last_modified
+
+
+def file_response(request, path, size, etag, last_modified):
+    header = request.headers.get("Range")
+    byte_range = None
+
+    if header and if_range_matches(request, etag, last_modified):
+        try:
+            byte_range = parse_range(header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+
+    start, end = byte_range or (0, size - 1)
+    length = end - start + 1
+    # Файл не читается в память целиком ни под WSGI, ни под ASGI (FileResponse под ASGI читается)
+    response = StreamingHttpResponse(
+        streaming_content(request, file_blocks(path, start, length)),
+        status=200 if byte_range is None else 206
+    )
+    response["Content-Length"] = length
+    if byte_range is not None:
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return response
@@ -0,0 +1,42 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+from rest_framework import filters
+
+from .models import SEARCH_CONFIG
+
+
+class LibrarySearchFilter(filters.SearchFilter):
+    """
+        Полнотекстовый поиск по методическим материалам
+
+        Особенности:
+            - Ищет по денормализованному полю search_vector (GIN-индекс) вместо ILIKE по четырём полям
+            - Запрос разбирается в синтаксисе websearch_to_tsquery (кавычки, "or", "-слово")
+            - Каждая запись получает аннотацию search_rank для сортировки по релевантности
+    """
+    search_description = "Полнотекстовый поиск по названию, описанию и автору"
+
+    def filter_queryset(self, request, queryset, view):
+        term = request.query_params.get(self.search_param, '').strip()
+        if not term:
+            return queryset
+
+        query = SearchQuery(term, config=SEARCH_CONFIG, search_type='websearch')
+
+        # Cast до double precision: ранг участвует в ключе курсорной пагинации и
+        # должен без потерь проходить через JSON курсора
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=Cast(SearchRank(F('search_vector'), query), FloatField())
+        )
+
+
+class LibraryOrderingFilter(filters.OrderingFilter):
+    """
+        Сортировка материалов: при поиске без явного ordering результаты упорядочиваются по релевантности
+    """
+
+    def get_ordering(self, request, queryset, view):
+        if not request.query_params.get(self.ordering_param) and 'search_rank' in queryset.query.annotations:
+            return ['-search_rank']
+        return super().get_ordering(request, queryset, view)
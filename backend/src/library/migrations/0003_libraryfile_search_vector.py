@@ -0,0 +1,39 @@
+# Generated by Django 6.0.1 on 2026-04-20 18:12
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+FILL_SEARCH_VECTOR = """
+UPDATE library_libraryfile AS f
+SET search_vector =
+    setweight(to_tsvector('russian', coalesce(f.title, '')), 'A')
+    || setweight(to_tsvector('russian', coalesce(f.description, '')), 'B')
+    || setweight(to_tsvector('russian', coalesce((
+        SELECT trim(coalesce(p.full_name, '') || ' ' || u.username)
+        FROM auth_user AS u
+        LEFT JOIN users_profile AS p ON p.user_id = u.id
+        WHERE u.id = f.author_id
+    ), '')), 'C');
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0002_create_default_categories'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='libraryfile',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='libraryfile',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='library_file_search_gin'),
+        ),
+        migrations.RunSQL(FILL_SEARCH_VECTOR, reverse_sql=migrations.RunSQL.noop),
+    ]
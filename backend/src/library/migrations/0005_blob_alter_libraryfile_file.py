@@ -0,0 +1,53 @@
+# Generated by Django 6.0.1 on 2026-10-17 12:30
+
+import os
+
+import library.models
+import library.storage
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def create_blobs(apps, schema_editor):
+    """Ссылки на уже загруженные файлы: у каждого прежнего пути по одному материалу"""
+    Blob = apps.get_model('library', 'Blob')
+    LibraryFile = apps.get_model('library', 'LibraryFile')
+
+    rows = LibraryFile.objects.exclude(file='').values('file').annotate(refs=Count('id')).order_by()
+    blobs = []
+    for row in rows:
+        path = os.path.join(settings.MEDIA_ROOT, row['file'])
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        blobs.append(Blob(name=row['file'], size=size, refs=row['refs']))
+    Blob.objects.bulk_create(blobs, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0004_uploadsession'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Путь')),
+                ('size', models.PositiveBigIntegerField(default=0, verbose_name='Размер')),
+                ('refs', models.PositiveIntegerField(default=0, verbose_name='Число ссылок')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Файл хранилища',
+                'verbose_name_plural': 'Файлы хранилища',
+            },
+        ),
+        migrations.AlterField(
+            model_name='libraryfile',
+            name='file',
+            field=models.FileField(storage=library.storage.ContentAddressedStorage(), upload_to=library.models.library_file_path, verbose_name='Файл'),
+        ),
+        migrations.RunPython(create_blobs, migrations.RunPython.noop),
+    ]
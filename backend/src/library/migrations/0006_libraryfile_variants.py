@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-17 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0005_blob_alter_libraryfile_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='libraryfile',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
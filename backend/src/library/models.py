@@ -1,12 +1,21 @@
 import os
+import uuid
 
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.core.validators import MinLengthValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Value
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
 from django.utils.crypto import get_random_string
 from django.utils.timezone import now
 from pytils.translit import slugify
 
+from core.slugs import UniqueSlugMixin
+from .storage import library_storage
+
 
 class Category(models.Model):
     """Набор категорий для методических материалов в разделе \"Библиотека\""""
@@ -21,16 +30,108 @@ class Category(models.Model):
 
 
 def library_file_path(instance, filename):
-    """Формирование пути сохранения файла методических материалов"""
+    """
+        Формирование пути сохранения файла методических материалов
+
+        Хранилище library.storage берёт из пути только расширение, имя файла задаёт его SHA-256
+    """
     ext = filename.split('.')[-1]
     name = slugify(instance.title[:200])
     return os.path.join("library", now().strftime('%Y/%m'), f"{name}-{get_random_string(5)}.{ext}")
 
 
+# Конфигурация полнотекстового поиска PostgreSQL
+SEARCH_CONFIG = 'russian'
+
+
+def library_search_vector(author):
+    """
+        Выражение tsvector для методического материала
+
+        Веса:
+            - A: название
+            - B: описание
+            - C: ФИО и логин автора (денормализуются, чтобы поиск не делал JOIN)
+    """
+    author_name = ""
+    if author is not None:
+        profile = getattr(author, 'profile', None)
+        full_name = profile.full_name if profile else ""
+        author_name = f"{full_name} {author.username}".strip()
+
+    return (
+            SearchVector('title', weight='A', config=SEARCH_CONFIG)
+            + SearchVector('description', weight='B', config=SEARCH_CONFIG)
+            + SearchVector(Value(author_name), weight='C', config=SEARCH_CONFIG)
+    )
+
+
+class Blob(models.Model):
+    """
+        Файл хранилища с адресацией по содержимому (library.storage) и число ссылок на него
+
+        Поля:
+            - name (str): Путь файла в хранилище, содержит SHA-256
+            - size (int): Размер файла в байтах
+            - refs (int): Число методических материалов, ссылающихся на файл
+
+        Особенности:
+            - Файл удаляется с диска, только когда освобождена последняя ссылка
+            - Ссылки берутся и освобождаются под блокировкой строки, поэтому одновременные
+              загрузка и удаление одинакового файла не оставляют материал без файла
+    """
+    name = models.CharField("Путь", max_length=255, unique=True)
+    size = models.PositiveBigIntegerField("Размер", default=0)
+    refs = models.PositiveIntegerField("Число ссылок", default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Файл хранилища"
+        verbose_name_plural = "Файлы хранилища"
+
+    def __str__(self):
+        return f"{self.name} ({self.refs})"
+
+    @classmethod
+    def lock(cls, name):
+        """Строка файла, заблокированная до конца транзакции (создаётся при отсутствии)"""
+        cls.objects.bulk_create([cls(name=name)], ignore_conflicts=True)
+        return cls.objects.select_for_update().get(name=name)
+
+    @classmethod
+    def acquire(cls, name, size):
+        with transaction.atomic():
+            blob = cls.lock(name)
+            blob.refs += 1
+            blob.size = size
+            blob.save(update_fields=["refs", "size"])
+
+    @classmethod
+    def release(cls, name):
+        """Освобождение ссылки; файл без ссылок удаляется после фиксации транзакции"""
+        with transaction.atomic():
+            blob = cls.objects.select_for_update().filter(name=name).first()
+            if blob is None:
+                return
+            blob.refs = max(blob.refs - 1, 0)
+            blob.save(update_fields=["refs"])
+
+        if blob.refs == 0:
+            transaction.on_commit(lambda: cls.collect(name))
+
+    @classmethod
+    def collect(cls, name):
+        """Удаление файла, если на него так и не появилось новых ссылок"""
+        with transaction.atomic():
+            blob = cls.lock(name)
+            if blob.refs == 0:
+                blob.delete()
+                library_storage.delete(name)
+
 
 # TODO нужны ли просмотры
-class LibraryFile(models.Model):
-    """Модель методических материалов (документы, видео, изображения)"""
+class LibraryFile(UniqueSlugMixin, models.Model):
+    """Модель методических материалов (документы, видео, изображения); slug выдаёт core.slugs"""
 
     FILE_TYPES = [
         ('document', 'Документ'),
@@ -53,38 +154,127 @@ class LibraryFile(models.Model):
     description = models.TextField("Описание файла", blank=True)
     file_type = models.CharField("Тип файла", max_length=10, choices=FILE_TYPES)
     created_at = models.DateTimeField(auto_now_add=True)
-    file = models.FileField("Файл", upload_to=library_file_path)
+    file = models.FileField("Файл", upload_to=library_file_path, storage=library_storage)
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Пути превью и WebP-вариантов файла {"thumb": ..., "preview": ...}, заполняются media.processing
+    variants = models.JSONField(default=dict, blank=True, editable=False)
 
     def save(self, *args, **kwargs):
-        if not self.id and not self.slug:
-            base_slug = slugify(self.title)[:200]
-            curr_slug = base_slug
-            counter = 1
-            while LibraryFile.objects.filter(slug=curr_slug).exists():
-                curr_slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = curr_slug
-
         old_file_name = None
+        # Новый файл записывается в хранилище в super().save и берёт ссылку на Blob,
+        # даже если его содержимое (а значит, и имя) совпало с прежним
+        new_file = bool(self.file) and not self.file._committed
         if self.id:
             try:
                 old_file_name = LibraryFile.objects.get(pk=self.id).file.name
             except LibraryFile.DoesNotExist:
                 pass
 
-        if old_file_name and old_file_name != (self.file.name if self.file else None):
-            storage = self.file.storage if self.file else None
-            if storage and storage.exists(old_file_name):
-                storage.delete(old_file_name)
         super().save(*args, **kwargs)
 
-    def delete(self, *args, **kwargs):
-        if self.file:
-            storage = self.file.storage
-            if storage.exists(self.file.name):
-                storage.delete(self.file.name)
-        super().delete(*args, **kwargs)
+        # Прежний файл удаляется, только если на него не ссылаются другие материалы
+        if old_file_name and (new_file or old_file_name != (self.file.name if self.file else None)):
+            Blob.release(old_file_name)
+
+        LibraryFile.objects.filter(pk=self.pk).update(search_vector=library_search_vector(self.author))
 
     class Meta:
         verbose_name = "Методический материал"
         verbose_name_plural = "Методические материалы"
+        indexes = [
+            GinIndex(fields=['search_vector'], name='library_file_search_gin'),
+        ]
+
+
+# Временные файлы загрузок частями лежат в MEDIA_ROOT, на той же файловой системе, что и хранилище:
+# готовый файл переносится туда переименованием, без копирования
+UPLOAD_DIR = "uploads"
+
+
+class UploadSession(models.Model):
+    """
+        Незавершённая загрузка файла частями (library.uploads)
+
+        Поля:
+            - id (UUID): Идентификатор загрузки в URL, не угадывается перебором
+            - filename (str): Исходное имя файла, по нему определяется тип материала
+            - size (int): Ожидаемый размер файла в байтах
+            - checksum (str): SHA-256 файла от клиента (hex), сверяется при завершении
+            - offset (int): Сколько байт от начала уже записано во временный файл
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='library_uploads',
+        verbose_name="Пользователь"
+    )
+    filename = models.CharField("Имя файла", max_length=255)
+    size = models.PositiveBigIntegerField("Размер файла")
+    checksum = models.CharField("SHA-256", max_length=64)
+    offset = models.PositiveBigIntegerField("Получено байт", default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Загрузка файла"
+        verbose_name_plural = "Загрузки файлов"
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size})"
+
+    @property
+    def path(self):
+        """Временный файл, в который пишутся части"""
+        return os.path.join(settings.MEDIA_ROOT, UPLOAD_DIR, f"{self.id}.part")
+
+
+@receiver(post_delete, sender=UploadSession)
+def remove_upload_file(sender, instance, **kwargs):
+    """Удаление временного файла после фиксации удаления загрузки (отмена, завершение, удаление пользователя)"""
+    def remove():
+        try:
+            os.remove(instance.path)
+        except FileNotFoundError:
+            pass
+
+    transaction.on_commit(remove)
+
+
+@receiver(post_delete, sender=LibraryFile)
+def release_library_file(sender, instance, **kwargs):
+    """Освобождение ссылки на файл при любом удалении материала, в том числе через QuerySet.delete"""
+    if instance.file:
+        Blob.release(instance.file.name)
+
+
+# ФИО и логин автора денормализованы в search_vector: при их изменении индекс материалов автора обновляется.
+# Исходные значения запоминаются через __dict__, чтобы отложенные поля не загружались отдельным запросом
+@receiver(post_init, sender='users.Profile')
+def remember_author_full_name(sender, instance, **kwargs):
+    instance._search_full_name = instance.__dict__.get('full_name')
+
+
+@receiver(post_init, sender=settings.AUTH_USER_MODEL)
+def remember_author_username(sender, instance, **kwargs):
+    instance._search_username = instance.__dict__.get('username')
+
+
+def update_author_search_vector(author):
+    LibraryFile.objects.filter(author_id=author.pk).update(search_vector=library_search_vector(author))
+
+
+@receiver(post_save, sender='users.Profile')
+def update_search_vector_on_full_name(sender, instance, created, **kwargs):
+    previous = instance._search_full_name
+    instance._search_full_name = instance.full_name
+    if not created and previous != instance.full_name:
+        update_author_search_vector(instance.user)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def update_search_vector_on_username(sender, instance, created, **kwargs):
+    previous = instance._search_username
+    instance._search_username = instance.username
+    if not created and previous != instance.username:
+        update_author_search_vector(instance)
@@ -2,8 +2,10 @@ import os
 
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
+from rest_framework.reverse import reverse
 
-from .models import Category, LibraryFile
+from .models import Category, LibraryFile, UploadSession
+from .uploads import MAX_CHUNK_SIZE, MAX_FILE_SIZE
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -28,7 +30,19 @@ def get_file_type_by_extension(filename):
     raise ValidationError('Неподдерживаемый формат файла.')
 
 
+class LibraryDownloadField(serializers.FileField):
+    """Файл материала: в ответе - ссылка на скачивание с проверкой прав, а не прямой путь в /media/"""
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        return reverse('file-download', kwargs={'slug': value.instance.slug}, request=self.context.get('request'))
+
+
 class LibraryFileSerializer(serializers.ModelSerializer):
+    # План выборки для core.query_plan: author нужен для author_name
+    select_related_fields = ['author']
+
     author_name = serializers.ReadOnlyField(source='author.username')
     category_details = CategorySerializer(source='categories', many=True, read_only=True)
     categories = serializers.PrimaryKeyRelatedField(
@@ -37,6 +51,16 @@ class LibraryFileSerializer(serializers.ModelSerializer):
         write_only=True,
         required=False
     )
+    file = LibraryDownloadField()
+    # Превью и WebP-варианты, появляются после фоновой обработки (media.processing)
+    variants = serializers.SerializerMethodField()
+
+    def get_variants(self, obj) -> dict:
+        # Не прямые пути в /media/: превью документов отдаются с проверкой прав, как и сам файл
+        return {
+            key: reverse('file-variant', kwargs={'slug': obj.slug, 'key': key}, request=self.context.get('request'))
+            for key in obj.variants
+        }
 
     def validate(self, data):
         file = data.get('file')
@@ -58,7 +82,46 @@ class LibraryFileSerializer(serializers.ModelSerializer):
         fields = [
             'slug', 'title', 'description',
             'file_type', 'file', 'category_details',
-            'categories',
+            'categories', 'variants',
             'author_name', 'created_at'
         ]
         read_only_fields = ['slug', 'author_name', 'created_at', "file_type"]
+
+
+class LibraryFileCompleteSerializer(LibraryFileSerializer):
+    """Поля материала при завершении загрузки частями: файл берётся из загрузки"""
+    file = LibraryDownloadField(read_only=True)
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    """
+        Загрузка файла частями
+
+        Особенности:
+            - checksum - SHA-256 всего файла в hex, сверяется при завершении
+            - chunk_size - наибольший размер одной части (PUT)
+    """
+    chunk_size = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'filename', 'size', 'checksum', 'offset', 'chunk_size', 'created_at']
+        read_only_fields = ['id', 'offset', 'created_at']
+
+    def get_chunk_size(self, obj) -> int:
+        return MAX_CHUNK_SIZE
+
+    def validate_filename(self, value):
+        get_file_type_by_extension(value)
+        return value
+
+    def validate_size(self, value):
+        if not 0 < value <= MAX_FILE_SIZE:
+            raise ValidationError(f'Размер файла должен быть от 1 до {MAX_FILE_SIZE} байт.')
+        return value
+
+    def validate_checksum(self, value):
+        value = value.lower()
+        if len(value) != 64 or any(char not in '0123456789abcdef' for char in value):
+            raise ValidationError('Ожидается SHA-256 в шестнадцатеричном виде.')
+        return value
@@ -0,0 +1,75 @@
+import hashlib
+import os
+import tempfile
+
+from django.apps import apps
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+
+BLOB_DIR = "library/blobs"
+
+
+def blob_name(digest, ext):
+    """Путь файла по его SHA-256: library/blobs/ab/cd/abcd....pdf"""
+    return f"{BLOB_DIR}/{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+        Хранилище методических материалов с адресацией по содержимому
+
+        Особенности:
+            - Имя файла - его SHA-256 и расширение из upload_to: одинаковые файлы хранятся один раз
+            - Число ссылок на файл хранится в library.Blob; ссылка берётся здесь, до записи файла,
+              а освобождает её LibraryFile при замене или удалении файла
+            - SHA-256 считается при загрузке (core.upload_handlers) или при записи во временный файл,
+              повторно файл не читается
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # Итоговое имя определяется содержимым в _save
+        return name
+
+    def _save(self, name, content):
+        ext = os.path.splitext(name)[1].lower()
+        digest = getattr(content, "sha256", None)
+        spooled = None
+
+        if digest is None or not hasattr(content, "temporary_file_path"):
+            spooled, digest = self._spool(content)
+            source = spooled
+        else:
+            source = content.temporary_file_path()
+
+        name = blob_name(digest, ext)
+        try:
+            # Ссылка берётся до проверки наличия файла: параллельное освобождение
+            # последней ссылки (Blob.collect) не удалит файл после этой проверки
+            apps.get_model("library", "Blob").acquire(name, content.size)
+
+            full_path = self.path(name)
+            if not os.path.exists(full_path):
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                file_move_safe(source, full_path, allow_overwrite=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(full_path, self.file_permissions_mode)
+        finally:
+            if spooled is not None and os.path.exists(spooled):
+                os.remove(spooled)
+
+        return name
+
+    def _spool(self, content):
+        """Запись содержимого во временный файл рядом с хранилищем с подсчётом SHA-256 за один проход"""
+        directory = self.path(BLOB_DIR)
+        os.makedirs(directory, exist_ok=True)
+
+        digest = hashlib.sha256()
+        with tempfile.NamedTemporaryFile(dir=directory, suffix=".tmp", delete=False) as spooled:
+            for chunk in content.chunks():
+                digest.update(chunk)
+                spooled.write(chunk)
+        return spooled.name, digest.hexdigest()
+
+
+library_storage = ContentAddressedStorage()
@@ -1,3 +1,357 @@
-from django.test import TestCase
+import hashlib
+import io
+import os
+import shutil
+import tempfile
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from rest_framework.exceptions import ParseError
+from rest_framework.test import APIClient
+
+from core.slugs import next_slug
+from .models import Blob, LibraryFile, UploadSession
+from .uploads import write_chunk
+
+
+class LibrarySearchTest(TestCase):
+    """Полнотекстовый поиск: синтаксис websearch, сортировка по релевантности, обновление индекса автора"""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='metodist')
+        self.author.profile.full_name = "Иванова Мария"
+        self.author.profile.save()
+
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='reader'))
+
+    def create_file(self, title, description="", author=None):
+        return LibraryFile.objects.create(
+            title=title,
+            description=description,
+            file_type='document',
+            author=author or self.author,
+            file='library/test.pdf'
+        )
+
+    def search(self, term, **params):
+        response = self.client.get('/api/library/files/', {'search': term, **params})
+        self.assertEqual(response.status_code, 200)
+        return [item['slug'] for item in response.json()['results']]
+
+    def test_websearch_syntax(self):
+        lesson = self.create_file("Конспект урока математики")
+        plan = self.create_file("Конспект занятия по чтению")
+        game = self.create_file("Игры на перемене")
+
+        self.assertCountEqual(self.search("конспект"), [lesson.slug, plan.slug])
+        self.assertEqual(self.search("конспект -урок"), [plan.slug])
+        self.assertEqual(self.search('"конспект урока"'), [lesson.slug])
+        self.assertCountEqual(self.search("математика or игра"), [lesson.slug, game.slug])
+
+    def test_results_ordered_by_rank(self):
+        in_description = self.create_file("Методичка", description="Сценарий праздника осени")
+        in_title = self.create_file("Праздник осени")
+
+        self.assertEqual(self.search("праздник осени"), [in_title.slug, in_description.slug])
+        # Явная сортировка отменяет сортировку по релевантности
+        self.assertEqual(self.search("праздник осени", ordering='title'), [in_description.slug, in_title.slug])
+
+    def test_search_by_author(self):
+        material = self.create_file("Памятка для родителей")
+        self.create_file("Памятка для педагогов", author=User.objects.create_user(username='other'))
+
+        self.assertEqual(self.search("Иванова"), [material.slug])
+        self.assertEqual(self.search("metodist"), [material.slug])
+
+        self.author.profile.full_name = "Петрова Мария"
+        self.author.profile.save()
+        self.assertEqual(self.search("Петрова"), [material.slug])
+        self.assertEqual(self.search("Иванова"), [])
+
+        self.author.username = 'metodist2026'
+        self.author.save()
+        self.assertEqual(self.search("metodist2026"), [material.slug])
+        self.assertEqual(self.search("metodist"), [])
+
+
+class MediaRootTestCase(TestCase):
+    """Файлы тестов пишутся во временный MEDIA_ROOT"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+
+class LibraryUploadTest(MediaRootTestCase):
+    """Загрузка частями: конфликт смещения, возобновление после обрыва, сверка контрольной суммы"""
+    content = b"0123456789" * 10
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='metodist'))
+
+    def start(self, checksum=None):
+        response = self.client.post('/api/library/uploads/', {
+            'filename': 'lekciya.pdf',
+            'size': len(self.content),
+            'checksum': checksum or hashlib.sha256(self.content).hexdigest(),
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return f"/api/library/uploads/{response.json()['id']}/"
+
+    def put(self, url, offset, data):
+        return self.client.generic('PUT', f"{url}?offset={offset}", data, content_type='application/octet-stream')
+
+    def complete(self, url):
+        return self.client.post(f"{url}complete/", {'title': "Лекция"}, format='json')
+
+    def test_offset_mismatch(self):
+        url = self.start()
+        self.assertEqual(self.put(url, 0, self.content[:40]).status_code, 200)
+
+        for offset in [0, 50]:
+            response = self.put(url, offset, self.content[offset:offset + 10])
+            self.assertEqual(response.status_code, 409)
+            self.assertEqual(response.json()['offset'], 40)
+
+        # Некорректная длина части - 400, смещение не меняется
+        for header in ['abc', '-5']:
+            response = self.client.generic(
+                'PUT', f"{url}?offset=40", b"", content_type='application/octet-stream', CONTENT_LENGTH=header
+            )
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(url).json()['offset'], 40)
+
+        # Завершение до получения всех байт
+        response = self.complete(url)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['offset'], 40)
+
+    def test_resume_after_interrupted_chunk(self):
+        url = self.start()
+        self.put(url, 0, self.content[:60])
+
+        # Обрыв соединения: тело короче Content-Length, смещение не сдвигается
+        with self.assertRaises(ParseError):
+            write_chunk(UploadSession.objects.get(), 60, io.BytesIO(self.content[60:80]), 40)
+        self.assertEqual(self.client.get(url).json()['offset'], 60)
+
+        self.assertEqual(self.put(url, 60, self.content[60:]).json()['offset'], len(self.content))
+        response = self.complete(url)
+        self.assertEqual(response.status_code, 201)
+
+        material = LibraryFile.objects.get(slug=response.json()['slug'])
+        with material.file.open('rb') as file:
+            self.assertEqual(file.read(), self.content)
+        self.assertEqual(material.file_type, 'document')
+        self.assertFalse(UploadSession.objects.exists())
+
+    def test_checksum_mismatch_restarts_upload(self):
+        url = self.start(checksum=hashlib.sha256(b"other").hexdigest())
+        self.put(url, 0, self.content)
+
+        response = self.complete(url)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('checksum', response.json())
+        self.assertEqual(self.client.get(url).json()['offset'], 0)
+        self.assertFalse(LibraryFile.objects.exists())
+
+        # Загрузка заново с нулевого смещения перезаписывает временный файл
+        self.assertEqual(self.put(url, 0, self.content).status_code, 200)
+        session = UploadSession.objects.get()
+        with open(session.path, 'rb') as part:
+            self.assertEqual(part.read(), self.content)
+        self.assertTrue(os.path.exists(session.path))
+
+
+class BlobRefsTest(MediaRootTestCase):
+    """Число ссылок на файл хранилища: одинаковое содержимое, повторная загрузка, удаление"""
+
+    def setUp(self):
+        super().setUp()
+        self.author = User.objects.create_user(username='metodist')
+
+    def create_file(self, content):
+        return LibraryFile.objects.create(
+            title="Памятка", file_type='document', author=self.author, file=ContentFile(content, name="pamyatka.pdf")
+        )
+
+    def refs(self):
+        return dict(Blob.objects.values_list('name', 'refs'))
+
+    def test_same_content_shares_blob(self):
+        first = self.create_file(b"content")
+        second = self.create_file(b"content")
+
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertEqual(self.refs(), {first.file.name: 2})
+
+    def test_reupload_of_same_content_keeps_refs(self):
+        material = self.create_file(b"content")
+        name = material.file.name
+
+        material.file = ContentFile(b"content", name="pamyatka.pdf")
+        material.save()
+        self.assertEqual(material.file.name, name)
+        self.assertEqual(self.refs(), {name: 1})
+
+        material.file = ContentFile(b"changed", name="pamyatka.pdf")
+        with self.captureOnCommitCallbacks(execute=True):
+            material.save()
+        # Прежний файл без ссылок удалён вместе со строкой Blob
+        self.assertEqual(self.refs(), {material.file.name: 1})
+        self.assertFalse(material.file.storage.exists(name))
+
+    def test_delete_releases_refs(self):
+        first = self.create_file(b"content")
+        second = self.create_file(b"content")
+        name = first.file.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(self.refs(), {name: 1})
+        self.assertTrue(second.file.storage.exists(name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertEqual(self.refs(), {})
+        self.assertFalse(second.file.storage.exists(name))
+
+
+@override_settings(MEDIA_ACCEL_REDIRECT='')
+class LibraryDownloadTest(MediaRootTestCase):
+    """Скачивание и превью с проверкой прав: поток под ASGI, Range, условные запросы, X-Accel-Redirect"""
+    content = bytes(range(256)) * 4
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='reader')
+        self.material = LibraryFile.objects.create(
+            title="Памятка", file_type='document', author=self.user, file=ContentFile(self.content, name="pamyatka.pdf")
+        )
+        self.url = f'/api/library/files/{self.material.slug}/download/'
+
+    async def get(self, url, **headers):
+        await self.async_client.aforce_login(self.user)
+        return await self.async_client.get(url, headers=headers)
+
+    async def body(self, response):
+        # Файл отдаётся асинхронным итератором: под ASGI он не читается в память целиком
+        self.assertTrue(response.is_async)
+        return b"".join([chunk async for chunk in response.streaming_content])
+
+    async def test_full_file_and_conditional_request(self):
+        response = await self.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Length'], str(len(self.content)))
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="{self.material.slug}.pdf"')
+        self.assertEqual(await self.body(response), self.content)
+
+        response = await self.get(self.url, If_None_Match=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    async def test_range(self):
+        response = await self.get(self.url, Range='bytes=1000-')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f"bytes 1000-1023/{len(self.content)}")
+        self.assertEqual(await self.body(response), self.content[1000:])
+
+        response = await self.get(self.url, Range='bytes=-10')
+        self.assertEqual(await self.body(response), self.content[-10:])
+
+        response = await self.get(self.url, Range='bytes=5000-')
+        self.assertEqual(response.status_code, 416)
+
+        # Версия файла у клиента устарела: If-Range отдаёт файл целиком
+        response = await self.get(self.url, Range='bytes=0-9', If_Range='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(MEDIA_ACCEL_REDIRECT='/protected/')
+    async def test_accel_redirect(self):
+        response = await self.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], f"/protected/{self.material.file.name}")
+        self.assertEqual(response.content, b"")
+
+    def test_variants_require_authentication(self):
+        name = default_storage.save("library/variants/pamyatka/thumb.webp", ContentFile(b"webp"))
+        LibraryFile.objects.filter(pk=self.material.pk).update(variants={"thumb": name})
+        url = f'/api/library/files/{self.material.slug}/variants/thumb/'
+
+        self.assertEqual(APIClient().get(url).status_code, 401)
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        variants = client.get(f'/api/library/files/{self.material.slug}/').json()['variants']
+        self.assertEqual(variants, {"thumb": f"http://testserver{url}"})
+
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], "image/webp")
+        self.assertTrue(response['Content-Disposition'].startswith("inline"))
+        # Под WSGI файл отдаётся синхронным итератором блоков
+        self.assertFalse(response.is_async)
+        self.assertEqual(b"".join(response.streaming_content), b"webp")
+
+        self.assertEqual(client.get(f'/api/library/files/{self.material.slug}/variants/preview/').status_code, 404)
+
+
+class UniqueSlugTest(TestCase):
+    """Slug материала (core.slugs): суффиксы, занятые вручную slug, названия, оканчивающиеся на число"""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='metodist')
+
+    def create_file(self, title, slug=""):
+        return LibraryFile.objects.create(
+            title=title, slug=slug, file_type='document', author=self.author, file='library/test.pdf'
+        ).slug
+
+    def test_suffix_allocation(self):
+        self.assertEqual([self.create_file("Памятка") for _ in range(3)], ["pamyatka", "pamyatka-1", "pamyatka-2"])
+
+        # Освободившийся суффикс не переиспользуется: берётся следующий за наибольшим
+        LibraryFile.objects.filter(slug="pamyatka-1").delete()
+        self.assertEqual(self.create_file("Памятка"), "pamyatka-3")
+
+    def test_collision_with_edited_slug(self):
+        self.create_file("Памятка")
+        # Slug, заданный при создании или изменённый позже, тоже занимает суффикс
+        self.create_file("Другое название", slug="pamyatka-7")
+        material = LibraryFile.objects.get(slug="pamyatka")
+        material.slug = "pamyatka-old"
+        material.save()
+
+        self.assertEqual(self.create_file("Памятка"), "pamyatka-8")
+        # Нечисловой хвост (pamyatka-old) суффиксом не считается, base снова свободна
+        LibraryFile.objects.filter(slug__in=["pamyatka-7", "pamyatka-8"]).delete()
+        self.assertEqual(self.create_file("Памятка"), "pamyatka")
+
+        # Заданный вручную slug не меняется при сохранении
+        material.title = "Памятка"
+        material.save()
+        material.refresh_from_db()
+        self.assertEqual(material.slug, "pamyatka-old")
+
+    def test_title_ending_with_number(self):
+        self.assertEqual(self.create_file("Урок 2"), "urok-2")
+        # urok-2 для base urok - суффикс 2
+        self.assertEqual(self.create_file("Урок"), "urok-3")
+        self.assertEqual(self.create_file("Урок 2"), "urok-2-1")
+        self.assertEqual(self.create_file("Урок"), "urok-4")
+
+        # Число длиннее bigint суффиксом не считается и не ломает приведение типа
+        self.assertEqual(self.create_file("Урок 12345678901234567890"), "urok-12345678901234567890")
+        self.assertEqual(self.create_file("Урок"), "urok-5")
+
+    def test_next_slug_single_query(self):
+        for _ in range(5):
+            self.create_file("Памятка")
+        with self.assertNumQueries(1):
+            self.assertEqual(next_slug(LibraryFile.objects.all(), "slug", "pamyatka"), "pamyatka-5")
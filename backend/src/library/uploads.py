@@ -0,0 +1,150 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.core.files import File
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+from django.utils.timezone import now
+from rest_framework import exceptions, status
+
+from .models import UploadSession
+
+# Часть не шире одного PUT: запрос укладывается в client_max_body_size nginx
+MAX_CHUNK_SIZE = 8 * 1024 * 1024
+MAX_FILE_SIZE = 2 * 1024 ** 3
+COPY_BUFFER_SIZE = 64 * 1024
+# Незавершённые загрузки пользователя старше этого срока удаляются при начале новой
+UPLOAD_TTL = timedelta(days=1)
+
+
+class OffsetConflict(exceptions.APIException):
+    """Смещение части не совпадает с уже полученным: клиент продолжает с offset из ответа"""
+    status_code = status.HTTP_409_CONFLICT
+    default_code = 'offset_conflict'
+
+    def __init__(self, detail, offset):
+        super().__init__(detail)
+        # offset остаётся числом, а не строкой ErrorDetail
+        self.detail = {"detail": self.detail, "offset": offset}
+
+
+class UploadedPart(File):
+    """Собранный файл для FileField: FileSystemStorage переносит его в хранилище через os.rename"""
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(COPY_BUFFER_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def start_upload(user, **fields):
+    """Новая загрузка с пустым временным файлом; попутно удаляются брошенные загрузки пользователя"""
+    for expired in UploadSession.objects.filter(user=user, updated_at__lt=now() - UPLOAD_TTL):
+        expired.delete()
+
+    session = UploadSession.objects.create(user=user, **fields)
+    os.makedirs(os.path.dirname(session.path), exist_ok=True)
+    open(session.path, "wb").close()
+    return session
+
+
+def write_chunk(session, offset, stream, length):
+    """
+        Запись части тела запроса во временный файл с позиции offset
+
+        Параметры:
+            - stream: Поток тела запроса, читается блоками COPY_BUFFER_SIZE
+            - length (int): Длина части из Content-Length
+
+        Особенности:
+            - Часть сначала целиком принимается из сети в отдельный временный файл без транзакции:
+              медленный клиент не держит открытую транзакцию и блокировку строки
+            - Строка загрузки блокируется только на копирование принятой части: части одной загрузки
+              пишутся по очереди
+            - Принимается только часть, продолжающая уже полученные байты; после обрыва
+              клиент узнаёт offset (GET или ответ 409) и повторяет часть с него
+    """
+    if not length:
+        raise exceptions.ValidationError({"detail": "Пустая часть: нужен заголовок Content-Length"})
+    if length > MAX_CHUNK_SIZE:
+        raise exceptions.ValidationError({"detail": f"Часть больше {MAX_CHUNK_SIZE} байт"})
+
+    # Предварительная проверка до приёма тела; окончательная - под блокировкой
+    check_chunk(session, offset, length)
+
+    with tempfile.TemporaryFile(dir=os.path.dirname(session.path)) as buffer:
+        received = 0
+        while received < length:
+            block = stream.read(min(COPY_BUFFER_SIZE, length - received))
+            if not block:
+                # Обрыв соединения: смещение не сдвигается, часть повторяется целиком
+                raise exceptions.ParseError("Часть получена не полностью")
+            buffer.write(block)
+            received += len(block)
+
+        with transaction.atomic():
+            session = get_object_or_404(UploadSession.objects.select_for_update(), pk=session.pk)
+            check_chunk(session, offset, length)
+
+            buffer.seek(0)
+            with open(session.path, "r+b") as part:
+                part.seek(offset)
+                shutil.copyfileobj(buffer, part, COPY_BUFFER_SIZE)
+
+            session.offset = offset + length
+            session.save(update_fields=["offset", "updated_at"])
+
+    return session
+
+
+def check_chunk(session, offset, length):
+    if offset != session.offset:
+        raise OffsetConflict("Часть должна начинаться с уже полученного смещения", session.offset)
+    if offset + length > session.size:
+        raise exceptions.ValidationError({"detail": "Часть выходит за объявленный размер файла"})
+
+
+def complete_upload(session, serializer, **save_kwargs):
+    """
+        Сверка SHA-256 собранного файла и создание материала с ним через serializer.save
+
+        Сумма считается до блокировки строки загрузки; под блокировкой проверяется, что
+        загрузка с тех пор не менялась (updated_at). При несовпадении суммы загрузка
+        начинается заново: offset сбрасывается в 0
+    """
+    session = get_object_or_404(UploadSession, pk=session.pk)
+    if session.offset != session.size:
+        raise OffsetConflict("Файл получен не полностью", session.offset)
+
+    digest = file_digest(session.path)
+    hashed_version = session.updated_at
+
+    with transaction.atomic():
+        # Повторное завершение той же загрузки ждёт первое и получает 404
+        session = get_object_or_404(UploadSession.objects.select_for_update(), pk=session.pk)
+
+        if session.offset != session.size or session.updated_at != hashed_version:
+            # Параллельное завершение с несовпавшей суммой успело сбросить загрузку
+            raise OffsetConflict("Файл получен не полностью", session.offset)
+
+        if digest == session.checksum:
+            with UploadedPart(open(session.path, "rb"), name=session.filename) as part:
+                # Сумма уже сверена: хранилище не читает файл повторно
+                part.sha256 = session.checksum
+                instance = serializer.save(file=part, **save_kwargs)
+            session.delete()
+            return instance
+
+        session.offset = 0
+        session.save(update_fields=["offset", "updated_at"])
+
+    raise exceptions.ValidationError({"checksum": ["Контрольная сумма не совпадает, файл нужно загрузить заново"]})
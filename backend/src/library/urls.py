@@ -1,9 +1,10 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import LibraryFileViewSet, LibraryCategoriesView, AllowedFileTypesView
+from .views import LibraryFileViewSet, LibraryCategoriesView, AllowedFileTypesView, LibraryUploadViewSet
 
 router = DefaultRouter()
 router.register(r'files', LibraryFileViewSet, basename='file')
+router.register(r'uploads', LibraryUploadViewSet, basename='upload')
 
 urlpatterns = [
     path('files/categories/', LibraryCategoriesView.as_view()),
@@ -1,18 +1,33 @@
 import logging
+import os
 
+from django.core.files.storage import default_storage
+from django.http import Http404
 from django.utils.decorators import method_decorator
 from django.views.decorators.cache import cache_page
 from drf_spectacular.types import OpenApiTypes
-from drf_spectacular.utils import extend_schema, OpenApiResponse, OpenApiExample
-from rest_framework import permissions, viewsets, filters, status
+from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiResponse, OpenApiExample
+from rest_framework import mixins, permissions, viewsets, status
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.decorators import action, api_view
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import ListAPIView
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from .models import LibraryFile, Category
-from .serializers import LibraryFileSerializer, CategorySerializer
+from core.pagination import KeysetCursorPagination
+from core.query_plan import QueryPlanMixin, plan_queryset
+from .downloads import serve_file
+from .filters import LibraryOrderingFilter, LibrarySearchFilter
+from .models import LibraryFile, Category, UploadSession
+from .serializers import (
+    LibraryFileSerializer,
+    CategorySerializer,
+    LibraryFileCompleteSerializer,
+    UploadSessionSerializer,
+    get_file_type_by_extension,
+)
+from .uploads import complete_upload, start_upload, write_chunk
 
 UNAUTHORIZED_RESPONSE = OpenApiResponse(
     description="Пользователь не авторизован",
@@ -113,21 +128,19 @@ class LibraryCategoriesView(ListAPIView):
 
 
 @extend_schema(tags=["Библиотека"])
-class LibraryFileViewSet(viewsets.ModelViewSet):
+class LibraryFileViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     queryset = LibraryFile.objects.all()
     serializer_class = LibraryFileSerializer
     permission_classes = [permissions.IsAuthenticated, IsAuthorOrReadOnly]
+    pagination_class = KeysetCursorPagination
 
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, filters.SearchFilter]
+    # Поиск стоит перед сортировкой: он добавляет аннотацию search_rank
+    filter_backends = [DjangoFilterBackend, LibrarySearchFilter, LibraryOrderingFilter]
     filterset_fields = ['categories', 'file_type', 'author']
     ordering_fields = ['title', 'created_at']
-    ordering = ['-created_at']  # по умолчанию новые сверху
-    search_fields = ['title', 'description', 'author__profile__full_name', 'author__username']
+    ordering = ['-created_at']  # по умолчанию новые сверху, при поиске - по релевантности
     lookup_field = 'slug'
 
-    def get_queryset(self):
-        return super().get_queryset().select_related('author__profile')
-
     @extend_schema(
         summary="Список избранных файлов пользователя",
         description="Возвращает список файлов, которые пользователь отметил как избранные",
@@ -138,18 +151,22 @@ class LibraryFileViewSet(viewsets.ModelViewSet):
                 examples=[
                     OpenApiExample(
                         "Пример ответа",
-                        value=[
-                            {
-                                "slug": "primer-dokumenta",
-                                "title": "Пример документа",
-                                "description": "Описание документа",
-                                "file_type": "document",
-                                "file": "https://methodical-space.ru/media/library/2026/02/primer.pdf",
-                                "category_details": [{"id": 1, "name": "Чек-лист"}],
-                                "author_name": "ivan",
-                                "created_at": "2026-02-10T12:00:00Z"
-                            }
-                        ]
+                        value={
+                            "next": "https://methodical-space.ru/api/library/files/favorites/?cursor=eyJwIjpbIjIwMjYtMDItMTBUMTI6MDA6MDBaIiwxMl19",
+                            "previous": None,
+                            "results": [
+                                {
+                                    "slug": "primer-dokumenta",
+                                    "title": "Пример документа",
+                                    "description": "Описание документа",
+                                    "file_type": "document",
+                                    "file": "https://methodical-space.ru/api/library/files/primer-dokumenta/download/",
+                                    "category_details": [{"id": 1, "name": "Чек-лист"}],
+                                    "author_name": "ivan",
+                                    "created_at": "2026-02-10T12:00:00Z"
+                                }
+                            ]
+                        }
                     )
                 ]
             ),
@@ -159,9 +176,10 @@ class LibraryFileViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
     def favorites(self, request):
         profile = request.user.profile
-        favorite_files = profile.favorites.all()
-        serializer = self.get_serializer(favorite_files, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        favorite_files = plan_queryset(profile.favorites.all(), self.get_serializer_class())
+        page = self.paginate_queryset(favorite_files)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
     @extend_schema(
         summary="Добавление файла в избранное авторизованного пользователя",
@@ -198,12 +216,67 @@ class LibraryFileViewSet(viewsets.ModelViewSet):
         profile.favorites.remove(file)
         return Response({"detail": "Удалено из избранного"}, status=status.HTTP_200_OK)
 
+    @extend_schema(
+        summary="Скачивание файла",
+        description=(
+                "Отдаёт содержимое файла после проверки авторизации. "
+                "Поддерживаются запросы диапазонов (Range, If-Range) для перемотки видео "
+                "и условные запросы по ETag/Last-Modified"
+        ),
+        parameters=[
+            OpenApiParameter("Range", OpenApiTypes.STR, OpenApiParameter.HEADER, required=False,
+                             description="Диапазон байт, например bytes=0-1048575"),
+        ],
+        responses={
+            (status.HTTP_200_OK, "application/octet-stream"): OpenApiTypes.BINARY,
+            (status.HTTP_206_PARTIAL_CONTENT, "application/octet-stream"): OpenApiTypes.BINARY,
+            status.HTTP_304_NOT_MODIFIED: OpenApiResponse(description="Файл не изменился"),
+            status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE: OpenApiResponse(description="Диапазон вне файла"),
+            status.HTTP_401_UNAUTHORIZED: UNAUTHORIZED_RESPONSE,
+            status.HTTP_404_NOT_FOUND: NOT_FOUND_RESPONSE
+        }
+    )
+    @action(detail=True, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def download(self, request, slug=None):
+        file = self.get_object()
+        filename = file.slug + os.path.splitext(file.file.name)[1]
+        return serve_file(request, file.file.storage, file.file.name, filename)
+
+    @extend_schema(
+        summary="Превью файла",
+        description=(
+                "WebP-вариант материала (thumb, preview) после фоновой обработки. "
+                "Превью документов и кадры видео раскрывают содержимое, поэтому отдаются "
+                "с той же проверкой авторизации, что и сам файл"
+        ),
+        responses={
+            (status.HTTP_200_OK, "image/webp"): OpenApiTypes.BINARY,
+            status.HTTP_304_NOT_MODIFIED: OpenApiResponse(description="Файл не изменился"),
+            status.HTTP_401_UNAUTHORIZED: UNAUTHORIZED_RESPONSE,
+            status.HTTP_404_NOT_FOUND: NOT_FOUND_RESPONSE
+        }
+    )
+    @action(detail=True, methods=['get'], url_path=r'variants/(?P<key>\w+)',
+            permission_classes=[permissions.IsAuthenticated])
+    def variant(self, request, slug=None, key=None):
+        file = self.get_object()
+        name = file.variants.get(key)
+        if name is None:
+            raise Http404("Превью не найдено")
+        return serve_file(request, default_storage, name, f"{file.slug}-{key}.webp", as_attachment=False)
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
     @extend_schema(
         summary="Список файлов",
-        description="Возвращает список всех файлов с возможностью фильтрации, поиска и сортировки",
+        description=(
+                "Возвращает список файлов с возможностью фильтрации, поиска и сортировки.\n\n"
+                "Поиск (параметр search) полнотекстовый: по названию, описанию, ФИО и логину автора. "
+                "Без явного ordering результаты поиска упорядочены по релевантности.\n\n"
+                "Список разбит на страницы: для перехода используйте ссылки next/previous "
+                "(параметр cursor), размер страницы задаётся параметром page_size"
+        ),
         responses={
             status.HTTP_200_OK: OpenApiResponse(
                 description="Успешный ответ",
@@ -211,18 +284,22 @@ class LibraryFileViewSet(viewsets.ModelViewSet):
                 examples=[
                     OpenApiExample(
                         "Пример ответа",
-                        value=[
-                            {
-                                "slug": "primer-dokumenta",
-                                "title": "Пример документа",
-                                "description": "Описание документа",
-                                "file_type": "document",
-                                "file": "https://methodical-space.ru/media/library/2026/02/primer.pdf",
-                                "category_details": [{"id": 1, "name": "Чек-лист"}],
-                                "author_name": "ivan",
-                                "created_at": "2026-02-10T12:00:00Z"
-                            }
-                        ]
+                        value={
+                            "next": "https://methodical-space.ru/api/library/files/?cursor=eyJwIjpbIjIwMjYtMDItMTBUMTI6MDA6MDBaIiwxMl19",
+                            "previous": None,
+                            "results": [
+                                {
+                                    "slug": "primer-dokumenta",
+                                    "title": "Пример документа",
+                                    "description": "Описание документа",
+                                    "file_type": "document",
+                                    "file": "https://methodical-space.ru/api/library/files/primer-dokumenta/download/",
+                                    "category_details": [{"id": 1, "name": "Чек-лист"}],
+                                    "author_name": "ivan",
+                                    "created_at": "2026-02-10T12:00:00Z"
+                                }
+                            ]
+                        }
                     )
                 ]
 
@@ -247,7 +324,7 @@ class LibraryFileViewSet(viewsets.ModelViewSet):
                             "title": "Пример документа",
                             "description": "Описание документа",
                             "file_type": "document",
-                            "file": "https://methodical-space.ru/media/library/2026/02/primer.pdf",
+                            "file": "https://methodical-space.ru/api/library/files/primer-dokumenta/download/",
                             "category_details": [{"id": 1, "name": "Чек-лист"}],
                             "author_name": "ivan",
                             "created_at": "2026-02-10T12:00:00Z"
@@ -287,7 +364,7 @@ class LibraryFileViewSet(viewsets.ModelViewSet):
                             "title": "Новый документ",
                             "description": "Описание нового документа",
                             "file_type": "document",
-                            "file": "https://methodical-space.ru/media/library/2026/02/novyy.pdf",
+                            "file": "https://methodical-space.ru/api/library/files/novyy-dokument/download/",
                             "category_details": [{"id": 1, "name": "Чек-лист"}, {"id": 2, "name": "Тест"}],
                             "author_name": "ivan",
                             "created_at": "2026-02-10T12:10:00Z"
@@ -335,8 +412,11 @@ class LibraryFileViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(data=request.data)
         if not serializer.is_valid():
             logger.debug("Ошибка сериализатора: %s", serializer.errors)
+            raise ValidationError(serializer.errors)
 
-        return super().create(request, *args, **kwargs)
+        self.perform_create(serializer)
+        headers = self.get_success_headers(serializer.data)
+        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
     @extend_schema(
         summary="Полное обновление файла",
@@ -454,3 +534,155 @@ class LibraryFileViewSet(viewsets.ModelViewSet):
     )
     def destroy(self, request, *args, **kwargs):
         return super().destroy(request, *args, **kwargs)
+
+
+UPLOAD_EXAMPLE = {
+    "id": "0b6f1c1e-8d1e-4a53-9f57-3f0c2a7d9e41",
+    "filename": "lekciya.mp4",
+    "size": 734003200,
+    "checksum": "9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08",
+    "offset": 8388608,
+    "chunk_size": 8388608,
+    "created_at": "2026-10-17T12:00:00Z"
+}
+
+
+@extend_schema(tags=["Библиотека"])
+class LibraryUploadViewSet(mixins.CreateModelMixin,
+                           mixins.RetrieveModelMixin,
+                           mixins.DestroyModelMixin,
+                           viewsets.GenericViewSet):
+    """
+        Загрузка больших файлов частями с возобновлением
+
+        Порядок:
+            1. POST uploads/ - имя, размер и SHA-256 файла, в ответе id и chunk_size
+            2. PUT uploads/{id}/?offset=N - тело запроса - байты части (не больше chunk_size)
+            3. POST uploads/{id}/complete/ - поля материала, создаётся LibraryFile
+
+        После обрыва GET uploads/{id}/ возвращает offset, с которого продолжить
+    """
+    serializer_class = UploadSessionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return UploadSession.objects.filter(user=self.request.user)
+
+    def perform_create(self, serializer):
+        serializer.instance = start_upload(self.request.user, **serializer.validated_data)
+
+    @extend_schema(
+        summary="Начать загрузку файла частями",
+        responses={
+            status.HTTP_201_CREATED: OpenApiResponse(
+                response=UploadSessionSerializer,
+                examples=[OpenApiExample("Пример ответа", value={**UPLOAD_EXAMPLE, "offset": 0})]
+            ),
+            status.HTTP_400_BAD_REQUEST: OpenApiResponse(description="Неподдерживаемый формат или размер"),
+            status.HTTP_401_UNAUTHORIZED: UNAUTHORIZED_RESPONSE,
+        }
+    )
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
+    @extend_schema(
+        summary="Состояние загрузки",
+        description="offset - сколько байт уже получено; следующая часть отправляется с этого смещения",
+        responses={
+            status.HTTP_200_OK: OpenApiResponse(
+                response=UploadSessionSerializer,
+                examples=[OpenApiExample("Пример ответа", value=UPLOAD_EXAMPLE)]
+            ),
+            status.HTTP_401_UNAUTHORIZED: UNAUTHORIZED_RESPONSE,
+        }
+    )
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @extend_schema(
+        summary="Отправить часть файла",
+        description=(
+                "Тело запроса - байты части (application/octet-stream), не больше chunk_size. "
+                "Часть пишется сразу во временный файл и должна начинаться с текущего offset загрузки, "
+                "иначе ответ 409 с актуальным offset"
+        ),
+        parameters=[OpenApiParameter("offset", int, required=True, description="Смещение части в файле")],
+        request={"application/octet-stream": OpenApiTypes.BINARY},
+        responses={
+            status.HTTP_200_OK: OpenApiResponse(
+                response=UploadSessionSerializer,
+                examples=[OpenApiExample("Пример ответа", value=UPLOAD_EXAMPLE)]
+            ),
+            status.HTTP_409_CONFLICT: OpenApiResponse(
+                response=OpenApiTypes.OBJECT,
+                examples=[OpenApiExample(
+                    "Неверное смещение",
+                    value={"detail": "Часть должна начинаться с уже полученного смещения", "offset": 8388608}
+                )]
+            ),
+            status.HTTP_401_UNAUTHORIZED: UNAUTHORIZED_RESPONSE,
+        }
+    )
+    def update(self, request, *args, **kwargs):
+        try:
+            offset = int(request.query_params["offset"])
+        except (KeyError, ValueError):
+            raise ValidationError({"offset": ["Нужно целое смещение части."]})
+
+        try:
+            length = int(request.headers.get("Content-Length") or 0)
+        except ValueError:
+            raise ValidationError({"detail": "Некорректный заголовок Content-Length"})
+        if length < 0:
+            raise ValidationError({"detail": "Некорректный заголовок Content-Length"})
+        # Тело читается потоком напрямую, без парсеров DRF
+        session = write_chunk(self.get_object(), offset, request.stream, length)
+        return Response(self.get_serializer(session).data)
+
+    @extend_schema(
+        summary="Отменить загрузку",
+        responses={
+            status.HTTP_204_NO_CONTENT: OpenApiResponse(description="Загрузка и временный файл удалены"),
+            status.HTTP_401_UNAUTHORIZED: UNAUTHORIZED_RESPONSE,
+        }
+    )
+    def destroy(self, request, *args, **kwargs):
+        return super().destroy(request, *args, **kwargs)
+
+    @extend_schema(
+        summary="Завершить загрузку",
+        description=(
+                "Сверяет SHA-256 собранного файла и создаёт методический материал. "
+                "Тип файла определяется по имени из загрузки. "
+                "Если сумма не совпала, offset сбрасывается в 0 и файл загружается заново"
+        ),
+        request=LibraryFileCompleteSerializer,
+        responses={
+            status.HTTP_201_CREATED: LibraryFileSerializer,
+            status.HTTP_400_BAD_REQUEST: OpenApiResponse(
+                response=OpenApiTypes.OBJECT,
+                examples=[OpenApiExample(
+                    "Контрольная сумма не совпала",
+                    value={"checksum": ["Контрольная сумма не совпадает, файл нужно загрузить заново"]}
+                )]
+            ),
+            status.HTTP_409_CONFLICT: OpenApiResponse(description="Файл получен не полностью"),
+            status.HTTP_401_UNAUTHORIZED: UNAUTHORIZED_RESPONSE,
+        }
+    )
+    @action(detail=True, methods=['post'])
+    def complete(self, request, pk=None):
+        session = self.get_object()
+        serializer = LibraryFileCompleteSerializer(data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+
+        instance = complete_upload(
+            session,
+            serializer,
+            author=request.user,
+            file_type=get_file_type_by_extension(session.filename)
+        )
+        return Response(
+            LibraryFileSerializer(instance, context=self.get_serializer_context()).data,
+            status=status.HTTP_201_CREATED
+        )
@@ -4,6 +4,8 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 import random
+
+from core.views import AsyncAPIViewMixin
 from .models import WeeklyGoal, Quote
 from .serilizers import WeeklyGoalSerializer
 
@@ -11,7 +13,7 @@ from .serilizers import WeeklyGoalSerializer
 @extend_schema(
     tags=["Главная страница"]
 )
-class WeeklyGoalViewSet(viewsets.GenericViewSet):
+class WeeklyGoalViewSet(AsyncAPIViewMixin, viewsets.GenericViewSet):
     serializer_class = WeeklyGoalSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -31,8 +33,8 @@ class WeeklyGoalViewSet(viewsets.GenericViewSet):
         }
     )
     @action(detail=False, methods=["get"], url_path="current")
-    def current(self, request):
-        obj = self.get_object()
+    async def current(self, request):
+        obj = await self.get_queryset().afirst()
         if not obj:
             return Response(status=status.HTTP_404_NOT_FOUND)
 
@@ -83,7 +85,7 @@ class WeeklyGoalViewSet(viewsets.GenericViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class RandomQuoteView(APIView):
+class RandomQuoteView(AsyncAPIViewMixin, APIView):
 
     @extend_schema(
         tags=["Главная страница"],
@@ -103,9 +105,9 @@ class RandomQuoteView(APIView):
             )
         ]
     )
-    def get(self, request):
-        count = Quote.objects.count()
+    async def get(self, request):
+        count = await Quote.objects.acount()
         random_index = random.randint(0, count - 1)
-        quote = Quote.objects.all()[random_index]
+        quote = await Quote.objects.all()[random_index:random_index + 1].aget()
 
         return Response({"quote": quote.text})
@@ -0,0 +1,34 @@
+from django.contrib import admin
+from .models import MediaJob
+
+
+@admin.register(MediaJob)
+class MediaJobAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "target",
+        "object_id",
+        "status",
+        "attempts",
+        "run_after",
+        "updated_at",
+    )
+
+    list_filter = (
+        "status",
+        "target",
+    )
+
+    search_fields = (
+        "source",
+    )
+
+    readonly_fields = (
+        "target",
+        "object_id",
+        "source",
+        "attempts",
+        "error",
+        "created_at",
+        "updated_at",
+    )
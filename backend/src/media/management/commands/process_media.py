@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from media.processing import claim_jobs, enqueue_missing, run_job
+
+POLL_INTERVAL = 2
+
+
+class Command(BaseCommand):
+    help = (
+        "Обработчик очереди media.MediaJob: превью и WebP-варианты загруженных файлов. "
+        "Несколько обработчиков можно запускать параллельно - задачи не пересекаются"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch", type=int, default=10, help="Задач за один захват")
+        parser.add_argument("--once", action="store_true", help="Обработать готовые задачи и выйти")
+        parser.add_argument("--enqueue-missing", action="store_true",
+                            help="Поставить в очередь уже загруженные файлы без вариантов")
+
+    def handle(self, *args, **options):
+        if options["enqueue_missing"]:
+            self.stdout.write(f"Поставлено задач: {enqueue_missing()}")
+
+        while True:
+            close_old_connections()
+            jobs = claim_jobs(options["batch"])
+            for job in jobs:
+                run_job(job)
+                self.stdout.write(f"{job} ({job.attempts})")
+
+            if options["once"] and not jobs:
+                return
+            if not jobs:
+                time.sleep(POLL_INTERVAL)
@@ -0,0 +1,52 @@
+from django.db import models
+from django.utils.timezone import now
+
+
+class MediaJob(models.Model):
+    """
+        Задача фоновой обработки загруженного файла (media.processing)
+
+        Поля:
+            - target (str): Модель с файлом, например "library.LibraryFile"
+            - object_id (int): id записи
+            - source (str): Имя файла на момент постановки; если файл с тех пор заменён, задача устарела
+            - status (str): Статус задачи
+            - attempts (int): Число начатых попыток
+            - run_after (datetime): Не раньше этого времени задача берётся в работу;
+              у выполняемой задачи - срок аренды, после которого её может взять другой обработчик
+            - error (str): Текст последней ошибки
+
+        Примечания:
+            - Очередь - частичный индекс media_job_queue по незавершённым задачам,
+              обработчики забирают задачи через SELECT ... FOR UPDATE SKIP LOCKED
+    """
+
+    class StatusType(models.TextChoices):
+        PENDING = "pending", "В очереди"
+        RUNNING = "running", "Выполняется"
+        DONE = "done", "Готово"
+        FAILED = "failed", "Ошибка"
+
+    target = models.CharField(max_length=100)
+    object_id = models.PositiveBigIntegerField()
+    source = models.CharField(max_length=255)
+    status = models.CharField(max_length=10, choices=StatusType.choices, default=StatusType.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_after = models.DateTimeField(default=now)
+    error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["target", "object_id"]),
+            models.Index(
+                fields=["run_after", "id"],
+                name="media_job_queue",
+                condition=models.Q(status__in=["pending", "running"]),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.target}:{self.object_id} - {self.status}"
@@ -0,0 +1,255 @@
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+from datetime import timedelta
+
+from PIL import Image, ImageOps
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q
+from django.utils.timezone import now
+
+from .models import MediaJob
+
+logger = logging.getLogger("media")
+
+# Обрабатываемые поля: куда пишутся варианты и какие размеры (наибольшая сторона, px) делаются
+TARGETS = {
+    "library.LibraryFile": {
+        "field": "file",
+        "variants_field": "variants",
+        "prefix": "library/variants",
+        "sizes": {"thumb": 320, "preview": 1280},
+        # Файлы адресуются по содержимому: варианты общие у материалов с одинаковым файлом
+        "shared": True,
+        "drop_invalid": False,
+    },
+    "users.Profile": {
+        "field": "photo",
+        "variants_field": "photo_variants",
+        "prefix": "profiles/variants",
+        "sizes": {"thumb": 96, "medium": 400},
+        "shared": False,
+        # Фото проверяется полным декодированием только здесь, а не в запросе (users.models.validate_image)
+        "drop_invalid": True,
+    },
+}
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
+VIDEO_EXTENSIONS = {".mp4"}
+DOCUMENT_EXTENSIONS = {".pdf"}
+
+WEBP_QUALITY = 80
+EXTERNAL_TIMEOUT = 120
+
+# Аренда задачи: если обработчик упал, задачу через этот срок заберёт другой
+JOB_LEASE = timedelta(minutes=10)
+MAX_ATTEMPTS = 3
+RETRY_DELAY = timedelta(minutes=1)
+
+
+class InvalidMedia(Exception):
+    """Файл не удаётся декодировать: повтор не поможет"""
+
+
+def enqueue(instance):
+    """Задача на обработку текущего файла записи (в той же транзакции, что и сама запись)"""
+    config = TARGETS[instance._meta.label]
+    MediaJob.objects.create(
+        target=instance._meta.label,
+        object_id=instance.pk,
+        source=getattr(instance, config["field"]).name,
+    )
+
+
+def variants_dir(config, name):
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return f"{config['prefix']}/{stem}"
+
+
+def remove_variants(label, name):
+    """Удаление вариантов файла с диска"""
+    shutil.rmtree(default_storage.path(variants_dir(TARGETS[label], name)), ignore_errors=True)
+
+
+def variant_urls(variants, request=None):
+    """Публичные ссылки на готовые варианты (фото профиля); превью материалов отдаёт library с проверкой прав"""
+    urls = {}
+    for key, name in (variants or {}).items():
+        url = default_storage.url(name)
+        urls[key] = request.build_absolute_uri(url) if request is not None else url
+    return urls
+
+
+def run_external(command):
+    subprocess.run(command, check=True, capture_output=True, timeout=EXTERNAL_TIMEOUT)
+
+
+def render_source(path, workdir):
+    """
+        Кадр для вариантов: само изображение, первая страница PDF или кадр-постер MP4
+
+        Возвращает None, если для формата нет вариантов или нужной утилиты (pdftoppm, ffmpeg)
+    """
+    ext = os.path.splitext(path)[1].lower()
+
+    if ext in IMAGE_EXTENSIONS:
+        return path
+
+    if ext in DOCUMENT_EXTENSIONS and shutil.which("pdftoppm"):
+        output = os.path.join(workdir, "page")
+        run_external(["pdftoppm", "-f", "1", "-l", "1", "-png", "-singlefile", "-scale-to", "1600", path, output])
+        return output + ".png"
+
+    if ext in VIDEO_EXTENSIONS and shutil.which("ffmpeg"):
+        output = os.path.join(workdir, "poster.png")
+        # Фильтр thumbnail выбирает характерный кадр среди первых, а не чёрный первый кадр
+        run_external(["ffmpeg", "-v", "error", "-y", "-i", path, "-vf", "thumbnail", "-frames:v", "1", output])
+        return output
+
+    return None
+
+
+def open_image(path):
+    try:
+        image = Image.open(path)
+        image.load()
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError) as exc:
+        raise InvalidMedia(str(exc))
+
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "PA") else "RGB")
+    return image
+
+
+def save_webp(image, name):
+    """Запись варианта через временный файл: читатели не видят его недописанным"""
+    path = default_storage.path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), suffix=".tmp", delete=False) as temp:
+        image.save(temp, "WEBP", quality=WEBP_QUALITY)
+    os.replace(temp.name, path)
+
+
+def build_variants(config, field_file):
+    """Варианты файла в WebP; уже существующие общие варианты не пересчитываются"""
+    directory = variants_dir(config, field_file.name)
+    variants = {key: f"{directory}/{key}.webp" for key in config["sizes"]}
+
+    if config["shared"] and all(default_storage.exists(name) for name in variants.values()):
+        return variants
+
+    with tempfile.TemporaryDirectory() as workdir:
+        source = render_source(field_file.path, workdir)
+        if source is None:
+            return {}
+
+        image = open_image(source)
+        for key, size in config["sizes"].items():
+            variant = image.copy()
+            variant.thumbnail((size, size))
+            save_webp(variant, variants[key])
+
+    return variants
+
+
+def claim_jobs(limit):
+    """Закрепление до limit готовых к выполнению задач за этим обработчиком"""
+    current = now()
+
+    with transaction.atomic():
+        jobs = list(
+            MediaJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(
+                Q(status=MediaJob.StatusType.PENDING) | Q(status=MediaJob.StatusType.RUNNING),
+                run_after__lte=current
+            )
+            .order_by("run_after", "id")[:limit]
+        )
+
+        for job in jobs:
+            job.status = MediaJob.StatusType.RUNNING
+            job.run_after = current + JOB_LEASE
+            job.attempts += 1
+        MediaJob.objects.bulk_update(jobs, ["status", "run_after", "attempts"])
+
+    return jobs
+
+
+def process_job(job):
+    """Выполнение задачи; запись получает варианты, только если её файл не изменился"""
+    config = TARGETS[job.target]
+    model = apps.get_model(job.target)
+    instance = model.objects.filter(pk=job.object_id, **{config["field"]: job.source}).first()
+    if instance is None:
+        # Запись удалена или файл заменён - для нового файла поставлена своя задача
+        return
+
+    field_file = getattr(instance, config["field"])
+    try:
+        variants = build_variants(config, field_file)
+    except InvalidMedia:
+        if config["drop_invalid"]:
+            field_file.delete(save=False)
+            setattr(instance, config["field"], None)
+            instance.save()
+        raise
+
+    updated = model.objects.filter(pk=job.object_id, **{config["field"]: job.source}).update(
+        **{config["variants_field"]: variants}
+    )
+    if not updated and not config["shared"]:
+        remove_variants(job.target, job.source)
+
+
+def run_job(job):
+    try:
+        process_job(job)
+    except InvalidMedia as exc:
+        job.status = MediaJob.StatusType.FAILED
+        job.error = str(exc)
+    except Exception as exc:
+        logger.exception("Ошибка обработки %s", job)
+        job.error = str(exc)
+        if job.attempts >= MAX_ATTEMPTS:
+            job.status = MediaJob.StatusType.FAILED
+        else:
+            job.status = MediaJob.StatusType.PENDING
+            job.run_after = now() + RETRY_DELAY * job.attempts
+    else:
+        job.status = MediaJob.StatusType.DONE
+        job.error = ""
+
+    job.save(update_fields=["status", "error", "run_after", "updated_at"])
+
+
+def enqueue_missing():
+    """Задачи для уже загруженных файлов без вариантов; возвращает число поставленных задач"""
+    count = 0
+    for label, config in TARGETS.items():
+        model = apps.get_model(label)
+        queued = MediaJob.objects.filter(
+            target=label,
+            status__in=[MediaJob.StatusType.PENDING, MediaJob.StatusType.RUNNING]
+        ).values("object_id")
+        pending = (
+            model.objects
+            .exclude(**{config["field"]: ""})
+            .exclude(**{f"{config['field']}__isnull": True})
+            .filter(**{config["variants_field"]: {}})
+            .exclude(pk__in=queued)
+            .only("pk", config["field"])
+        )
+        jobs = [
+            MediaJob(target=label, object_id=instance.pk, source=getattr(instance, config["field"]).name)
+            for instance in pending.iterator()
+        ]
+        MediaJob.objects.bulk_create(jobs, batch_size=1000)
+        count += len(jobs)
+    return count
@@ -0,0 +1,63 @@
+from django.apps import apps
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+
+from .processing import TARGETS, enqueue, remove_variants
+
+
+def file_name(instance, config):
+    # Через __dict__: отложенное (only/defer) поле файла не загружается отдельным запросом
+    value = instance.__dict__.get(config["field"])
+    return getattr(value, "name", value) or ""
+
+
+def connect(label, config):
+    model = apps.get_model(label)
+
+    def remember_file(sender, instance, **kwargs):
+        instance._media_source = file_name(instance, config)
+
+    def reset_variants(sender, instance, **kwargs):
+        """Варианты прежнего файла к новому не относятся: сбрасываются до обработки нового"""
+        previous = getattr(instance, "_media_source", "")
+        if instance._state.adding or file_name(instance, config) == previous:
+            return
+
+        setattr(instance, config["variants_field"], {})
+        if previous and not config["shared"]:
+            transaction.on_commit(lambda: remove_variants(label, previous))
+
+    def enqueue_processing(sender, instance, created, update_fields=None, **kwargs):
+        current = file_name(instance, config)
+        previous = getattr(instance, "_media_source", "")
+        instance._media_source = current
+        if not created and current == previous:
+            return
+
+        if update_fields is not None and config["variants_field"] not in update_fields:
+            # save(update_fields=...) не записал сброшенные в pre_save варианты
+            model.objects.filter(pk=instance.pk).update(**{config["variants_field"]: {}})
+        if current:
+            enqueue(instance)
+
+    def remove_deleted_variants(sender, instance, **kwargs):
+        name = file_name(instance, config)
+        if name and not config["shared"]:
+            transaction.on_commit(lambda: remove_variants(label, name))
+
+    post_init.connect(remember_file, sender=model, weak=False)
+    pre_save.connect(reset_variants, sender=model, weak=False)
+    post_save.connect(enqueue_processing, sender=model, weak=False)
+    post_delete.connect(remove_deleted_variants, sender=model, weak=False)
+
+
+for target_label, target_config in TARGETS.items():
+    connect(target_label, target_config)
+
+
+def remove_blob_variants(sender, instance, **kwargs):
+    """Общие варианты методических материалов удаляются вместе с последней ссылкой на файл"""
+    transaction.on_commit(lambda: remove_variants("library.LibraryFile", instance.name))
+
+
+post_delete.connect(remove_blob_variants, sender=apps.get_model("library", "Blob"), weak=False)
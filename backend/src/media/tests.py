@@ -0,0 +1,185 @@
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+
+from PIL import Image
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils.timezone import now
+
+from library.models import LibraryFile
+from users.serializers import ProfileSerializer
+from . import processing
+from .models import MediaJob
+
+
+def png_bytes(size=(640, 480)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, "orange").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class MediaTestCase(TestCase):
+    """Файлы и варианты тестов пишутся во временный MEDIA_ROOT"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.user = User.objects.create_user(username='metodist')
+
+    def create_material(self, content=None, name="shema.png"):
+        return LibraryFile.objects.create(
+            title="Схема", file_type='image', author=self.user, file=ContentFile(content or png_bytes(), name=name)
+        )
+
+    def run_jobs(self):
+        jobs = processing.claim_jobs(10)
+        for job in jobs:
+            processing.run_job(job)
+        return jobs
+
+    def jobs(self):
+        return list(MediaJob.objects.order_by('id').values_list('object_id', 'source', 'status'))
+
+
+class MediaQueueTest(MediaTestCase):
+    """Очередь обработки: постановка при записи файла, захват задач под арендой, повторный захват"""
+
+    def test_enqueue_on_file_change(self):
+        material = self.create_material()
+        self.assertEqual(self.jobs(), [(material.id, material.file.name, "pending")])
+
+        # Сохранение без смены файла задач не ставит
+        material.title = "Новая схема"
+        material.save()
+        self.assertEqual(len(self.jobs()), 1)
+
+        material.file = ContentFile(png_bytes((100, 100)), name="shema.png")
+        material.save()
+        self.assertEqual(self.jobs()[1], (material.id, material.file.name, "pending"))
+
+    def test_claim_takes_lease(self):
+        first, second = self.create_material(), self.create_material(png_bytes((10, 10)))
+
+        claimed = processing.claim_jobs(1)
+        self.assertEqual([job.object_id for job in claimed], [first.id])
+        job = MediaJob.objects.get(pk=claimed[0].pk)
+        self.assertEqual((job.status, job.attempts), ("running", 1))
+        self.assertGreater(job.run_after, now() + processing.JOB_LEASE - timedelta(minutes=1))
+
+        # Задача под арендой другим обработчикам не выдаётся
+        self.assertEqual([job.object_id for job in processing.claim_jobs(10)], [second.id])
+        self.assertEqual(processing.claim_jobs(10), [])
+
+        # Обработчик упал: после истечения аренды задачу берёт другой
+        MediaJob.objects.filter(pk=job.pk).update(run_after=now() - timedelta(seconds=1))
+        reclaimed = processing.claim_jobs(10)
+        self.assertEqual([(job.object_id, job.attempts) for job in reclaimed], [(first.id, 2)])
+
+    def test_enqueue_missing(self):
+        material = self.create_material()
+        MediaJob.objects.all().delete()
+
+        self.assertEqual(processing.enqueue_missing(), 1)
+        # Файл уже в очереди - повторно не ставится
+        self.assertEqual(processing.enqueue_missing(), 0)
+        self.assertEqual(self.jobs(), [(material.id, material.file.name, "pending")])
+
+
+class MediaProcessingTest(MediaTestCase):
+    """Обработка: WebP-варианты, устаревшие задачи, сброс вариантов при замене файла, некорректные файлы"""
+
+    def test_variants_built(self):
+        material = self.create_material()
+        self.run_jobs()
+
+        material.refresh_from_db()
+        self.assertEqual(set(material.variants), {"thumb", "preview"})
+        with default_storage.open(material.variants["thumb"]) as variant:
+            image = Image.open(variant)
+            self.assertEqual((image.format, max(image.size)), ("WEBP", 320))
+        self.assertEqual(self.jobs()[0][2], "done")
+
+    def test_replaced_file_resets_variants(self):
+        material = self.create_material()
+        self.run_jobs()
+        material.refresh_from_db()
+        self.assertTrue(material.variants)
+
+        material.file = ContentFile(png_bytes((100, 100)), name="shema.png")
+        material.save()
+        material.refresh_from_db()
+        self.assertEqual(material.variants, {})
+
+        # Задача прежнего файла уже выполнена, новая строит варианты нового файла
+        self.run_jobs()
+        material.refresh_from_db()
+        with default_storage.open(material.variants["preview"]) as variant:
+            self.assertEqual(Image.open(variant).size, (100, 100))
+
+    def test_stale_job_skipped(self):
+        material = self.create_material()
+        stale = processing.claim_jobs(10)
+
+        material.file = ContentFile(png_bytes((100, 100)), name="shema.png")
+        material.save()
+        for job in stale:
+            processing.run_job(job)
+
+        material.refresh_from_db()
+        self.assertEqual(material.variants, {})
+        self.assertEqual([job.object_id for job in processing.claim_jobs(10)], [material.id])
+
+    def test_profile_photo_replacement_removes_old_variants(self):
+        profile = self.user.profile
+        profile.photo = ContentFile(png_bytes(), name="photo.png")
+        profile.save()
+        self.run_jobs()
+        profile.refresh_from_db()
+        old_variant = profile.photo_variants["thumb"]
+        self.assertTrue(default_storage.exists(old_variant))
+
+        profile.photo = ContentFile(png_bytes((50, 50)), name="photo.png")
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.save()
+
+        profile.refresh_from_db()
+        self.assertEqual(profile.photo_variants, {})
+        self.assertFalse(default_storage.exists(old_variant))
+
+    def test_corrupt_profile_photo_dropped(self):
+        corrupt = png_bytes()[:200]
+        serializer = ProfileSerializer(
+            self.user.profile, data={'photo': SimpleUploadedFile("photo.png", corrupt)}, partial=True
+        )
+        # В запросе проверяется только заголовок: фото сохраняется
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        profile = serializer.save()
+        name = profile.photo.name
+        self.assertTrue(default_storage.exists(name))
+
+        self.run_jobs()
+
+        profile.refresh_from_db()
+        self.assertFalse(profile.photo)
+        self.assertFalse(default_storage.exists(name))
+        job = MediaJob.objects.get(source=name)
+        self.assertEqual(job.status, "failed")
+        self.assertTrue(job.error)
+
+    def test_corrupt_library_file_kept(self):
+        material = self.create_material(png_bytes()[:200])
+        self.run_jobs()
+
+        material.refresh_from_db()
+        self.assertTrue(default_storage.exists(material.file.name))
+        self.assertEqual(material.variants, {})
+        self.assertEqual(self.jobs()[0][2], "failed")
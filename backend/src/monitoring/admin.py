@@ -2,6 +2,7 @@ from django.contrib import admin
 from .models import (
     Indicator,
     IndicatorValue,
+    IndicatorRollup,
     MonthlyEnvironmentIndex
 )
 
@@ -41,7 +42,30 @@ class MonthlyEnvironmentIndexAdmin(admin.ModelAdmin):
     list_display = (
         "period",
         "index_value",
+        "values_count",
         "calculated_at",
     )
 
     ordering = ("-period",)
+
+
+@admin.register(IndicatorRollup)
+class IndicatorRollupAdmin(admin.ModelAdmin):
+    list_display = (
+        "period",
+        "indicator",
+        "organization",
+        "values_count",
+        "score_sum",
+    )
+
+    list_filter = (
+        "indicator",
+        "period",
+    )
+
+    search_fields = (
+        "organization",
+    )
+
+    ordering = ("-period",)
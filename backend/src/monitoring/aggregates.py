@@ -0,0 +1,241 @@
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Count, ExpressionWrapper, F, FloatField, Q, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.utils import timezone
+
+from users.models import Profile
+from .models import IndicatorRollup, IndicatorValue, MonthlyEnvironmentIndex
+
+HISTOGRAM_FIELDS = ['score_1', 'score_2', 'score_3', 'score_4', 'score_5']
+ROLLUP_FIELDS = ['score_sum', 'values_count', *HISTOGRAM_FIELDS]
+
+
+def histogram_field(score):
+    """Столбец распределения для оценки: округление до ближайшего целого, как в calculate_period_rollups"""
+    return HISTOGRAM_FIELDS[min(max(int(score + 0.5), 1), 5) - 1]
+
+
+def lock_monthly_index(period):
+    """Строка индекса периода, заблокированная до конца транзакции (создаётся при отсутствии)"""
+    MonthlyEnvironmentIndex.objects.bulk_create(
+        [MonthlyEnvironmentIndex(period=period)],
+        ignore_conflicts=True
+    )
+    return MonthlyEnvironmentIndex.objects.select_for_update().get(period=period)
+
+
+def set_index_totals(index, score_sum, values_count):
+    index.score_sum = score_sum
+    index.values_count = values_count
+    index.index_value = score_sum / values_count if values_count else 0
+    index.save(update_fields=['score_sum', 'values_count', 'index_value', 'calculated_at'])
+
+
+def add_index_totals(period, delta_sum, delta_count):
+    """
+        Изменение нарастающих сумм индекса периода одним UPDATE без предварительного SELECT FOR UPDATE
+
+        Новые суммы вычисляет БД по текущей версии строки: параллельные записи за период
+        ждут друг друга только на время UPDATE, а не на всю транзакцию с момента её начала
+    """
+    MonthlyEnvironmentIndex.objects.bulk_create(
+        [MonthlyEnvironmentIndex(period=period)],
+        ignore_conflicts=True
+    )
+
+    score_sum = F('score_sum') + delta_sum
+    values_count = F('values_count') + delta_count
+    MonthlyEnvironmentIndex.objects.filter(period=period).update(
+        score_sum=score_sum,
+        values_count=values_count,
+        index_value=Coalesce(score_sum / NullIf(Cast(values_count, FloatField()), 0.0), 0.0),
+        calculated_at=timezone.now()
+    )
+
+
+def add_rollup_delta(deltas, period, indicator_id, organization, score, sign):
+    delta = deltas.setdefault(
+        (period, indicator_id, organization),
+        dict.fromkeys(ROLLUP_FIELDS, 0)
+    )
+    delta['score_sum'] += sign * score
+    delta['values_count'] += sign
+    delta[histogram_field(score)] += sign
+
+
+def apply_rollup_deltas(deltas):
+    """
+        Применение изменений к сводкам одним UPDATE
+
+        Параметры:
+            - deltas (dict[tuple, dict]): Изменения полей ROLLUP_FIELDS по ключу (period, indicator_id, organization)
+    """
+    if not deltas:
+        return
+
+    IndicatorRollup.objects.bulk_create(
+        [
+            IndicatorRollup(period=period, indicator_id=indicator_id, organization=organization)
+            for period, indicator_id, organization in deltas
+        ],
+        ignore_conflicts=True
+    )
+
+    condition = reduce(or_, (
+        Q(period=period, indicator_id=indicator_id, organization=organization)
+        for period, indicator_id, organization in deltas
+    ))
+    # Блокировка в порядке id, чтобы параллельные транзакции не взаимоблокировались
+    rollups = list(IndicatorRollup.objects.select_for_update().filter(condition).order_by('id'))
+
+    for rollup in rollups:
+        delta = deltas[(rollup.period, rollup.indicator_id, rollup.organization)]
+        for field, value in delta.items():
+            setattr(rollup, field, getattr(rollup, field) + value)
+
+    IndicatorRollup.objects.bulk_update(rollups, ROLLUP_FIELDS)
+
+
+def save_indicator_values(user, period, values, indicators_map):
+    """
+        Запись значений пользователя за период с инкрементальным пересчётом индекса и сводок
+
+        Параметры:
+            - values (dict[int, IndicatorValue]): Новые значения по id индикатора
+            - indicators_map (dict[int, Indicator]): Индикаторы с коэффициентами Km
+
+        Особенности:
+            - Записи одного пользователя выполняются по очереди (блокировка строки профиля),
+              организация для сводок читается под той же блокировкой
+            - Прежние значения читаются одним запросом и вычитаются из сумм,
+              сами значения записываются одним INSERT ... ON CONFLICT DO UPDATE
+            - Суммы индекса меняются одним UPDATE (add_index_totals) после записи значений:
+              полный пересчёт периода (calculate_monthly_index) держит ту же строку
+              и не теряет ни уже записанные значения, ни дельты ещё не зафиксированных
+    """
+    with transaction.atomic():
+        organization = Profile.objects.select_for_update().values_list(
+            'organization', flat=True
+        ).get(user=user)
+
+        previous = IndicatorValue.objects.filter(
+            user=user,
+            period=period,
+            indicator_id__in=list(values)
+        ).values_list('indicator_id', 'score')
+
+        delta_sum = 0.0
+        delta_count = len(values)
+        rollup_deltas = {}
+
+        for indicator_id, score in previous:
+            delta_sum -= score * indicators_map[indicator_id].modality_coefficient
+            delta_count -= 1
+            add_rollup_delta(rollup_deltas, period, indicator_id, organization, score, -1)
+
+        for indicator_id, value in values.items():
+            delta_sum += value.score * indicators_map[indicator_id].modality_coefficient
+            add_rollup_delta(rollup_deltas, period, indicator_id, organization, value.score, 1)
+
+        IndicatorValue.objects.bulk_create(
+            values.values(),
+            update_conflicts=True,
+            unique_fields=['user', 'indicator', 'period'],
+            update_fields=['score', 'comment']
+        )
+
+        add_index_totals(period, delta_sum, delta_count)
+        apply_rollup_deltas(rollup_deltas)
+
+
+def move_user_rollups(user_id, organization):
+    """
+        Перенос всех значений пользователя в сводки организации organization (смена Profile.organization)
+
+        Прежняя организация читается из БД под блокировкой строки профиля, а не берётся
+        из загруженного экземпляра: параллельные смены организации и записи значений
+        пользователя (save_indicator_values) выполняются по очереди и видят итог предыдущей
+    """
+    with transaction.atomic():
+        previous = Profile.objects.select_for_update().filter(
+            user_id=user_id
+        ).values_list('organization', flat=True).first()
+        if previous is None or previous == organization:
+            return
+
+        values = list(
+            IndicatorValue.objects.filter(user_id=user_id).values_list('period', 'indicator_id', 'score')
+        )
+
+        # Тот же порядок блокировок, что и при записи значений: профиль, строки индекса, сводки
+        for period in sorted({period for period, _, _ in values}):
+            lock_monthly_index(period)
+
+        rollup_deltas = {}
+        for period, indicator_id, score in values:
+            add_rollup_delta(rollup_deltas, period, indicator_id, previous, score, -1)
+            add_rollup_delta(rollup_deltas, period, indicator_id, organization, score, 1)
+
+        apply_rollup_deltas(rollup_deltas)
+
+
+def calculate_monthly_index(period):
+    """Полный пересчёт индекса периода по всем его значениям"""
+    with transaction.atomic():
+        index = lock_monthly_index(period)
+
+        result = IndicatorValue.objects.filter(period=period).aggregate(
+            score_sum=Sum(
+                ExpressionWrapper(
+                    F('score') * F('indicator__modality_coefficient'),
+                    output_field=FloatField()
+                )
+            ),
+            values_count=Count('id')
+        )
+
+        set_index_totals(index, result['score_sum'] or 0, result['values_count'])
+
+    return index.index_value if index.values_count else None
+
+
+def calculate_period_rollups(period):
+    """Полный пересчёт сводок периода одним запросом с группировкой"""
+    scores = IndicatorValue.objects.filter(period=period).values(
+        'indicator_id',
+        organization=Coalesce(F('user__profile__organization'), Value(''))
+    )
+
+    with transaction.atomic():
+        lock_monthly_index(period)
+
+        rows = list(scores.annotate(
+            score_sum=Sum('score'),
+            values_count=Count('id'),
+            score_1=Count('id', filter=Q(score__lt=1.5)),
+            score_2=Count('id', filter=Q(score__gte=1.5, score__lt=2.5)),
+            score_3=Count('id', filter=Q(score__gte=2.5, score__lt=3.5)),
+            score_4=Count('id', filter=Q(score__gte=3.5, score__lt=4.5)),
+            score_5=Count('id', filter=Q(score__gte=4.5)),
+        ).order_by())
+
+        IndicatorRollup.objects.filter(period=period).delete()
+        IndicatorRollup.objects.bulk_create([IndicatorRollup(period=period, **row) for row in rows])
+
+
+def recalculate_period(period):
+    calculate_monthly_index(period)
+    calculate_period_rollups(period)
+
+
+def recalculate_indicator_periods(indicator_id):
+    """Пересчёт индекса всех периодов, в которых есть значения индикатора (после смены Km)"""
+    periods = IndicatorValue.objects.filter(
+        indicator_id=indicator_id
+    ).values_list('period', flat=True).distinct()
+
+    for period in periods:
+        calculate_monthly_index(period)
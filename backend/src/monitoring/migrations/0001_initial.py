@@ -0,0 +1,50 @@
+# Generated by Django 6.0.1 on 2026-02-10 20:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Indicator',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('is_active', models.BooleanField(default=True)),
+                ('modality_coefficient', models.FloatField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MonthlyEnvironmentIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField(unique=True)),
+                ('index_value', models.FloatField()),
+                ('calculated_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='IndicatorValue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('comment', models.TextField(blank=True)),
+                ('period', models.DateField()),
+                ('indicator', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='monitoring.indicator')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['period'], name='monitoring__period_673c95_idx'), models.Index(fields=['user', 'period'], name='monitoring__user_id_61b344_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'indicator', 'period'), name='unique_user_indicator_per_period')],
+            },
+        ),
+    ]
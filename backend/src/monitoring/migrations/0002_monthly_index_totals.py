@@ -0,0 +1,56 @@
+# Generated by Django 6.0.1 on 2026-10-17 18:20
+
+from django.db import migrations, models
+from django.db.models import Count, F, FloatField, Sum
+
+
+def fill_index_totals(apps, schema_editor):
+    """Нарастающие суммы индекса по уже сохранённым значениям, как в calculate_monthly_index"""
+    IndicatorValue = apps.get_model('monitoring', 'IndicatorValue')
+    MonthlyEnvironmentIndex = apps.get_model('monitoring', 'MonthlyEnvironmentIndex')
+
+    rows = IndicatorValue.objects.values('period').annotate(
+        score_sum=Sum(F('score') * F('indicator__modality_coefficient'), output_field=FloatField()),
+        values_count=Count('id')
+    ).order_by()
+
+    for row in rows:
+        MonthlyEnvironmentIndex.objects.update_or_create(
+            period=row['period'],
+            defaults={
+                'score_sum': row['score_sum'],
+                'values_count': row['values_count'],
+                'index_value': row['score_sum'] / row['values_count'],
+            }
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='monthlyenvironmentindex',
+            name='score_sum',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='monthlyenvironmentindex',
+            name='values_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='monthlyenvironmentindex',
+            name='calculated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AlterField(
+            model_name='monthlyenvironmentindex',
+            name='index_value',
+            field=models.FloatField(default=0),
+        ),
+        migrations.RunPython(fill_index_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 6.0.1 on 2026-10-17 18:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_rollups(apps, schema_editor):
+    """Сводки по уже сохранённым значениям, как в calculate_period_rollups, одним запросом на все периоды"""
+    IndicatorRollup = apps.get_model('monitoring', 'IndicatorRollup')
+    IndicatorValue = apps.get_model('monitoring', 'IndicatorValue')
+
+    rows = IndicatorValue.objects.values(
+        'period',
+        'indicator_id',
+        organization=Coalesce(F('user__profile__organization'), Value(''))
+    ).annotate(
+        score_sum=Sum('score'),
+        values_count=Count('id'),
+        score_1=Count('id', filter=Q(score__lt=1.5)),
+        score_2=Count('id', filter=Q(score__gte=1.5, score__lt=2.5)),
+        score_3=Count('id', filter=Q(score__gte=2.5, score__lt=3.5)),
+        score_4=Count('id', filter=Q(score__gte=3.5, score__lt=4.5)),
+        score_5=Count('id', filter=Q(score__gte=4.5)),
+    ).order_by()
+
+    IndicatorRollup.objects.bulk_create([IndicatorRollup(**row) for row in rows], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0002_monthly_index_totals'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndicatorRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField()),
+                ('organization', models.CharField(blank=True, max_length=255)),
+                ('score_sum', models.FloatField(default=0)),
+                ('values_count', models.PositiveIntegerField(default=0)),
+                ('score_1', models.PositiveIntegerField(default=0)),
+                ('score_2', models.PositiveIntegerField(default=0)),
+                ('score_3', models.PositiveIntegerField(default=0)),
+                ('score_4', models.PositiveIntegerField(default=0)),
+                ('score_5', models.PositiveIntegerField(default=0)),
+                ('indicator', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='monitoring.indicator')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['indicator', 'organization', 'period'], name='monitoring__indicat_6a78a7_idx'), models.Index(fields=['organization', 'period'], name='monitoring__organiz_6c638a_idx')],
+                'constraints': [models.UniqueConstraint(fields=('period', 'indicator', 'organization'), name='unique_rollup_period_indicator_organization')],
+            },
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
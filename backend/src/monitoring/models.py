@@ -38,8 +38,50 @@ class IndicatorValue(models.Model):
 
 
 class MonthlyEnvironmentIndex(models.Model):
+    """
+        Индекс среды за месяц: среднее score * Km по всем значениям периода
+
+        score_sum и values_count - нарастающие сумма и число значений,
+        обновляются при каждой записи значений (monitoring.aggregates)
+    """
     period = models.DateField(unique=True)
 
-    index_value = models.FloatField()
+    index_value = models.FloatField(default=0)
+
+    score_sum = models.FloatField(default=0)
+    values_count = models.PositiveIntegerField(default=0)
+
+    calculated_at = models.DateTimeField(auto_now=True)
+
+
+class IndicatorRollup(models.Model):
+    """
+        Сводка значений индикатора за месяц по образовательной организации
+
+        Хранит сумму, число значений и распределение оценок (score_1 ... score_5),
+        обновляется при каждой записи значений (monitoring.aggregates)
+    """
+    period = models.DateField()
+    indicator = models.ForeignKey(Indicator, related_name='rollups', on_delete=models.CASCADE)
+    organization = models.CharField(max_length=255, blank=True)
+
+    score_sum = models.FloatField(default=0)
+    values_count = models.PositiveIntegerField(default=0)
 
-    calculated_at = models.DateTimeField(auto_now_add=True)
+    score_1 = models.PositiveIntegerField(default=0)
+    score_2 = models.PositiveIntegerField(default=0)
+    score_3 = models.PositiveIntegerField(default=0)
+    score_4 = models.PositiveIntegerField(default=0)
+    score_5 = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['period', 'indicator', 'organization'],
+                name='unique_rollup_period_indicator_organization'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['indicator', 'organization', 'period']),
+            models.Index(fields=['organization', 'period']),
+        ]
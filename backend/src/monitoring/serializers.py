@@ -1,5 +1,8 @@
 from rest_framework import serializers
 
+from .models import MonthlyEnvironmentIndex
+
+
 class CurrentIndicatorSerializer(serializers.Serializer):
     id = serializers.IntegerField()
     name = serializers.CharField()
@@ -21,4 +24,30 @@ class HistoryIndicatorSerializer(serializers.Serializer):
 
 class HistoryPeriodSerializer(serializers.Serializer):
     period = serializers.DateField()
-    indicators = HistoryIndicatorSerializer(many=True)
\ No newline at end of file
+    indicators = HistoryIndicatorSerializer(many=True)
+
+
+class MonthlyIndexSerializer(serializers.ModelSerializer):
+    index_value = serializers.FloatField(allow_null=True)
+
+    class Meta:
+        model = MonthlyEnvironmentIndex
+        fields = ['period', 'index_value', 'values_count', 'calculated_at']
+
+
+class AnalyticsQuerySerializer(serializers.Serializer):
+    period = serializers.DateField(required=False)
+    period_from = serializers.DateField(required=False)
+    period_to = serializers.DateField(required=False)
+    indicator = serializers.IntegerField(required=False)
+    organization = serializers.CharField(required=False, allow_blank=True)
+
+
+class AnalyticsRowSerializer(serializers.Serializer):
+    period = serializers.DateField(required=False)
+    indicator_id = serializers.IntegerField(required=False)
+    indicator_name = serializers.CharField(required=False)
+    organization = serializers.CharField(required=False)
+    average = serializers.FloatField()
+    values_count = serializers.IntegerField()
+    distribution = serializers.DictField(child=serializers.IntegerField())
@@ -0,0 +1,43 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from users.models import Profile
+from . import aggregates
+from .models import Indicator, IndicatorValue
+
+
+@receiver(pre_save, sender=Indicator)
+def remember_modality_coefficient(sender, instance, **kwargs):
+    instance._previous_coefficient = None
+    if instance.pk:
+        instance._previous_coefficient = Indicator.objects.filter(
+            pk=instance.pk
+        ).values_list('modality_coefficient', flat=True).first()
+
+
+@receiver(post_save, sender=Indicator)
+def recalculate_on_coefficient_change(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_coefficient', None)
+    if not created and previous is not None and previous != instance.modality_coefficient:
+        # Нарастающие суммы посчитаны со старым Km - пересчитываем периоды целиком
+        transaction.on_commit(lambda: aggregates.recalculate_indicator_periods(instance.pk))
+
+
+# Значения, изменённые в обход CurrentIndicatorsView (админка, удаление пользователя или индикатора),
+# не дают дельты для нарастающих сумм, поэтому индекс и сводки периода пересчитываются целиком.
+# bulk_create в CurrentIndicatorsView сигналов не отправляет
+@receiver(post_save, sender=IndicatorValue)
+@receiver(post_delete, sender=IndicatorValue)
+def recalculate_on_value_change(sender, instance, **kwargs):
+    period = instance.period
+    transaction.on_commit(lambda: aggregates.recalculate_period(period))
+
+
+# Сводки ведутся по организации из профиля: при её смене значения пользователя переносятся
+# в той же транзакции, что и UPDATE профиля (Profile.save атомарен)
+@receiver(pre_save, sender=Profile)
+def move_rollups_on_organization_change(sender, instance, update_fields=None, **kwargs):
+    if instance._state.adding or (update_fields is not None and 'organization' not in update_fields):
+        return
+    aggregates.move_user_rollups(instance.user_id, instance.organization)
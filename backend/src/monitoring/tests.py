@@ -1,3 +1,119 @@
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from users.models import Profile
+from . import aggregates
+from .models import Indicator, IndicatorRollup, IndicatorValue, MonthlyEnvironmentIndex
+
+PERIOD = date(2026, 1, 1)
+
+
+class MonitoringTestCase(TestCase):
+
+    def setUp(self):
+        self.first = User.objects.create_user(username='first')
+        self.second = User.objects.create_user(username='second')
+        self.indicators_map = {
+            indicator.id: indicator
+            for indicator in [
+                Indicator.objects.create(name="Пространство", modality_coefficient=2),
+                Indicator.objects.create(name="Материалы", modality_coefficient=0.5),
+            ]
+        }
+        self.ids = list(self.indicators_map)
+
+    def save(self, user, scores):
+        values = {
+            indicator_id: IndicatorValue(user=user, indicator_id=indicator_id, period=PERIOD, score=score)
+            for indicator_id, score in scores.items()
+        }
+        aggregates.save_indicator_values(user, PERIOD, values, self.indicators_map)
+
+    def rollups(self):
+        return sorted(IndicatorRollup.objects.filter(values_count__gt=0).values_list(
+            'indicator_id', 'organization', 'score_sum', 'values_count', *aggregates.HISTOGRAM_FIELDS
+        ))
+
+    def totals(self):
+        return MonthlyEnvironmentIndex.objects.values_list(
+            'score_sum', 'values_count', 'index_value'
+        ).get(period=PERIOD)
+
+
+class IndicatorAggregatesTest(MonitoringTestCase):
+    """Нарастающие суммы индекса: совпадение с полным пересчётом, запись без блокировки строки индекса"""
+
+    def test_totals_match_full_recalculation(self):
+        self.save(self.first, {self.ids[0]: 4, self.ids[1]: 2})
+        self.save(self.second, {self.ids[0]: 5})
+        # Перезапись значения: прежнее вычитается из сумм
+        self.save(self.first, {self.ids[0]: 1})
+        self.assertEqual(self.totals(), (2 * 1 + 0.5 * 2 + 2 * 5, 3, 13 / 3))
+
+        index_value = aggregates.calculate_monthly_index(PERIOD)
+        self.assertEqual(self.totals(), (13, 3, index_value))
+
+    def test_index_row_updated_without_select_for_update(self):
+        self.save(self.first, {self.ids[0]: 3})
+
+        with CaptureQueriesContext(connection) as queries:
+            self.save(self.first, {self.ids[0]: 4})
+
+        index_table = MonthlyEnvironmentIndex._meta.db_table
+        self.assertFalse([
+            query['sql'] for query in queries
+            if index_table in query['sql'] and 'FOR UPDATE' in query['sql']
+        ])
+        self.assertEqual(self.totals(), (8, 1, 8))
+
+
+class IndicatorRollupTest(MonitoringTestCase):
+    """Сводки по организациям: дельты при записи, перенос при смене организации профиля"""
+
+    def set_organization(self, profile, organization):
+        profile.organization = organization
+        profile.save()
+
+    def assert_matches_full_recalculation(self):
+        incremental = self.rollups()
+        aggregates.calculate_period_rollups(PERIOD)
+        self.assertEqual(incremental, self.rollups())
+
+    def test_rollup_deltas(self):
+        self.set_organization(self.first.profile, "Школа 1")
+        self.save(self.first, {self.ids[0]: 4, self.ids[1]: 2})
+        self.save(self.second, {self.ids[0]: 5})
+        self.save(self.first, {self.ids[0]: 1})
+
+        self.assertEqual(self.rollups(), [
+            (self.ids[0], "", 5, 1, 0, 0, 0, 0, 1),
+            (self.ids[0], "Школа 1", 1, 1, 1, 0, 0, 0, 0),
+            (self.ids[1], "Школа 1", 2, 1, 0, 1, 0, 0, 0),
+        ])
+        self.assert_matches_full_recalculation()
+
+    def test_organization_change_moves_values(self):
+        self.save(self.first, {self.ids[0]: 4})
+        self.set_organization(self.first.profile, "Школа 1")
+
+        self.assertEqual(self.rollups(), [(self.ids[0], "Школа 1", 4, 1, 0, 0, 0, 1, 0)])
+        self.assert_matches_full_recalculation()
+
+    def test_stale_profile_moves_from_stored_organization(self):
+        self.save(self.first, {self.ids[0]: 4})
+        stale = Profile.objects.get(user=self.first)
+        self.set_organization(Profile.objects.get(user=self.first), "Школа 1")
+
+        # Загруженный до смены экземпляр: переносить нужно из "Школа 1", а не из ""
+        self.set_organization(stale, "Школа 2")
+        self.assertEqual(self.rollups(), [(self.ids[0], "Школа 2", 4, 1, 0, 0, 0, 1, 0)])
 
-# Create your tests here.
+        # Сохранение без смены организации и с update_fields без неё сводки не трогает
+        with self.assertNumQueries(3):
+            stale.save(update_fields=['full_name'])
+        self.set_organization(stale, "Школа 2")
+        self.assert_matches_full_recalculation()
@@ -1,7 +1,14 @@
 from django.urls import path
-from .views import CurrentIndicatorsView, IndicatorsHistoryView
+from .views import (
+    CurrentIndicatorsView, IndicatorsHistoryView, MonthlyIndexView,
+    IndicatorAnalyticsView, OrganizationAnalyticsView, TrendAnalyticsView
+)
 
 urlpatterns = [
     path('indicators/current/', CurrentIndicatorsView.as_view()),
     path('indicators/history/', IndicatorsHistoryView.as_view()),
+    path('indicators/index/', MonthlyIndexView.as_view()),
+    path('analytics/indicators/', IndicatorAnalyticsView.as_view()),
+    path('analytics/organizations/', OrganizationAnalyticsView.as_view()),
+    path('analytics/trend/', TrendAnalyticsView.as_view()),
 ]
\ No newline at end of file
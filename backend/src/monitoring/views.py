@@ -1,45 +1,40 @@
 from datetime import date
 from collections import defaultdict
 
-from django.db import transaction
-from django.db.models import ExpressionWrapper, F, FloatField, Avg
-from drf_spectacular.utils import extend_schema, OpenApiResponse, OpenApiExample
+from django.db.models import Sum
+from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiResponse, OpenApiExample
 from rest_framework import serializers, status
 from rest_framework.exceptions import ValidationError
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 
-from .models import Indicator, IndicatorValue, MonthlyEnvironmentIndex
+from core.pagination import KeysetCursorPagination
+from core.views import AsyncAPIViewMixin
+from .aggregates import HISTOGRAM_FIELDS, save_indicator_values
+from .models import Indicator, IndicatorRollup, IndicatorValue, MonthlyEnvironmentIndex
 from .serializers import (
     CurrentIndicatorSerializer,
-    HistoryPeriodSerializer, IndicatorUpdateItemSerializer
+    HistoryPeriodSerializer, IndicatorUpdateItemSerializer, MonthlyIndexSerializer,
+    AnalyticsQuerySerializer, AnalyticsRowSerializer
 )
 
 
-def calculate_monthly_index(period):
-    values = IndicatorValue.objects.filter(period=period)
+class PeriodCursorPagination(KeysetCursorPagination):
+    """
+        Пагинация истории по периодам: на странице page_size месяцев со всеми их индикаторами
 
-    if not values.exists():
-        return None
+        Разрешитель не нужен: выборка - различные period, ключ сортировки уникален
+    """
+    page_size = 12
+    ordering = ('-period',)
+    tiebreaker = None
 
-    annotated = values.annotate(
-        pi=ExpressionWrapper(
-            F('score') * F('indicator__modality_coefficient'),
-            output_field=FloatField()
+    def paginate_queryset(self, queryset, request, view=None):
+        assert queryset.query.distinct and list(queryset.query.values_select) == ['period'], (
+            "PeriodCursorPagination ожидает .values('period').distinct(): без разрешителя ключ должен быть уникален"
         )
-    )
-
-    result = annotated.aggregate(index=Avg('pi'))
-
-    MonthlyEnvironmentIndex.objects.update_or_create(
-        period=period,
-        defaults={
-            "index_value": result['index'] or 0
-        }
-    )
-
-    return result['index']
+        return super().paginate_queryset(queryset, request, view)
 
 
 def get_current_period():
@@ -47,7 +42,7 @@ def get_current_period():
     return date(today.year, today.month, 1)
 
 
-class CurrentIndicatorsView(APIView):
+class CurrentIndicatorsView(AsyncAPIViewMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     @extend_schema(
@@ -83,7 +78,7 @@ class CurrentIndicatorsView(APIView):
             )
         }
     )
-    def get(self, request):
+    async def get(self, request):
         user = request.user
         period = get_current_period()
 
@@ -92,13 +87,13 @@ class CurrentIndicatorsView(APIView):
         values = IndicatorValue.objects.filter(
             user=user,
             period=period
-        ).select_related('indicator')
+        )
 
-        values_map = {v.indicator_id: v for v in values}
+        values_map = {v.indicator_id: v async for v in values}
 
         result = []
 
-        for indicator in indicators:
+        async for indicator in indicators:
             v = values_map.get(indicator.id)
 
             result.append({
@@ -175,28 +170,31 @@ class CurrentIndicatorsView(APIView):
 
         updated = 0
         skipped = []
+        values = {}
+
+        for item in data:
+            indicator_id = item['id']
+
+            if indicator_id not in indicators_map:
+                skipped.append({
+                    "id": indicator_id,
+                    "reason": "inactive or not found"
+                })
+                continue
+
+            # Повтор индикатора в запросе: побеждает последнее значение
+            values[indicator_id] = IndicatorValue(
+                user=user,
+                indicator_id=indicator_id,
+                period=period,
+                score=item['value'],
+                comment=item.get('comment', "")
+            )
+            updated += 1
 
-        with transaction.atomic():
-            for item in data:
-                indicator_id = item['id']
-
-                if indicator_id not in indicators_map:
-                    skipped.append({
-                        "id": indicator_id,
-                        "reason": "inactive or not found"
-                    })
-                    continue
-
-                IndicatorValue.objects.update_or_create(
-                    user=user,
-                    indicator_id=indicator_id,
-                    period=period,
-                    defaults={
-                        "score": item['value'],
-                        "comment": item.get('comment', "")
-                    }
-                )
-                updated += 1
+        if values:
+            # Один INSERT ... ON CONFLICT на все индикаторы и пересчёт индекса месяца в той же транзакции
+            save_indicator_values(user, period, values, indicators_map)
 
         if updated == 0:
             return Response(
@@ -218,6 +216,7 @@ class CurrentIndicatorsView(APIView):
 
 class IndicatorsHistoryView(APIView):
     permission_classes = [IsAuthenticated]
+    pagination_class = PeriodCursorPagination
 
     @extend_schema(
         summary="История ответов пользователя",
@@ -227,6 +226,7 @@ class IndicatorsHistoryView(APIView):
                 "- Группировка по месяцам (period)\n"
                 "- Включаются только заполненные значения\n"
                 "- Если comment отсутствует → null\n"
+                "- Список периодов разбит на страницы (параметры cursor и page_size)\n"
         ),
         tags=["Мониторинг"],
         responses={
@@ -235,30 +235,34 @@ class IndicatorsHistoryView(APIView):
                 examples=[
                     OpenApiExample(
                         "Пример ответа",
-                        value=[
-                            {
-                                "period": "2026-04-01",
-                                "indicators": [
-                                    {
-                                        "id": 1,
-                                        "name": "Комфорт среды",
-                                        "value": 4,
-                                        "comment": "Ок"
-                                    }
-                                ]
-                            },
-                            {
-                                "period": "2026-03-01",
-                                "indicators": [
-                                    {
-                                        "id": 2,
-                                        "name": "Безопасность",
-                                        "value": 5,
-                                        "comment": None
-                                    }
-                                ]
-                            }
-                        ]
+                        value={
+                            "next": None,
+                            "previous": None,
+                            "results": [
+                                {
+                                    "period": "2026-04-01",
+                                    "indicators": [
+                                        {
+                                            "id": 1,
+                                            "name": "Комфорт среды",
+                                            "value": 4,
+                                            "comment": "Ок"
+                                        }
+                                    ]
+                                },
+                                {
+                                    "period": "2026-03-01",
+                                    "indicators": [
+                                        {
+                                            "id": 2,
+                                            "name": "Безопасность",
+                                            "value": 5,
+                                            "comment": None
+                                        }
+                                    ]
+                                }
+                            ]
+                        }
                     )
                 ]
             )
@@ -266,9 +270,14 @@ class IndicatorsHistoryView(APIView):
     )
     def get(self, request):
         user = request.user
+        paginator = self.pagination_class()
+
+        periods = IndicatorValue.objects.filter(user=user).values('period').distinct()
+        page = paginator.paginate_queryset(periods, request, view=self)
 
         values = IndicatorValue.objects.filter(
-            user=user
+            user=user,
+            period__in=[row['period'] for row in page]
         ).select_related('indicator').order_by('-period')
 
         grouped = defaultdict(list)
@@ -290,4 +299,222 @@ class IndicatorsHistoryView(APIView):
         ]
 
         serializer = HistoryPeriodSerializer(result, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+
+class MonthlyIndexView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        summary="Индекс среды за текущий месяц",
+        description=(
+                "Возвращает индекс среды (среднее значение score * Km) за текущий месяц.\n\n"
+                "Особенности:\n"
+                "- Индекс пересчитывается при каждой отправке значений\n"
+                "- Если значений за месяц ещё нет → index_value = null\n"
+        ),
+        tags=["Мониторинг"],
+        responses={
+            status.HTTP_200_OK: OpenApiResponse(
+                response=MonthlyIndexSerializer,
+                examples=[
+                    OpenApiExample(
+                        "Пример ответа",
+                        value={
+                            "period": "2026-04-01",
+                            "index_value": 3.85,
+                            "values_count": 120,
+                            "calculated_at": "2026-04-12T10:15:00Z"
+                        }
+                    )
+                ]
+            )
+        }
+    )
+    def get(self, request):
+        period = get_current_period()
+        index = MonthlyEnvironmentIndex.objects.filter(period=period, values_count__gt=0).first()
+
+        if index is None:
+            index = MonthlyEnvironmentIndex(period=period, index_value=None)
+
+        serializer = MonthlyIndexSerializer(index)
+        return Response(serializer.data)
+
+
+def summarize_rollups(queryset, **group_by):
+    """
+        Средние и распределения оценок по сводкам IndicatorRollup
+
+        Параметры:
+            - group_by: Поля ответа и поля сводки, по которым идёт группировка,
+              например indicator_name='indicator__name'
+    """
+    rows = queryset.filter(values_count__gt=0).values(*group_by.values()).annotate(
+        total_count=Sum('values_count'),
+        total_sum=Sum('score_sum'),
+        **{f"total_{field}": Sum(field) for field in HISTOGRAM_FIELDS}
+    ).order_by(*group_by.values())
+
+    return [
+        {
+            **{key: row[lookup] for key, lookup in group_by.items()},
+            "average": row['total_sum'] / row['total_count'],
+            "values_count": row['total_count'],
+            "distribution": {
+                str(score): row[f"total_{field}"]
+                for score, field in enumerate(HISTOGRAM_FIELDS, start=1)
+            }
+        }
+        for row in rows
+    ]
+
+
+ANALYTICS_ROW_EXAMPLE = {
+    "average": 3.8,
+    "values_count": 125,
+    "distribution": {"1": 3, "2": 10, "3": 25, "4": 47, "5": 40}
+}
+
+
+class AnalyticsView(APIView):
+    """Основа аналитики для администраторов: ответы только из сводок IndicatorRollup"""
+    permission_classes = [IsAdminUser]
+
+    def get_params(self, request):
+        serializer = AnalyticsQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+    def respond(self, rows):
+        serializer = AnalyticsRowSerializer(rows, many=True)
         return Response(serializer.data)
+
+
+class IndicatorAnalyticsView(AnalyticsView):
+
+    @extend_schema(
+        summary="Аналитика по индикаторам за месяц",
+        description=(
+                "Средняя оценка и распределение оценок 1-5 по каждому индикатору за месяц.\n\n"
+                "Особенности:\n"
+                "- period - первый день месяца, по умолчанию текущий месяц\n"
+                "- organization ограничивает выборку одной организацией, иначе по всем организациям\n"
+                "- Доступно только администраторам\n"
+        ),
+        tags=["Мониторинг"],
+        parameters=[
+            OpenApiParameter("period", str, description="Месяц, YYYY-MM-01"),
+            OpenApiParameter("organization", str, description="Образовательная организация"),
+        ],
+        responses={
+            status.HTTP_200_OK: OpenApiResponse(
+                response=AnalyticsRowSerializer(many=True),
+                examples=[
+                    OpenApiExample(
+                        "Пример ответа",
+                        value=[{"indicator_id": 1, "indicator_name": "Комфорт среды", **ANALYTICS_ROW_EXAMPLE}]
+                    )
+                ]
+            )
+        }
+    )
+    def get(self, request):
+        params = self.get_params(request)
+
+        rollups = IndicatorRollup.objects.filter(period=params.get('period', get_current_period()))
+        if 'organization' in params:
+            rollups = rollups.filter(organization=params['organization'])
+
+        return self.respond(
+            summarize_rollups(rollups, indicator_id='indicator_id', indicator_name='indicator__name')
+        )
+
+
+class OrganizationAnalyticsView(AnalyticsView):
+
+    @extend_schema(
+        summary="Аналитика по организациям за месяц",
+        description=(
+                "Средняя оценка и распределение оценок 1-5 по каждой организации за месяц.\n\n"
+                "Особенности:\n"
+                "- period - первый день месяца, по умолчанию текущий месяц\n"
+                "- indicator ограничивает выборку одним индикатором, иначе по всем индикаторам\n"
+                "- Пользователи без организации попадают в строку с organization = \"\"\n"
+                "- Доступно только администраторам\n"
+        ),
+        tags=["Мониторинг"],
+        parameters=[
+            OpenApiParameter("period", str, description="Месяц, YYYY-MM-01"),
+            OpenApiParameter("indicator", int, description="id индикатора"),
+        ],
+        responses={
+            status.HTTP_200_OK: OpenApiResponse(
+                response=AnalyticsRowSerializer(many=True),
+                examples=[
+                    OpenApiExample(
+                        "Пример ответа",
+                        value=[{"organization": "Школа №1", **ANALYTICS_ROW_EXAMPLE}]
+                    )
+                ]
+            )
+        }
+    )
+    def get(self, request):
+        params = self.get_params(request)
+
+        rollups = IndicatorRollup.objects.filter(period=params.get('period', get_current_period()))
+        if 'indicator' in params:
+            rollups = rollups.filter(indicator_id=params['indicator'])
+
+        return self.respond(summarize_rollups(rollups, organization='organization'))
+
+
+class TrendAnalyticsView(AnalyticsView):
+
+    @extend_schema(
+        summary="Динамика оценок по месяцам",
+        description=(
+                "Средняя оценка и распределение оценок 1-5 по месяцам.\n\n"
+                "Особенности:\n"
+                "- indicator и organization сужают выборку\n"
+                "- period_from и period_to задают диапазон месяцев, по умолчанию последние 12 месяцев\n"
+                "- Доступно только администраторам\n"
+        ),
+        tags=["Мониторинг"],
+        parameters=[
+            OpenApiParameter("indicator", int, description="id индикатора"),
+            OpenApiParameter("organization", str, description="Образовательная организация"),
+            OpenApiParameter("period_from", str, description="Первый месяц, YYYY-MM-01"),
+            OpenApiParameter("period_to", str, description="Последний месяц, YYYY-MM-01"),
+        ],
+        responses={
+            status.HTTP_200_OK: OpenApiResponse(
+                response=AnalyticsRowSerializer(many=True),
+                examples=[
+                    OpenApiExample(
+                        "Пример ответа",
+                        value=[{"period": "2026-04-01", **ANALYTICS_ROW_EXAMPLE}]
+                    )
+                ]
+            )
+        }
+    )
+    def get(self, request):
+        params = self.get_params(request)
+
+        period_to = params.get('period_to', get_current_period())
+        if 'period_from' in params:
+            period_from = params['period_from']
+        else:
+            # 12 месяцев, включая period_to
+            months = period_to.year * 12 + period_to.month - 12
+            period_from = date(months // 12, months % 12 + 1, 1)
+
+        rollups = IndicatorRollup.objects.filter(period__gte=period_from, period__lte=period_to)
+        if 'indicator' in params:
+            rollups = rollups.filter(indicator_id=params['indicator'])
+        if 'organization' in params:
+            rollups = rollups.filter(organization=params['organization'])
+
+        return self.respond(summarize_rollups(rollups, period='period'))
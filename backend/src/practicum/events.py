@@ -0,0 +1,96 @@
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections, transaction
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from core.events import get_event_bus
+
+CHANNEL = "practicum:user:{user_id}"
+
+# Комментарий-пинг не даёт прокси закрыть простаивающее соединение
+HEARTBEAT_INTERVAL = 15
+# После этого поток завершается, и клиент переподключается (поле retry)
+STREAM_LIFETIME = 5 * 60
+RETRY_MS = 3000
+
+
+def notify_status_changes(answers):
+    """Событие каждому автору о новом статусе его ответа, после фиксации транзакции"""
+    messages = [
+        (
+            CHANNEL.format(user_id=answer.user_id),
+            {
+                "answer_id": answer.id,
+                "case_id": answer.case_id,
+                "attempt": answer.attempt,
+                "status": answer.status,
+            }
+        )
+        for answer in answers
+    ]
+
+    def publish():
+        bus = get_event_bus()
+        for channel, message in messages:
+            bus.publish(channel, message)
+
+    transaction.on_commit(publish)
+
+
+def authenticate(request):
+    """Пользователь по тем же классам аутентификации, что и у API: токен (Android) или сессия (Web)"""
+    drf_request = Request(request)
+    try:
+        for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+            result = authentication_class().authenticate(drf_request)
+            if result is not None:
+                return result[0]
+    except exceptions.APIException:
+        pass
+    finally:
+        # Поток событий держится минутами - соединение с БД ему не нужно
+        close_old_connections()
+    return None
+
+
+async def status_events(request):
+    """
+        Server-Sent Events со сменой статусов ответов пользователя в Практикуме
+
+        Работает только под ASGI (core.asgi): на каждое соединение не расходуется поток воркера.
+        Событие status: {"answer_id", "case_id", "attempt", "status"}; получив его,
+        клиент заново запрашивает open-cases / closed-cases
+    """
+    if request.method != "GET":
+        return JsonResponse({"detail": "Method not allowed."}, status=405)
+
+    user = await sync_to_async(authenticate)(request)
+    if user is None:
+        return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+
+    subscription = await get_event_bus().subscribe(CHANNEL.format(user_id=user.id))
+
+    async def stream():
+        deadline = time.monotonic() + STREAM_LIFETIME
+        try:
+            yield f"retry: {RETRY_MS}\n\n".encode()
+
+            while time.monotonic() < deadline:
+                message = await subscription.get(HEARTBEAT_INTERVAL)
+                if message is None:
+                    yield b": ping\n\n"
+                else:
+                    yield f"event: status\ndata: {json.dumps(message)}\n\n".encode()
+        finally:
+            await subscription.close()
+
+    response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # nginx не должен буферизовать поток
+    response["X-Accel-Buffering"] = "no"
+    return response
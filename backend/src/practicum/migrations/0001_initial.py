@@ -0,0 +1,49 @@
+# Generated by Django 6.0.1 on 2026-02-10 20:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Case',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('is_active', models.BooleanField(default=True)),
+                ('description', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Answer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.TextField()),
+                ('attempt', models.PositiveIntegerField()),
+                ('checked_at', models.DateTimeField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('check', 'Answer is being verified'), ('ok', 'Answer is accepted'), ('fail', 'Errors found')], default='check', max_length=5)),
+                ('comment', models.CharField(blank=True, max_length=750, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('checked_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='checked_answers', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='practicum_answers', to=settings.AUTH_USER_MODEL)),
+                ('case', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='practicum.case')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'created_at'], name='practicum_a_user_id_f8726e_idx'), models.Index(fields=['user', 'case'], name='practicum_a_user_id_d5a9ec_idx'), models.Index(fields=['status'], name='practicum_a_status_ecadf5_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'case', 'attempt'), name='unique_user_case_attempt')],
+            },
+        ),
+    ]
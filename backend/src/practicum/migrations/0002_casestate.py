@@ -0,0 +1,55 @@
+# Generated by Django 6.0.1 on 2026-10-17 19:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_case_states(apps, schema_editor):
+    """Состояния по уже сохранённым попыткам, как CaseState.refresh, одним запросом DISTINCT ON на все пары"""
+    Answer = apps.get_model('practicum', 'Answer')
+    CaseState = apps.get_model('practicum', 'CaseState')
+
+    last_attempts = Answer.objects.order_by('user_id', 'case_id', '-attempt').distinct('user_id', 'case_id')
+    CaseState.objects.bulk_create(
+        (
+            CaseState(
+                user_id=answer.user_id,
+                case_id=answer.case_id,
+                last_status=answer.status,
+                last_attempt=answer.attempt,
+                last_answer_at=answer.created_at,
+            )
+            for answer in last_attempts.only(
+                'user_id', 'case_id', 'status', 'attempt', 'created_at'
+            ).iterator(chunk_size=2000)
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('practicum', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CaseState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_status', models.CharField(choices=[('check', 'Answer is being verified'), ('ok', 'Answer is accepted'), ('fail', 'Errors found')], max_length=5)),
+                ('last_attempt', models.PositiveIntegerField()),
+                ('last_answer_at', models.DateTimeField()),
+                ('case', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='states', to='practicum.case')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='practicum_case_states', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'last_status', 'case'], name='practicum_c_user_id_5203d0_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'case'), name='unique_user_case_state')],
+            },
+        ),
+        migrations.RunPython(fill_case_states, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,7 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 
 User = get_user_model()
 
@@ -43,6 +45,8 @@ class Answer(models.Model):
             - checked_by (FK | null): Администратор, проверивший ответ
             - checked_at (datetime | null): Дата проверки
             - comment (str | null): Комментарий проверяющего
+            - claimed_by (FK | null): Проверяющий, взявший ответ из очереди
+            - claimed_until (datetime | null): До какого момента ответ закреплён за проверяющим
             - created_at (datetime): Дата и время создания ответа
 
         Статусы:
@@ -54,6 +58,7 @@ class Answer(models.Model):
             - По пользователю и дате создания (для истории)
             - По пользователю и кейсу (для быстрого поиска последних попыток)
             - По статусу (для фильтрации открытых кейсов)
+            - Частичный по дате создания для ответов на проверке (очередь проверки)
 
         Примечания:
             - Набор user, case, attempt должен быть уникален для предотвращения дубликатов попыток
@@ -82,6 +87,15 @@ class Answer(models.Model):
     status = models.CharField(max_length=5, choices=StatusType.choices, default=StatusType.CHECKING)
     comment = models.CharField(max_length=750, null=True, blank=True)
 
+    claimed_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="claimed_answers"
+    )
+    claimed_until = models.DateTimeField(null=True, blank=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -89,6 +103,11 @@ class Answer(models.Model):
             models.Index(fields=["user", "created_at"]),
             models.Index(fields=["user", "case"]),
             models.Index(fields=["status"]),
+            models.Index(
+                fields=["created_at", "id"],
+                condition=models.Q(status="check"),
+                name="practicum_answer_review_queue"
+            ),
         ]
         constraints = [
             models.UniqueConstraint(
@@ -99,3 +118,86 @@ class Answer(models.Model):
 
     def __str__(self):
         return f"{self.user} - {self.case_id}"
+
+
+class CaseState(models.Model):
+    """
+        Состояние кейса для пользователя: последняя попытка и её статус
+
+        Поля:
+            - user (FK): Пользователь
+            - case (FK): Кейс
+            - last_status (str): Статус последней попытки
+            - last_attempt (int): Номер последней попытки
+            - last_answer_at (datetime): Дата и время последней попытки
+
+        Примечания:
+            - Строка одна на пару user, case и появляется с первой попыткой
+            - Обновляется сигналами Answer (создание, проверка, удаление попытки);
+              по ней строятся списки открытых и закрытых кейсов
+        """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="practicum_case_states")
+    case = models.ForeignKey(Case, on_delete=models.CASCADE, related_name="states")
+
+    last_status = models.CharField(max_length=5, choices=Answer.StatusType.choices)
+    last_attempt = models.PositiveIntegerField()
+    last_answer_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "case"],
+                name="unique_user_case_state"
+            )
+        ]
+        indexes = [
+            models.Index(fields=["user", "last_status", "case"]),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.case_id}: {self.last_status}"
+
+    @classmethod
+    def record(cls, answer):
+        """Новая попытка становится последней"""
+        cls.objects.bulk_create(
+            [
+                cls(
+                    user_id=answer.user_id,
+                    case_id=answer.case_id,
+                    last_status=answer.status,
+                    last_attempt=answer.attempt,
+                    last_answer_at=answer.created_at,
+                )
+            ],
+            update_conflicts=True,
+            unique_fields=["user", "case"],
+            update_fields=["last_status", "last_attempt", "last_answer_at"]
+        )
+
+    @classmethod
+    def refresh(cls, user_id, case_id):
+        """Пересчёт по оставшимся попыткам (после удаления)"""
+        last = Answer.objects.filter(user_id=user_id, case_id=case_id).order_by("-attempt").first()
+        if last is None:
+            cls.objects.filter(user_id=user_id, case_id=case_id).delete()
+        else:
+            cls.record(last)
+
+
+@receiver(post_save, sender=Answer)
+def update_case_state(sender, instance, created, **kwargs):
+    if created:
+        CaseState.record(instance)
+    else:
+        # Проверка попытки меняет состояние, только если она последняя
+        CaseState.objects.filter(
+            user_id=instance.user_id,
+            case_id=instance.case_id,
+            last_attempt=instance.attempt
+        ).update(last_status=instance.status)
+
+
+@receiver(post_delete, sender=Answer)
+def refresh_case_state(sender, instance, **kwargs):
+    CaseState.refresh(instance.user_id, instance.case_id)
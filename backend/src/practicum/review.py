@@ -0,0 +1,125 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils.timezone import now
+from rest_framework import serializers
+
+from .events import notify_status_changes
+from .models import Answer, CaseState
+
+# Сколько ответ остаётся за проверяющим после claim; по истечении он снова доступен остальным
+REVIEW_LEASE = timedelta(minutes=15)
+
+
+def review_queue():
+    """Ответы на проверке в порядке поступления (частичный индекс practicum_answer_review_queue)"""
+    return Answer.objects.filter(status=Answer.StatusType.CHECKING)
+
+
+def leased_to_other(answer, reviewer, current=None):
+    """
+        Ответ закреплён за другим проверяющим, и закрепление ещё не истекло
+
+        Одно правило для проверки одного ответа и пакета (apply_verdicts): проверить можно
+        свой или свободный ответ, чужой - только после истечения закрепления
+    """
+    return answer.claimed_by_id not in (None, reviewer.id) and answer.claimed_until > (current or now())
+
+
+def claim_answers(reviewer, limit):
+    """
+        Закрепление за проверяющим до limit самых старых свободных ответов
+
+        Особенности:
+            - Строки выбираются через SELECT ... FOR UPDATE SKIP LOCKED: параллельные claim
+              не ждут друг друга и не получают одни и те же ответы
+            - Свободен ответ без закрепления, с истёкшим закреплением или уже закреплённый за этим проверяющим
+    """
+    current = now()
+
+    with transaction.atomic():
+        ids = list(
+            review_queue()
+            .select_for_update(skip_locked=True)
+            .filter(
+                Q(claimed_until__isnull=True) |
+                Q(claimed_until__lt=current) |
+                Q(claimed_by=reviewer)
+            )
+            .order_by("created_at", "id")
+            .values_list("id", flat=True)[:limit]
+        )
+
+        Answer.objects.filter(id__in=ids).update(
+            claimed_by=reviewer,
+            claimed_until=current + REVIEW_LEASE
+        )
+
+    return review_queue().filter(id__in=ids).select_related("user", "case").order_by("created_at", "id")
+
+
+def apply_verdicts(reviewer, verdicts):
+    """
+        Проверка нескольких ответов в одной транзакции: либо все решения применяются, либо ни одного
+
+        Параметры:
+            - verdicts (list[dict]): Решения с ключами id, status, comment
+    """
+    current = now()
+
+    with transaction.atomic():
+        # Блокировка в порядке id, чтобы пересекающиеся пакеты не взаимоблокировались
+        answers = {
+            answer.id: answer
+            for answer in Answer.objects.select_for_update().filter(
+                id__in=[verdict["id"] for verdict in verdicts]
+            ).order_by("pk")
+        }
+
+        errors = []
+        for verdict in verdicts:
+            answer = answers.get(verdict["id"])
+            error = {}
+
+            if answer is None:
+                error["id"] = ["Ответ не найден"]
+            elif answer.status != Answer.StatusType.CHECKING:
+                error["status"] = ["Ответ уже проверен"]
+            elif leased_to_other(answer, reviewer, current):
+                error["id"] = ["Ответ закреплён за другим проверяющим"]
+
+            errors.append(error)
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+
+        checked = []
+        for verdict in verdicts:
+            answer = answers[verdict["id"]]
+            answer.status = verdict["status"]
+            answer.comment = verdict.get("comment")
+            answer.checked_by = reviewer
+            answer.checked_at = current
+            answer.claimed_by = None
+            answer.claimed_until = None
+            checked.append(answer)
+
+        Answer.objects.bulk_update(
+            checked,
+            ["status", "comment", "checked_by", "checked_at", "claimed_by", "claimed_until"]
+        )
+
+        # bulk_update не отправляет сигналы Answer - состояние кейсов обновляется здесь,
+        # одним UPDATE на каждый статус
+        for status in (Answer.StatusType.OK, Answer.StatusType.FAIL):
+            condition = Q()
+            for answer in checked:
+                if answer.status == status:
+                    condition |= Q(user_id=answer.user_id, case_id=answer.case_id, last_attempt=answer.attempt)
+            if condition:
+                CaseState.objects.filter(condition).update(last_status=status)
+
+        notify_status_changes(checked)
+
+    return checked
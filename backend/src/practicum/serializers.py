@@ -1,7 +1,9 @@
-from django.db.models import Max, Q, Subquery, OuterRef
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 
 from practicum.models import Answer, Case
+from practicum.review import leased_to_other
 
 
 class AnswerReadSerializer(serializers.ModelSerializer):
@@ -49,8 +51,8 @@ class AnswerCreateSerializer(serializers.ModelSerializer):
 
         Проверки:
             - text не пустой.
-            - кейс активен и доступен для пользователя.
-            - предыдущая попытка не CHECKING или OK.
+            - кейс активен.
+            - предыдущая попытка не CHECKING или OK (при создании, под блокировкой).
     """
 
     class Meta:
@@ -63,65 +65,58 @@ class AnswerCreateSerializer(serializers.ModelSerializer):
         return text
 
     def validate_case(self, case):
-        user = self.context["request"].user
-
-        last_answer = Answer.objects.filter(
-            case=OuterRef("pk"),
-            user=user
-        ).order_by("-created_at")
-
-        last_status = Subquery(last_answer.values("status")[:1])
-
-        qs = Case.objects.filter(
-            id=case.id,
-            is_active=True
-        ).annotate(
-            last_user_status=last_status
-        )
-
-        allowed = qs.filter(
-            Q(last_user_status__isnull=True) |
-            Q(last_user_status=Answer.StatusType.FAIL)
-        ).exists()
-
-        if not allowed:
+        if not case.is_active:
             raise serializers.ValidationError("Кейс недоступен")
-
         return case
 
-    def validate(self, data):
-        user = self.context["request"].user
-        case = data["case"]
-
-        last = Answer.objects.filter(user=user, case=case).order_by("-created_at").first()
-
-        if last and last.status == Answer.StatusType.CHECKING:
-            raise serializers.ValidationError("Ответ уже на проверке")
-
-        if last and last.status == Answer.StatusType.OK:
-            raise serializers.ValidationError("Кейс уже принят")
-
-        return data
-
     def create(self, validated_data):
-        user = self.context["request"].user
-
-        last_attempt = Answer.objects.filter(
-            user=user,
-            case=validated_data["case"]
-        ).aggregate(Max("attempt"))["attempt__max"] or 0
+        """
+            Проверка последней попытки и создание новой в одной транзакции
 
-        return Answer.objects.create(
-            user=user,
-            attempt=last_attempt + 1,
-            status=Answer.StatusType.CHECKING,
-            **validated_data
-        )
+            Последняя попытка читается одним запросом с блокировкой строки; если параллельный запрос
+            всё же успел создать ту же попытку, уникальный индекс (user, case, attempt) отклоняет запись,
+            и клиент получает ошибку валидации, а не 500
+        """
+        user = self.context["request"].user
+        case = validated_data["case"]
+
+        with transaction.atomic():
+            last = (
+                Answer.objects
+                .select_for_update()
+                .filter(user=user, case=case)
+                .only("attempt", "status")
+                .order_by("-attempt")
+                .first()
+            )
+
+            if last and last.status == Answer.StatusType.CHECKING:
+                raise self.non_field_error("Ответ уже на проверке")
+
+            if last and last.status == Answer.StatusType.OK:
+                raise self.non_field_error("Кейс уже принят")
+
+            try:
+                with transaction.atomic():
+                    return Answer.objects.create(
+                        user=user,
+                        attempt=last.attempt + 1 if last else 1,
+                        status=Answer.StatusType.CHECKING,
+                        **validated_data
+                    )
+            except IntegrityError:
+                raise self.non_field_error("Ответ уже на проверке")
+
+    @staticmethod
+    def non_field_error(message):
+        return serializers.ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [message]})
 
 
 class AnswerCheckSerializer(serializers.ModelSerializer):
     """
         Сериализатор для создания администратором проверки ответа
+
+        Проверить можно свой или свободный ответ; ответ с неистёкшим чужим закреплением (claim) - нельзя
     """
 
     class Meta:
@@ -136,4 +131,61 @@ class AnswerCheckSerializer(serializers.ModelSerializer):
     def validate(self, data):
         if self.instance.status != Answer.StatusType.CHECKING:
             raise serializers.ValidationError("Ответ уже проверен")
+        if leased_to_other(self.instance, self.context["request"].user):
+            raise serializers.ValidationError("Ответ закреплён за другим проверяющим")
         return data
+
+
+class AnswerReviewSerializer(serializers.ModelSerializer):
+    """
+        Сериализатор ответа в очереди проверки
+    """
+    username = serializers.CharField(source="user.username", read_only=True)
+    case_name = serializers.CharField(source="case.name", read_only=True)
+
+    class Meta:
+        model = Answer
+        fields = [
+            "id",
+            "user",
+            "username",
+            "case",
+            "case_name",
+            "text",
+            "attempt",
+            "status",
+            "claimed_by",
+            "claimed_until",
+            "created_at",
+        ]
+
+
+class AnswerClaimSerializer(serializers.Serializer):
+    """
+        Сколько ответов взять из очереди проверки
+    """
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=20)
+
+
+class AnswerVerdictSerializer(serializers.Serializer):
+    """
+        Решение по одному ответу в пакетной проверке
+    """
+    id = serializers.IntegerField()
+    status = serializers.ChoiceField(choices=[Answer.StatusType.OK, Answer.StatusType.FAIL])
+    comment = serializers.CharField(max_length=750, required=False, allow_null=True, allow_blank=True)
+
+
+class AnswerVerdictBatchSerializer(serializers.ListSerializer):
+    child = AnswerVerdictSerializer()
+
+    def validate(self, attrs):
+        ids = [item["id"] for item in attrs]
+
+        if not ids:
+            raise serializers.ValidationError("Пустой список")
+
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError("Дубликаты ответов в запросе")
+
+        return attrs
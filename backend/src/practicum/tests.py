@@ -1,3 +1,369 @@
-from django.test import TestCase
+import threading
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils.timezone import now
+from rest_framework import serializers
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.events import get_event_bus
+from . import events
+from .models import Answer, Case, CaseState
+from .review import apply_verdicts, claim_answers
+from .serializers import AnswerCreateSerializer
+
+IN_PROCESS_BUS = {"BACKEND": "core.events.InProcessEventBus"}
+
+
+def create_answers(count):
+    case = Case.objects.create(name="Кейс", description="Описание")
+    authors = [User.objects.create_user(username=f'author-{i}') for i in range(count)]
+    return [Answer.objects.create(user=author, case=case, text="Ответ", attempt=1) for author in authors]
+
+
+@override_settings(EVENT_BUS=IN_PROCESS_BUS)
+class AnswerCreateTest(TestCase):
+    """Новая попытка: запрет при CHECKING и OK, нумерация попыток, неактивный кейс и пустой текст"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='teacher')
+        self.case = Case.objects.create(name="Кейс", description="Описание")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def submit(self, text="Ответ", case=None):
+        return self.client.post('/api/practicum/answer/', {'case': (case or self.case).id, 'text': text}, format='json')
+
+    def set_last_status(self, status):
+        Answer.objects.filter(user=self.user, case=self.case).update(status=status)
+
+    def attempts(self):
+        return list(Answer.objects.filter(user=self.user, case=self.case).order_by('attempt').values_list(
+            'attempt', 'status'
+        ))
+
+    def test_attempt_numbering(self):
+        self.assertEqual(self.submit().status_code, 201)
+        self.set_last_status("fail")
+        self.assertEqual(self.submit().status_code, 201)
+
+        self.assertEqual(self.attempts(), [(1, "fail"), (2, "check")])
+
+    def test_checking_and_ok_block_new_attempt(self):
+        self.submit()
+        response = self.submit()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"non_field_errors": ["Ответ уже на проверке"]})
+
+        self.set_last_status("ok")
+        response = self.submit()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"non_field_errors": ["Кейс уже принят"]})
+        self.assertEqual(self.attempts(), [(1, "ok")])
+
+    def test_field_validation(self):
+        response = self.submit(text="   ")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("text", response.json())
+
+        inactive = Case.objects.create(name="Архив", description="Описание", is_active=False)
+        self.assertEqual(self.submit(case=inactive).json(), {"case": ["Кейс недоступен"]})
+        self.assertFalse(Answer.objects.exists())
+
+
+@override_settings(EVENT_BUS=IN_PROCESS_BUS)
+class AnswerCreateConcurrencyTest(TransactionTestCase):
+    """Двойная отправка: вторая попытка с тем же номером отклоняется уникальным индексом с ответом 400"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='teacher')
+        self.case = Case.objects.create(name="Кейс", description="Описание")
+
+    def submit_in_parallel(self):
+        """Первая отправка создаёт попытку и держит транзакцию, пока вторая идёт через API"""
+        created = threading.Event()
+
+        def first_submit():
+            try:
+                with transaction.atomic():
+                    serializer = AnswerCreateSerializer(
+                        data={'case': self.case.id, 'text': "Первый"},
+                        context={'request': SimpleNamespace(user=self.user)}
+                    )
+                    serializer.is_valid(raise_exception=True)
+                    serializer.save()
+                    created.set()
+                    # Вторая отправка ждёт на уникальном индексе, пока эта транзакция не зафиксирована
+                    threading.Event().wait(0.5)
+            finally:
+                connection.close()
+
+        first = threading.Thread(target=first_submit)
+        first.start()
+        try:
+            self.assertTrue(created.wait(timeout=10))
+            client = APIClient()
+            client.force_authenticate(self.user)
+            return client.post('/api/practicum/answer/', {'case': self.case.id, 'text': "Второй"}, format='json')
+        finally:
+            first.join()
+
+    def test_first_attempt_double_submit(self):
+        # Строки для блокировки ещё нет: обе отправки считают попытку первой
+        response = self.submit_in_parallel()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"non_field_errors": ["Ответ уже на проверке"]})
+        self.assertEqual(list(Answer.objects.values_list('attempt', 'text')), [(1, "Первый")])
+
+    def test_retry_double_submit(self):
+        Answer.objects.create(user=self.user, case=self.case, text="Ответ", attempt=1, status="fail")
+
+        # Вторая отправка ждёт блокировку строки попытки 1 и после фиксации первой видит новую попытку
+        response = self.submit_in_parallel()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            list(Answer.objects.order_by('attempt').values_list('attempt', 'status')), [(1, "fail"), (2, "check")]
+        )
+
+
+@override_settings(EVENT_BUS=IN_PROCESS_BUS)
+class CaseListsTest(TestCase):
+    """Открытые и закрытые кейсы по CaseState: переход между списками после ответа и проверок"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='teacher')
+        self.reviewer = User.objects.create_user(username='reviewer', is_staff=True)
+        self.first = Case.objects.create(name="Первый", description="Описание")
+        self.second = Case.objects.create(name="Второй", description="Описание")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def lists(self):
+        return tuple(
+            sorted(case['id'] for case in self.client.get(f'/api/practicum/{name}/').json()['results'])
+            for name in ('open-cases', 'closed-cases')
+        )
+
+    def submit(self, case):
+        response = self.client.post('/api/practicum/answer/', {'case': case.id, 'text': "Ответ"}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return Answer.objects.filter(user=self.user, case=case).order_by('-attempt').first()
+
+    def check_answer(self, answer, status):
+        client = APIClient()
+        client.force_authenticate(self.reviewer)
+        response = client.put(f'/api/practicum/admin/check/{answer.id}/', {'status': status}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_cases_move_between_lists(self):
+        self.assertEqual(self.lists(), ([self.first.id, self.second.id], []))
+
+        answer = self.submit(self.first)
+        self.assertEqual(self.lists(), ([self.second.id], [self.first.id]))
+
+        self.check_answer(answer, "fail")
+        self.assertEqual(self.lists(), ([self.first.id, self.second.id], []))
+
+        answer = self.submit(self.first)
+        self.check_answer(answer, "ok")
+        self.assertEqual(self.lists(), ([self.second.id], [self.first.id]))
+
+        closed = self.client.get('/api/practicum/closed-cases/').json()['results'][0]
+        # В списке кейса - все попытки пользователя по порядку
+        self.assertEqual([(item['attempt'], item['status']) for item in closed['answers']], [(1, "fail"), (2, "ok")])
+
+    def test_batch_verdicts_update_lists(self):
+        first, second = self.submit(self.first), self.submit(self.second)
+        self.assertEqual(self.lists(), ([], [self.first.id, self.second.id]))
+
+        apply_verdicts(self.reviewer, [{"id": first.id, "status": "ok"}, {"id": second.id, "status": "fail"}])
+        self.assertEqual(self.lists(), ([self.second.id], [self.first.id]))
+
+        # Повторная попытка по непринятому кейсу снова закрывает его до проверки
+        self.submit(self.second)
+        self.assertEqual(self.lists(), ([], [self.first.id, self.second.id]))
+
+
+@override_settings(EVENT_BUS=IN_PROCESS_BUS)
+class ReviewLeaseTest(TestCase):
+    """Закрепление ответов за проверяющими: claim, истечение, проверка только своих ответов"""
+
+    def setUp(self):
+        self.answers = create_answers(3)
+        self.reviewer = User.objects.create_user(username='reviewer', is_staff=True)
+        self.other = User.objects.create_user(username='other', is_staff=True)
+
+    def ids(self, answers):
+        return [answer.id for answer in answers]
+
+    def check_answer(self, answer, reviewer):
+        client = APIClient()
+        client.force_authenticate(reviewer)
+        return client.put(f'/api/practicum/admin/check/{answer.id}/', {'status': 'ok'}, format='json')
+
+    def test_claims_are_disjoint(self):
+        first = claim_answers(self.reviewer, 2)
+        second = claim_answers(self.other, 2)
+
+        self.assertEqual(self.ids(first), self.ids(self.answers[:2]))
+        self.assertEqual(self.ids(second), self.ids(self.answers[2:]))
+        # Повторный claim продлевает свои ответы, а не берёт чужие
+        self.assertEqual(self.ids(claim_answers(self.reviewer, 3)), self.ids(self.answers[:2]))
+
+    def test_expired_lease_is_claimable(self):
+        claim_answers(self.reviewer, 3)
+        Answer.objects.filter(id=self.answers[0].id).update(claimed_until=now() - timedelta(seconds=1))
+
+        self.assertEqual(self.ids(claim_answers(self.other, 3)), [self.answers[0].id])
+        self.answers[0].refresh_from_db()
+        self.assertEqual(self.answers[0].claimed_by, self.other)
+        self.assertGreater(self.answers[0].claimed_until, now())
+
+    def test_check_rejects_foreign_lease(self):
+        answer = self.answers[0]
+        claim_answers(self.other, 1)
+        self.assertEqual(self.check_answer(answer, self.reviewer).status_code, 400)
+
+        # Своё закрепление не мешает, а для остальных ответ занят
+        claim_answers(self.reviewer, 1)
+        self.assertEqual(self.check_answer(self.answers[1], self.other).status_code, 400)
+        self.assertEqual(self.check_answer(self.answers[1], self.reviewer).status_code, 200)
+
+        # Истёкшее чужое закрепление не мешает
+        Answer.objects.filter(id=answer.id).update(claimed_until=now() - timedelta(seconds=1))
+        self.assertEqual(self.check_answer(answer, self.reviewer).status_code, 200)
+
+        answer.refresh_from_db()
+        self.assertEqual((answer.status, answer.checked_by, answer.claimed_by), ("ok", self.reviewer, None))
+        self.assertEqual(CaseState.objects.get(user=answer.user, case=answer.case).last_status, "ok")
+
+    def test_unclaimed_answer_checked_by_both_paths(self):
+        # Проверка без claim (прежний порядок работы администратора) разрешена и для одного ответа, и для пакета
+        self.assertEqual(self.check_answer(self.answers[0], self.reviewer).status_code, 200)
+        checked = apply_verdicts(self.reviewer, [{"id": self.answers[1].id, "status": "fail"}])
+        self.assertEqual([answer.status for answer in checked], ["fail"])
+
+    def test_verdicts_reject_foreign_lease(self):
+        claim_answers(self.other, 1)
+        verdicts = [{"id": answer.id, "status": "fail"} for answer in self.answers]
+
+        with self.assertRaises(serializers.ValidationError) as error:
+            apply_verdicts(self.reviewer, verdicts)
+        self.assertEqual(error.exception.detail[0], {"id": ["Ответ закреплён за другим проверяющим"]})
+        self.assertFalse(Answer.objects.exclude(status="check").exists())
+
+        Answer.objects.filter(id=self.answers[0].id).update(claimed_until=now() - timedelta(seconds=1))
+        self.assertEqual(len(apply_verdicts(self.reviewer, verdicts)), 3)
+        self.assertFalse(Answer.objects.filter(status="check").exists())
+
+
+@override_settings(EVENT_BUS=IN_PROCESS_BUS)
+class ClaimSkipLockedTest(TransactionTestCase):
+    """Строки, заблокированные другой транзакцией, пропускаются, а не ожидаются"""
+
+    def test_claim_skips_locked_rows(self):
+        answers = create_answers(3)
+        reviewer = User.objects.create_user(username='reviewer', is_staff=True)
+
+        locked = threading.Event()
+        release = threading.Event()
+
+        def hold_lock():
+            try:
+                with transaction.atomic():
+                    list(Answer.objects.select_for_update().filter(id=answers[0].id))
+                    locked.set()
+                    release.wait(timeout=10)
+            finally:
+                connection.close()
+
+        holder = threading.Thread(target=hold_lock)
+        holder.start()
+        try:
+            self.assertTrue(locked.wait(timeout=10))
+            claimed = claim_answers(reviewer, 3)
+        finally:
+            release.set()
+            holder.join()
+
+        self.assertEqual([answer.id for answer in claimed], [answer.id for answer in answers[1:]])
+        # После фиксации той транзакции ответ снова в очереди
+        self.assertEqual([answer.id for answer in claim_answers(reviewer, 3)], [answer.id for answer in answers])
+
+
+@override_settings(
+    EVENT_BUS=IN_PROCESS_BUS,
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+)
+@mock.patch.object(events, "HEARTBEAT_INTERVAL", 0.05)
+@mock.patch.object(events, "STREAM_LIFETIME", 0.2)
+# Соединение TestCase открыто в транзакции теста, закрывать его нельзя
+@mock.patch.object(events, "close_old_connections", lambda: None)
+class StatusEventsTest(TestCase):
+    """Поток SSE: аутентификация токеном и сессией, события о смене статуса, пинги, отписка"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='teacher')
+        self.channel = events.CHANNEL.format(user_id=self.user.id)
+
+    async def read_stream(self, response, *messages):
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        # Подписка создана до возврата ответа: опубликованное сейчас попадёт в поток
+        for message in messages:
+            get_event_bus().publish(self.channel, message)
+        return [chunk async for chunk in response.streaming_content]
+
+    async def test_requires_authentication(self):
+        response = await self.async_client.get('/api/practicum/events/')
+        self.assertEqual(response.status_code, 401)
+
+        response = await self.async_client.get('/api/practicum/events/', headers={"Authorization": "Token invalid"})
+        self.assertEqual(response.status_code, 401)
+
+    async def test_session_authentication(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get('/api/practicum/events/')
+        chunks = await self.read_stream(response, {"answer_id": 1, "status": "ok"})
+
+        self.assertEqual(chunks[0], b"retry: 3000\n\n")
+        self.assertEqual(chunks[1], b'event: status\ndata: {"answer_id": 1, "status": "ok"}\n\n')
+        self.assertTrue(chunks[2:])
+        self.assertEqual(set(chunks[2:]), {b": ping\n\n"})
+        # Поток завершился по STREAM_LIFETIME и отписался от канала
+        self.assertNotIn(self.channel, get_event_bus()._subscriptions)
+
+    async def test_token_authentication(self):
+        token = await Token.objects.acreate(user=self.user)
+        response = await self.async_client.get('/api/practicum/events/', headers={"Authorization": f"Token {token.key}"})
+        chunks = await self.read_stream(response)
+        self.assertEqual(chunks[0], b"retry: 3000\n\n")
+
+    async def test_notify_after_commit(self):
+        subscription = await get_event_bus().subscribe(self.channel)
+        answer = Answer(id=7, user=self.user, case_id=3, attempt=2, status="fail")
+
+        def notify():
+            with self.captureOnCommitCallbacks() as callbacks:
+                events.notify_status_changes([answer])
+            # До фиксации событие не публикуется
+            self.assertEqual(len(callbacks), 1)
+            return callbacks
+
+        callbacks = await sync_to_async(notify)()
+        self.assertIsNone(await subscription.get(0.01))
+
+        callbacks[0]()
+        self.assertEqual(
+            await subscription.get(1),
+            {"answer_id": 7, "case_id": 3, "attempt": 2, "status": "fail"}
+        )
+        await subscription.close()
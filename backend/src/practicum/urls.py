@@ -7,6 +7,7 @@ from practicum.views import (
     AdminAnswerCheckViewSet,
     ClosedCasesViewSet
 )
+from practicum.events import status_events
 
 router = DefaultRouter()
 
@@ -27,5 +28,8 @@ router.register(r'admin/check', AdminAnswerCheckViewSet, basename='admin-check')
 
 
 urlpatterns = [
+    # 6) Поток событий о смене статусов ответов пользователя (SSE, только под ASGI)
+    path('events/', status_events, name='practicum-events'),
+
     path('', include(router.urls)),
 ]
@@ -1,38 +1,43 @@
-from django.db.models import Q, Prefetch, OuterRef, Subquery
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Prefetch
+from django.utils.timezone import now
 from drf_spectacular.utils import OpenApiResponse, OpenApiExample, extend_schema
 from rest_framework import status
+from rest_framework.decorators import action
 from rest_framework.mixins import CreateModelMixin, UpdateModelMixin
 from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
 from rest_framework.viewsets import ReadOnlyModelViewSet, GenericViewSet
 
-from practicum.models import Answer, Case
+from core.pagination import KeysetCursorPagination
+from practicum.events import notify_status_changes
+from practicum.models import Answer, Case, CaseState
+from practicum.review import apply_verdicts, claim_answers, review_queue
 from practicum.serializers import CaseWithAnswersSerializer, AnswerCreateSerializer, AnswerReadSerializer, \
-    AnswerCheckSerializer
+    AnswerCheckSerializer, AnswerReviewSerializer, AnswerClaimSerializer, AnswerVerdictSerializer, \
+    AnswerVerdictBatchSerializer
 
 
 class OpenCasesViewSet(ReadOnlyModelViewSet):
     serializer_class = CaseWithAnswersSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetCursorPagination
+    ordering = ["-created_at"]
 
     def get_queryset(self):
         user = self.request.user
 
-        last_answer_subquery = Answer.objects.filter(
-            case=OuterRef('pk'),
-            user=user
-        ).order_by('-created_at')
-
-        last_status = Subquery(last_answer_subquery.values('status')[:1])
-
         return (
             Case.objects
             .filter(is_active=True)
-            .annotate(last_user_status=last_status)
-            .filter(
-                Q(last_user_status=Answer.StatusType.FAIL) |  # последняя попытка не принята
-                Q(last_user_status__isnull=True)  # попыток нет
-            )
-            .distinct()
+            # попыток нет или последняя попытка не принята (FAIL)
+            .exclude(Exists(
+                CaseState.objects.filter(
+                    user=user,
+                    case=OuterRef("pk"),
+                    last_status__in=[Answer.StatusType.CHECKING, Answer.StatusType.OK]
+                )
+            ))
             .prefetch_related(
                 Prefetch("answer_set",
                          queryset=Answer.objects.filter(user=user).order_by("-created_at"),
@@ -46,7 +51,8 @@ class OpenCasesViewSet(ReadOnlyModelViewSet):
                 "Возвращает список доступных к ответу кейсов:\n"
                 "- пользователь ещё не отвечал\n"
                 "- или последняя попытка имеет статус FAIL\n\n"
-                "Включает все ответы пользователя по каждому кейсу"
+                "Включает все ответы пользователя по каждому кейсу\n\n"
+                "Список разбит на страницы (параметры cursor и page_size)"
         ),
         tags=["Практикум"],
         responses={
@@ -55,23 +61,27 @@ class OpenCasesViewSet(ReadOnlyModelViewSet):
                 examples=[
                     OpenApiExample(
                         "Пример",
-                        value=[
-                            {
-                                "id": 1,
-                                "name": "Кейс по архитектуре",
-                                "description": "Опишите архитектуру сервиса",
-                                "answers": [
-                                    {
-                                        "id": 10,
-                                        "text": "Микросервисная архитектура...",
-                                        "status": "fail",
-                                        "comment": "Недостаточно деталей",
-                                        "attempt": 1,
-                                        "created_at": "2026-04-01T10:00:00Z"
-                                    }
-                                ]
-                            }
-                        ]
+                        value={
+                            "next": None,
+                            "previous": None,
+                            "results": [
+                                {
+                                    "id": 1,
+                                    "name": "Кейс по архитектуре",
+                                    "description": "Опишите архитектуру сервиса",
+                                    "answers": [
+                                        {
+                                            "id": 10,
+                                            "text": "Микросервисная архитектура...",
+                                            "status": "fail",
+                                            "comment": "Недостаточно деталей",
+                                            "attempt": 1,
+                                            "created_at": "2026-04-01T10:00:00Z"
+                                        }
+                                    ]
+                                }
+                            ]
+                        }
                     )
                 ]
             )
@@ -84,26 +94,20 @@ class OpenCasesViewSet(ReadOnlyModelViewSet):
 class ClosedCasesViewSet(ReadOnlyModelViewSet):
     serializer_class = CaseWithAnswersSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetCursorPagination
+    ordering = ["-created_at"]
 
     def get_queryset(self):
         user = self.request.user
 
-        last_answer_subquery = Answer.objects.filter(
-            case=OuterRef('pk'),
-            user=user
-        ).order_by('-created_at')
-
-        last_status = Subquery(last_answer_subquery.values('status')[:1])
-
         return (
             Case.objects
             .filter(is_active=True)
-            .annotate(last_user_status=last_status)
+            # последняя попытка принята (OK) или проверяется (CHECKING)
             .filter(
-                Q(last_user_status=Answer.StatusType.OK) |  # последняя попытка принята
-                Q(last_user_status=Answer.StatusType.CHECKING)  # последняя попытка проверяется
+                states__user=user,
+                states__last_status__in=[Answer.StatusType.OK, Answer.StatusType.CHECKING]
             )
-            .distinct()
             .prefetch_related(
                 Prefetch("answer_set",
                          queryset=Answer.objects.filter(user=user).order_by("-created_at"),
@@ -117,7 +121,8 @@ class ClosedCasesViewSet(ReadOnlyModelViewSet):
                 "Возвращает кейсы, которые недоступны к ответу:\n"
                 "- уже приняты (OK)\n"
                 "- или находятся на проверке (CHECKING)\n\n"
-                "Включает все ответы пользователя."
+                "Включает все ответы пользователя.\n\n"
+                "Список разбит на страницы (параметры cursor и page_size)"
         ),
         tags=["Практикум"],
         responses={
@@ -126,23 +131,27 @@ class ClosedCasesViewSet(ReadOnlyModelViewSet):
                 examples=[
                     OpenApiExample(
                         "Пример",
-                        value=[
-                            {
-                                "id": 2,
-                                "name": "Алгоритмы",
-                                "description": "Оптимизация поиска",
-                                "answers": [
-                                    {
-                                        "id": 22,
-                                        "text": "Использовал бинарный поиск...",
-                                        "status": "ok",
-                                        "comment": "Отлично",
-                                        "attempt": 2,
-                                        "created_at": "2026-04-02T12:00:00Z"
-                                    }
-                                ]
-                            }
-                        ]
+                        value={
+                            "next": None,
+                            "previous": None,
+                            "results": [
+                                {
+                                    "id": 2,
+                                    "name": "Алгоритмы",
+                                    "description": "Оптимизация поиска",
+                                    "answers": [
+                                        {
+                                            "id": 22,
+                                            "text": "Использовал бинарный поиск...",
+                                            "status": "ok",
+                                            "comment": "Отлично",
+                                            "attempt": 2,
+                                            "created_at": "2026-04-02T12:00:00Z"
+                                        }
+                                    ]
+                                }
+                            ]
+                        }
                     )
                 ]
             )
@@ -211,13 +220,78 @@ class AnswerViewSet(CreateModelMixin, GenericViewSet):
 
 
 class AdminAnswerViewSet(ReadOnlyModelViewSet):
-    serializer_class = AnswerReadSerializer
+    serializer_class = AnswerReviewSerializer
     permission_classes = [IsAdminUser]
+    pagination_class = KeysetCursorPagination
+    ordering = ["created_at"]
 
     def get_queryset(self):
-        return Answer.objects.filter(
-            status=Answer.StatusType.CHECKING
-        ).select_related("user", "case")
+        return review_queue().select_related("user", "case")
+
+    @extend_schema(
+        summary="Очередь проверки",
+        description=(
+                "Ответы на проверке (CHECKING), старые первыми.\n\n"
+                "Список разбит на страницы (параметры cursor и page_size)"
+        ),
+        tags=["Практикум"],
+    )
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @extend_schema(
+        summary="Взять ответы из очереди",
+        description=(
+                "Закрепляет за проверяющим до limit самых старых свободных ответов "
+                "и возвращает их.\n\n"
+                "Особенности:\n"
+                "- Параллельные запросы разных проверяющих никогда не получают одни и те же ответы\n"
+                "- Закрепление действует 15 минут, после этого ответ снова доступен остальным\n"
+                "- Повторный запрос продлевает закрепление уже взятых ответов\n"
+        ),
+        tags=["Практикум"],
+        request=AnswerClaimSerializer,
+        responses={status.HTTP_200_OK: AnswerReviewSerializer(many=True)},
+    )
+    @action(detail=False, methods=["post"])
+    def claim(self, request):
+        serializer = AnswerClaimSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        answers = claim_answers(request.user, serializer.validated_data["limit"])
+        return Response(AnswerReviewSerializer(answers, many=True).data)
+
+    @extend_schema(
+        summary="Пакетная проверка ответов",
+        description=(
+                "Принимает список решений {id, status, comment} и применяет их в одной транзакции.\n\n"
+                "Особенности:\n"
+                "- status: ok или fail\n"
+                "- Если хотя бы одно решение недопустимо (ответ не найден, уже проверен или закреплён "
+                "за другим проверяющим), не применяется ни одно; ошибки возвращаются по позициям списка\n"
+        ),
+        tags=["Практикум"],
+        request=AnswerVerdictSerializer(many=True),
+        responses={
+            status.HTTP_200_OK: AnswerReviewSerializer(many=True),
+            status.HTTP_400_BAD_REQUEST: OpenApiResponse(
+                description="Ошибка валидации",
+                examples=[
+                    OpenApiExample(
+                        "Ответ уже проверен",
+                        value=[{}, {"status": ["Ответ уже проверен"]}]
+                    )
+                ]
+            )
+        },
+    )
+    @action(detail=False, methods=["post"])
+    def verdicts(self, request):
+        serializer = AnswerVerdictBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        answers = apply_verdicts(request.user, serializer.validated_data)
+        return Response(AnswerReviewSerializer(answers, many=True).data)
 
 
 class AdminAnswerCheckViewSet(UpdateModelMixin, GenericViewSet):
@@ -225,10 +299,21 @@ class AdminAnswerCheckViewSet(UpdateModelMixin, GenericViewSet):
     permission_classes = [IsAdminUser]
     http_method_names = ['put']
 
+    def update(self, request, *args, **kwargs):
+        # Строка ответа заблокирована от проверки закрепления до записи решения
+        with transaction.atomic():
+            return super().update(request, *args, **kwargs)
+
     def perform_update(self, serializer):
-        serializer.save(checked_by=self.request.user)
+        answer = serializer.save(
+            checked_by=self.request.user,
+            checked_at=now(),
+            claimed_by=None,
+            claimed_until=None
+        )
+        notify_status_changes([answer])
 
     def get_queryset(self):
         return Answer.objects.filter(
             status=Answer.StatusType.CHECKING
-        ).select_related("user", "case")
+        ).select_related("user", "case").select_for_update(of=("self",))
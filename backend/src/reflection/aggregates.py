@@ -0,0 +1,118 @@
+from datetime import timedelta
+
+from .models import DailyAnswerStat, Question
+
+MEAN_WINDOWS = (7, 30)
+
+
+def update_daily_stats(user, day, answers):
+    """
+        Дневные агрегаты по записанным ответам одним INSERT ... ON CONFLICT DO UPDATE
+
+        За день у пользователя один ответ на вопрос, поэтому агрегат дня перезаписывается значением ответа
+    """
+    stats = [
+        DailyAnswerStat(
+            user=user,
+            question_id=answer.question_id,
+            day=day,
+            answers_count=int(answer.value_int is not None or answer.value_text is not None),
+            value_count=int(answer.value_int is not None),
+            value_sum=answer.value_int or 0,
+            value_min=answer.value_int,
+            value_max=answer.value_int,
+        )
+        for answer in answers
+    ]
+
+    DailyAnswerStat.objects.bulk_create(
+        stats,
+        update_conflicts=True,
+        unique_fields=["user", "day", "question"],
+        update_fields=["answers_count", "value_count", "value_sum", "value_min", "value_max"]
+    )
+
+
+def answer_streak(user, today):
+    """
+        Число дней подряд с ответами, заканчивая сегодня
+
+        Если сегодня ответов ещё нет, серия считается до вчерашнего дня. Читается столько дней, сколько длится серия
+    """
+    days = DailyAnswerStat.objects.filter(
+        user=user,
+        day__lte=today,
+        answers_count__gt=0
+    ).values_list("day", flat=True).distinct().order_by("-day").iterator()
+
+    streak = 0
+    expected = today
+    for day in days:
+        if day == expected or (streak == 0 and day == today - timedelta(days=1)):
+            streak += 1
+            expected = day - timedelta(days=1)
+        else:
+            break
+
+    return streak
+
+
+def question_stats(user, today, days, question_ids=None):
+    """
+        Средние за 7 и 30 дней, минимум и максимум за days дней по вопросам с оценкой
+
+        Читаются только дневные агрегаты за max(days, 30) дней
+    """
+    window = max(days, *MEAN_WINDOWS)
+
+    questions = Question.objects.filter(type=Question.QuestionType.CHOICE).order_by("id")
+    if question_ids:
+        questions = questions.filter(id__in=question_ids)
+
+    rows = DailyAnswerStat.objects.filter(
+        user=user,
+        day__gt=today - timedelta(days=window),
+        day__lte=today,
+        value_count__gt=0,
+        question__in=questions
+    ).values_list("question_id", "day", "value_count", "value_sum", "value_min", "value_max")
+
+    totals = {}
+    for question_id, day, value_count, value_sum, value_min, value_max in rows:
+        question_totals = totals.setdefault(question_id, {
+            "sums": dict.fromkeys(MEAN_WINDOWS, 0),
+            "counts": dict.fromkeys(MEAN_WINDOWS, 0),
+            "min": None,
+            "max": None,
+            "answered_days": 0,
+        })
+        age = (today - day).days
+
+        for mean_window in MEAN_WINDOWS:
+            if age < mean_window:
+                question_totals["sums"][mean_window] += value_sum
+                question_totals["counts"][mean_window] += value_count
+
+        if age < days:
+            question_totals["answered_days"] += 1
+            if question_totals["min"] is None or value_min < question_totals["min"]:
+                question_totals["min"] = value_min
+            if question_totals["max"] is None or value_max > question_totals["max"]:
+                question_totals["max"] = value_max
+
+    result = []
+    for question in questions:
+        question_totals = totals.get(question.id)
+        if question_totals is None:
+            continue
+
+        item = {"id": question.id, "text": question.text}
+        for mean_window in MEAN_WINDOWS:
+            count = question_totals["counts"][mean_window]
+            item[f"mean_{mean_window}"] = question_totals["sums"][mean_window] / count if count else None
+        item["min"] = question_totals["min"]
+        item["max"] = question_totals["max"]
+        item["answered_days"] = question_totals["answered_days"]
+        result.append(item)
+
+    return result
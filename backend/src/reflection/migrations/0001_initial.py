@@ -0,0 +1,41 @@
+# Generated by Django 6.0.1 on 2026-02-10 20:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Question',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.TextField()),
+                ('type', models.CharField(choices=[('choice', 'Choice (1-5)'), ('text', 'Text')], max_length=10)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Answer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value_int', models.IntegerField(blank=True, null=True)),
+                ('value_text', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reflection_answers', to=settings.AUTH_USER_MODEL)),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='reflection.question')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'created_at'], name='reflection__user_id_b7bb1e_idx'), models.Index(fields=['user', 'question'], name='reflection__user_id_1bce09_idx')],
+            },
+        ),
+    ]
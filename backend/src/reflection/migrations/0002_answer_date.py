@@ -0,0 +1,62 @@
+# Generated by Django 6.0.1 on 2026-10-17 18:50
+
+import reflection.models
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+from django.db.models.functions import TruncDate
+from django.utils.timezone import get_default_timezone
+
+
+def fill_answer_date(apps, schema_editor):
+    """
+        День ответа по created_at в часовом поясе settings.TIME_ZONE одним UPDATE
+
+        До уникального ограничения за день могли сохраниться несколько ответов на вопрос:
+        остаётся последний, как его и показывали список вопросов и история
+    """
+    Answer = apps.get_model('reflection', 'Answer')
+
+    Answer.objects.update(answer_date=TruncDate('created_at', tzinfo=get_default_timezone()))
+
+    newer = Answer.objects.filter(
+        user=OuterRef('user'),
+        question=OuterRef('question'),
+        answer_date=OuterRef('answer_date'),
+        id__gt=OuterRef('id')
+    )
+    Answer.objects.filter(Exists(newer)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reflection', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='answer',
+            name='reflection__user_id_1bce09_idx',
+        ),
+        migrations.AddField(
+            model_name='answer',
+            name='answer_date',
+            field=models.DateField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_answer_date, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='answer',
+            name='answer_date',
+            field=models.DateField(default=reflection.models.local_today, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='answer',
+            index=models.Index(fields=['user', 'question', '-created_at'], name='answer_user_question_recent'),
+        ),
+        migrations.AddConstraint(
+            model_name='answer',
+            constraint=models.UniqueConstraint(fields=('user', 'answer_date', 'question'), name='unique_answer_per_local_day'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 6.0.1 on 2026-10-17 19:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_daily_stats(apps, schema_editor):
+    """Агрегаты по уже сохранённым ответам, как в update_daily_stats: за день один ответ на вопрос"""
+    Answer = apps.get_model('reflection', 'Answer')
+    DailyAnswerStat = apps.get_model('reflection', 'DailyAnswerStat')
+
+    rows = Answer.objects.values('user_id', 'question_id', day=models.F('answer_date')).annotate(
+        answers_count=Count('id', filter=Q(value_int__isnull=False) | Q(value_text__isnull=False)),
+        value_count=Count('value_int'),
+        value_sum=Coalesce(Sum('value_int'), Value(0)),
+        value_min=Min('value_int'),
+        value_max=Max('value_int'),
+    ).order_by()
+
+    DailyAnswerStat.objects.bulk_create(
+        (DailyAnswerStat(**row) for row in rows.iterator(chunk_size=2000)),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reflection', '0002_answer_date'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAnswerStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('answers_count', models.PositiveSmallIntegerField(default=0)),
+                ('value_count', models.PositiveSmallIntegerField(default=0)),
+                ('value_sum', models.IntegerField(default=0)),
+                ('value_min', models.SmallIntegerField(blank=True, null=True)),
+                ('value_max', models.SmallIntegerField(blank=True, null=True)),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='reflection.question')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reflection_daily_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'day', 'question'), name='unique_daily_answer_stat')],
+            },
+        ),
+        migrations.RunPython(fill_daily_stats, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,13 @@
 from django.db import models
+from django.utils.timezone import get_default_timezone, localdate
 from rest_framework.authtoken.admin import User
 
 
+def local_today():
+    """Сегодняшняя дата в часовом поясе settings.TIME_ZONE"""
+    return localdate(timezone=get_default_timezone())
+
+
 class Question(models.Model):
     """
         Вопрос в разделе "Рефлексия"
@@ -37,10 +43,15 @@ class Answer(models.Model):
             - value_int (IntegerField): Числовой ответ (1–5 для choice), nullable для текстовых вопросов
             - value_text (TextField): Текстовый ответ, nullable для choice вопросов
             - created_at (DateTimeField): Дата и время создания ответа
+            - answer_date (DateField): День ответа в часовом поясе settings.TIME_ZONE, задаётся при создании
 
         Индексы:
-            - По пользователю и дате создания (для выборки истории)
-            - По пользователю и вопросу (для быстрого поиска существующих ответов)
+            - По пользователю и дате создания
+            - По пользователю, вопросу и дате создания по убыванию (для поиска последних ответов)
+
+        Ограничения:
+            - Один ответ пользователя на вопрос за день; уникальный индекс (user, answer_date, question)
+              обслуживает все выборки за день и по диапазону дней
 
         Примечания:
             - Ответы на один вопрос ежедневно создаются новые
@@ -53,12 +64,57 @@ class Answer(models.Model):
     value_text = models.TextField(null=True, blank=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
+    answer_date = models.DateField(default=local_today, editable=False)
 
     class Meta:
         indexes = [
             models.Index(fields=["user", "created_at"]),
-            models.Index(fields=["user", "question"]),
+            models.Index(fields=["user", "question", "-created_at"], name="answer_user_question_recent"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "answer_date", "question"],
+                name="unique_answer_per_local_day"
+            )
         ]
 
     def __str__(self):
         return f"{self.user} - {self.question_id}"
+
+
+class DailyAnswerStat(models.Model):
+    """
+        Дневной агрегат ответов пользователя на вопрос
+
+        Поля:
+            - user (ForeignKey): Пользователь
+            - question (ForeignKey): Вопрос
+            - day (DateField): День в часовом поясе settings.TIME_ZONE
+            - answers_count (PositiveSmallIntegerField): Число непустых ответов за день
+            - value_count (PositiveSmallIntegerField): Число оценок (choice) за день
+            - value_sum (IntegerField): Сумма оценок за день
+            - value_min, value_max (SmallIntegerField): Минимальная и максимальная оценка за день
+
+        Примечания:
+            - Обновляется при записи ответов (AnswerBulkSerializer), статистика читается только отсюда
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="reflection_daily_stats")
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
+    day = models.DateField()
+
+    answers_count = models.PositiveSmallIntegerField(default=0)
+    value_count = models.PositiveSmallIntegerField(default=0)
+    value_sum = models.IntegerField(default=0)
+    value_min = models.SmallIntegerField(null=True, blank=True)
+    value_max = models.SmallIntegerField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "day", "question"],
+                name="unique_daily_answer_stat"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.question_id} - {self.day}"
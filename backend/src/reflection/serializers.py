@@ -1,11 +1,34 @@
-from django.utils.timezone import now
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
-from .models import Question, Answer
+from .aggregates import update_daily_stats
+from .models import Question, Answer, local_today
+
+
+class QuestionField(serializers.PrimaryKeyRelatedField):
+    """
+        Вопрос по id; при массовой записи берётся из заранее загруженных вопросов (context["questions"])
+    """
+
+    def to_internal_value(self, data):
+        questions = self.context.get("questions")
+        if questions is None:
+            return super().to_internal_value(data)
+
+        try:
+            question = questions.get(int(data))
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+
+        if question is None:
+            self.fail("does_not_exist", pk_value=data)
+        return question
 
 
 class QuestionSerializer(serializers.ModelSerializer):
     """
         Сериализатор вопроса с текущим ответом пользователя (если есть за сегодня)
+
+        Ответы за сегодня передаются в context["today_answers"] словарём по id вопроса
     """
     user_answer = serializers.SerializerMethodField()
 
@@ -19,14 +42,15 @@ class QuestionSerializer(serializers.ModelSerializer):
         ]
 
     def get_user_answer(self, obj):
-        if not obj.user_answer_id:
+        answer = self.context.get("today_answers", {}).get(obj.id)
+        if answer is None:
             return None
 
         return {
-            "id": obj.user_answer_id,
-            "value_int": obj.user_value_int,
-            "value_text": obj.user_value_text,
-            "created_at": obj.user_answer_created_at,
+            "id": answer.id,
+            "value_int": answer.value_int,
+            "value_text": answer.value_text,
+            "created_at": answer.created_at,
         }
 
 
@@ -34,7 +58,7 @@ class AnswerWriteSerializer(serializers.Serializer):
     """
         Сериализатор для создания/обновления ответа
     """
-    question = serializers.PrimaryKeyRelatedField(queryset=Question.objects.all())
+    question = QuestionField(queryset=Question.objects.all())
     value_int = serializers.IntegerField(required=False, allow_null=True)
     value_text = serializers.CharField(required=False, allow_null=True, allow_blank=True)
 
@@ -87,36 +111,79 @@ class AnswerBulkSerializer(serializers.Serializer):
     value_int = serializers.IntegerField(required=False, allow_null=True)
     value_text = serializers.CharField(required=False, allow_null=True, allow_blank=True)
 
+    def to_internal_value(self, data):
+        # Все вопросы запроса загружаются одним запросом до валидации отдельных ответов
+        question_ids = set()
+        answers = data.get("answers") if isinstance(data, dict) else None
+        if isinstance(answers, list):
+            for item in answers:
+                if isinstance(item, dict):
+                    try:
+                        question_ids.add(int(item.get("question")))
+                    except (TypeError, ValueError):
+                        pass
+
+        self.context["questions"] = Question.objects.in_bulk(question_ids)
+        return super().to_internal_value(data)
+
     def create(self, validated_data):
+        """
+            Запись ответов за сегодня: один запрос за существующими ответами, один bulk_create и один bulk_update,
+            затем обновление дневных агрегатов (reflection.aggregates)
+
+            Одновременная повторная отправка упирается в ограничение unique_answer_per_local_day;
+            в этом случае запись повторяется, и уже созданные ответы обновляются.
+            Повтор, как и первая попытка, выполняется в своей транзакции: ответы записываются все или ни одного
+        """
+        try:
+            with transaction.atomic():
+                return self._save_answers(validated_data["answers"])
+        except IntegrityError:
+            with transaction.atomic():
+                return self._save_answers(validated_data["answers"])
+
+    def _save_answers(self, items):
         user = self.context["request"].user
-        today = now().date()
+        today = local_today()
+
+        existing = {
+            answer.question_id: answer
+            for answer in Answer.objects.filter(
+                user=user,
+                answer_date=today,
+                question_id__in=[item["question"].id for item in items]
+            )
+        }
 
         result = []
+        to_create = []
+        to_update = []
 
-        for item in validated_data["answers"]:
-            question = item["question"]
+        for item in items:
+            answer = existing.get(item["question"].id)
 
-            existing = Answer.objects.filter(
-                user=user,
-                question=question,
-                created_at__date=today
-            ).first()
-
-            if existing:
-                # update
-                existing.value_int = item.get("value_int")
-                existing.value_text = item.get("value_text")
-                existing.save()
-                result.append(existing)
+            if answer:
+                answer.value_int = item.get("value_int")
+                answer.value_text = item.get("value_text")
+                to_update.append(answer)
             else:
-                # create
-                obj = Answer.objects.create(
+                answer = Answer(
                     user=user,
-                    question=question,
+                    question=item["question"],
+                    answer_date=today,
                     value_int=item.get("value_int"),
                     value_text=item.get("value_text"),
                 )
-                result.append(obj)
+                to_create.append(answer)
+
+            result.append(answer)
+
+        if to_create:
+            Answer.objects.bulk_create(to_create)
+        if to_update:
+            Answer.objects.bulk_update(to_update, ["value_int", "value_text"])
+
+        update_daily_stats(user, today, result)
 
         return result
 
@@ -164,9 +231,9 @@ class AnswerHistoryItemSerializer(serializers.ModelSerializer):
 
 class QuestionHistorySerializer(serializers.ModelSerializer):
     """
-        Сериализатор истории вопросов с ответами пользователя
+        Сериализатор истории вопросов с ответами пользователя (описание ответа AnswerHistoryView)
     """
-    answers = serializers.SerializerMethodField()
+    answers = AnswerHistoryItemSerializer(many=True, read_only=True)
 
     class Meta:
         model = Question
@@ -177,7 +244,42 @@ class QuestionHistorySerializer(serializers.ModelSerializer):
             "answers",
         ]
 
-    def get_answers(self, obj):
-        answers_map = self.context["answers_map"]
-        answers = answers_map.get(obj.id, [])
-        return AnswerHistoryItemSerializer(answers, many=True).data
+
+class AnswerHistoryQuerySerializer(serializers.Serializer):
+    """
+        Параметры истории ответов: from и to (даты, включительно), question (список id вопросов)
+    """
+    question = serializers.ListField(child=serializers.IntegerField(), required=False)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        # from - ключевое слово Python, поэтому поля задаются здесь, а не атрибутами класса
+        fields["from"] = serializers.DateField(required=False)
+        fields["to"] = serializers.DateField(required=False)
+        return fields
+
+
+class AnswerStatsQuerySerializer(serializers.Serializer):
+    """
+        Параметры статистики: days - окно для минимума и максимума, question - список id вопросов
+    """
+    days = serializers.IntegerField(min_value=1, max_value=365, default=30)
+    question = serializers.ListField(child=serializers.IntegerField(), required=False)
+
+
+class QuestionStatsSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    text = serializers.CharField()
+    mean_7 = serializers.FloatField(allow_null=True)
+    mean_30 = serializers.FloatField(allow_null=True)
+    min = serializers.IntegerField(allow_null=True)
+    max = serializers.IntegerField(allow_null=True)
+    answered_days = serializers.IntegerField()
+
+
+class AnswerStatsSerializer(serializers.Serializer):
+    """
+        Статистика ответов пользователя: серия дней с ответами и показатели по вопросам с оценкой
+    """
+    streak = serializers.IntegerField()
+    questions = QuestionStatsSerializer(many=True)
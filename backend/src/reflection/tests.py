@@ -1,3 +1,151 @@
+import json
+from datetime import date
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from . import serializers, views
+from .models import Answer, DailyAnswerStat, Question
+
+
+class AnswerHistoryViewTest(TestCase):
+    """История ответов потоком: формат JSON, порядок вопросов и дней, фильтры, доступ"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='teacher')
+        self.choice = Question.objects.create(text="Оцените день", type=Question.QuestionType.CHOICE)
+        self.text = Question.objects.create(text="Что получилось?", type=Question.QuestionType.TEXT)
+
+        # Порядок вставки не совпадает с порядком выдачи
+        for question, day, value_int, value_text in [
+            (self.text, date(2026, 3, 2), None, "Прогулка"),
+            (self.choice, date(2026, 3, 2), 5, None),
+            (self.choice, date(2026, 3, 1), 3, None),
+            (self.text, date(2026, 3, 1), None, "Чтение"),
+        ]:
+            Answer.objects.create(
+                user=self.user, question=question, answer_date=day, value_int=value_int, value_text=value_text
+            )
+
+        other = User.objects.create_user(username='other')
+        Answer.objects.create(user=other, question=self.choice, answer_date=date(2026, 3, 1), value_int=1)
+
+    async def get(self, **params):
+        await self.async_client.aforce_login(self.user)
+        return await self.async_client.get('/api/reflection/answers-history/', params)
+
+    async def chunks(self, **params):
+        response = await self.get(**params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        # Под ASGI поток отдаётся без чтения в память целиком только из асинхронного итератора
+        self.assertTrue(response.is_async)
+        return [chunk async for chunk in response.streaming_content]
+
+    async def history(self, **params):
+        return json.loads(b"".join(await self.chunks(**params)))
+
+    def values(self, history):
+        return [
+            (question['id'], [answer['value_int'] or answer['value_text'] for answer in question['answers']])
+            for question in history
+        ]
+
+    async def test_format_and_ordering(self):
+        history = await self.history()
+
+        self.assertEqual(self.values(history), [
+            (self.choice.id, [3, 5]),
+            (self.text.id, ["Чтение", "Прогулка"]),
+        ])
+        self.assertEqual(set(history[0]), {'id', 'text', 'type', 'answers'})
+        self.assertEqual((history[0]['text'], history[0]['type']), ("Оцените день", "choice"))
+        self.assertEqual(set(history[0]['answers'][0]), {'value_int', 'value_text', 'created_at'})
+
+    async def test_filters(self):
+        self.assertEqual(self.values(await self.history(**{'from': '2026-03-02'})), [
+            (self.choice.id, [5]),
+            (self.text.id, ["Прогулка"]),
+        ])
+        self.assertEqual(self.values(await self.history(to='2026-03-01', question=[self.text.id])), [
+            (self.text.id, ["Чтение"]),
+        ])
+        self.assertEqual(await self.history(**{'from': '2026-04-01'}), [])
+
+    async def test_small_buffer_splits_stream(self):
+        with mock.patch.object(views, 'STREAM_BUFFER_SIZE', 16):
+            chunks = await self.chunks()
+
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(json.loads(b"".join(chunks)), await self.history())
+
+    async def test_invalid_params(self):
+        response = await self.get(**{'from': 'вчера'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_wsgi_stream_is_sync(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/api/reflection/answers-history/')
+
+        # Под WSGI асинхронный итератор Django прочитал бы в память целиком
+        self.assertFalse(response.is_async)
+        self.assertEqual(len(json.loads(b"".join(response.streaming_content))), 2)
+
+    def test_requires_authentication(self):
+        response = APIClient().get('/api/reflection/answers-history/')
+        self.assertEqual(response.status_code, 401)
+
+
+class AnswerBulkSaveTest(TestCase):
+    """Запись ответов за день: повтор после конфликта уникальности выполняется целиком или не выполняется"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='teacher')
+        self.questions = [
+            Question.objects.create(text=f"Вопрос {i}", type=Question.QuestionType.CHOICE) for i in range(2)
+        ]
+
+    def save(self):
+        # Без транзакции представления: сериализатор сам отвечает за целостность записи
+        serializer = serializers.AnswerBulkSerializer(
+            data={'answers': [{'question': question.id, 'value_int': 4} for question in self.questions]},
+            context={'request': SimpleNamespace(user=self.user)}
+        )
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+
+    def test_failed_retry_leaves_no_rows(self):
+        # Первая попытка упирается в параллельную отправку, повтор падает после записи ответов
+        errors = [IntegrityError("unique_answer_per_local_day"), RuntimeError("сбой")]
+
+        def fail(*args):
+            raise errors.pop(0)
+
+        with mock.patch.object(serializers, 'update_daily_stats', fail), self.assertRaises(RuntimeError):
+            self.save()
+
+        self.assertFalse(Answer.objects.exists())
+        self.assertFalse(DailyAnswerStat.objects.exists())
+
+    def test_retry_after_conflict(self):
+        calls = []
+        update_daily_stats = serializers.update_daily_stats
+
+        def conflict_once(*args):
+            calls.append(args)
+            if len(calls) == 1:
+                raise IntegrityError("unique_answer_per_local_day")
+            return update_daily_stats(*args)
+
+        with mock.patch.object(serializers, 'update_daily_stats', conflict_once):
+            answers = self.save()
 
-# Create your tests here.
+        self.assertEqual(len(answers), 2)
+        self.assertEqual(Answer.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(len(calls), 2)
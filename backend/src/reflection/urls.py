@@ -1,10 +1,11 @@
 from django.urls import path
 from .views import (
-    ActiveQuestionListView, AnswerBulkCreateView, AnswerHistoryView,
+    ActiveQuestionListView, AnswerBulkCreateView, AnswerHistoryView, AnswerStatsView,
 )
 
 urlpatterns = [
     path("questions/", ActiveQuestionListView.as_view(), name="active-questions"),
     path("answer/", AnswerBulkCreateView.as_view(), name="create-answer"),
     path("answers-history/", AnswerHistoryView.as_view(), name="user-answers"),
+    path("stats/", AnswerStatsView.as_view(), name="answer-stats"),
 ]
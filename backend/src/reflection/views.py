@@ -1,45 +1,39 @@
-from collections import defaultdict
-
 from django.db import transaction
-from django.db.models import OuterRef, Subquery
-from django.utils.timezone import now
+from django.http import StreamingHttpResponse
 
 from rest_framework import generics, permissions, status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
-from drf_spectacular.utils import extend_schema, OpenApiResponse, OpenApiExample
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiResponse, OpenApiExample
 
-from .models import Question, Answer
+from core.views import AsyncAPIViewMixin, streaming_content
+from .aggregates import answer_streak, question_stats
+from .models import Question, Answer, local_today
 from .serializers import (
     QuestionSerializer,
     AnswerBulkSerializer,
     AnswerSerializer,
     QuestionHistorySerializer,
+    AnswerHistoryItemSerializer,
+    AnswerHistoryQuerySerializer,
+    AnswerStatsQuerySerializer,
+    AnswerStatsSerializer,
 )
 
 
-class ActiveQuestionListView(generics.ListAPIView):
+class ActiveQuestionListView(AsyncAPIViewMixin, generics.ListAPIView):
     serializer_class = QuestionSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        current = now()
-
-        start = current.replace(hour=0, minute=0, second=0, microsecond=0)
-        end = current.replace(hour=23, minute=59, second=59, microsecond=999999)
-
-        user_answers = Answer.objects.filter(
-            user=self.request.user,
-            question=OuterRef("pk"),
-            created_at__range=(start, end)
-        ).order_by("-created_at")
-
-        return Question.objects.filter(is_active=True).annotate(
-            user_answer_id=Subquery(user_answers.values("id")[:1]),
-            user_value_int=Subquery(user_answers.values("value_int")[:1]),
-            user_value_text=Subquery(user_answers.values("value_text")[:1]),
-            user_answer_created_at=Subquery(user_answers.values("created_at")[:1]),
-        )
+        return Question.objects.filter(is_active=True)
+
+    async def get_today_answers(self):
+        # Один запрос за ответами пользователя за сегодня вместо подзапросов на каждый вопрос
+        answers = Answer.objects.filter(user=self.request.user, answer_date=local_today())
+        return {answer.question_id: answer async for answer in answers}
 
     @extend_schema(
         summary="Список активных вопросов",
@@ -76,8 +70,13 @@ class ActiveQuestionListView(generics.ListAPIView):
             )
         },
     )
-    def get(self, request, *args, **kwargs):
-        return super().get(request, *args, **kwargs)
+    async def get(self, request, *args, **kwargs):
+        context = self.get_serializer_context()
+        context["today_answers"] = await self.get_today_answers()
+
+        questions = [question async for question in self.get_queryset()]
+        serializer = self.get_serializer(questions, many=True, context=context)
+        return Response(serializer.data)
 
 
 class AnswerBulkCreateView(generics.GenericAPIView):
@@ -126,16 +125,65 @@ class AnswerBulkCreateView(generics.GenericAPIView):
         )
 
 
+HISTORY_CHUNK_SIZE = 500
+STREAM_BUFFER_SIZE = 64 * 1024
+
+
+def stream_history(questions, answers):
+    """
+        JSON истории по частям: вопросы по порядку, внутри каждого - его ответы
+
+        Ответы должны идти упорядоченными по вопросу; в памяти держится только буфер STREAM_BUFFER_SIZE.
+        Отдаётся через core.views.streaming_content
+    """
+    renderer = JSONRenderer()
+    item_serializer = AnswerHistoryItemSerializer()
+
+    buffer = bytearray(b"[")
+    current = None
+
+    for answer in answers:
+        if answer.question_id != current:
+            if current is not None:
+                buffer += b"]},"
+            current = answer.question_id
+            question = questions[current]
+            head = renderer.render({"id": question.id, "text": question.text, "type": question.type})
+            buffer += head[:-1] + b',"answers":['
+        else:
+            buffer += b","
+
+        buffer += renderer.render(item_serializer.to_representation(answer))
+
+        if len(buffer) >= STREAM_BUFFER_SIZE:
+            yield bytes(buffer)
+            buffer.clear()
+
+    if current is not None:
+        buffer += b"]}"
+    buffer += b"]"
+    yield bytes(buffer)
+
+
 class AnswerHistoryView(generics.GenericAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     @extend_schema(
         summary="История ответов пользователя",
         description=(
-                "Возвращает список вопросов, на которые пользователь когда-либо отвечал, "
-                "и список всех ответов по каждому вопросу."
+                "Возвращает список вопросов, на которые пользователь отвечал, "
+                "и список ответов по каждому вопросу.\n\n"
+                "Особенности:\n"
+                "- from и to (YYYY-MM-DD) ограничивают дни ответов, включительно\n"
+                "- question (можно несколько) ограничивает вопросы\n"
+                "- Ответ передаётся потоком: вопросы по возрастанию id, ответы по дням\n"
         ),
         tags=["Рефлексия"],
+        parameters=[
+            OpenApiParameter("from", OpenApiTypes.DATE, description="Первый день"),
+            OpenApiParameter("to", OpenApiTypes.DATE, description="Последний день"),
+            OpenApiParameter("question", int, many=True, description="id вопроса"),
+        ],
         responses={
             status.HTTP_200_OK: OpenApiResponse(
                 response=QuestionHistorySerializer(many=True),
@@ -167,24 +215,85 @@ class AnswerHistoryView(generics.GenericAPIView):
         },
     )
     def get(self, request):
-        user = request.user
+        params = AnswerHistoryQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        params = params.validated_data
 
-        answers = (Answer.objects.filter(user=user)
-                   .select_related("question")
-                   .order_by("created_at"))
+        answers = Answer.objects.filter(user=request.user)
+        if "from" in params:
+            answers = answers.filter(answer_date__gte=params["from"])
+        if "to" in params:
+            answers = answers.filter(answer_date__lte=params["to"])
+        if params.get("question"):
+            answers = answers.filter(question_id__in=params["question"])
 
-        questions_map = {}
-        answers_map = defaultdict(list)
+        questions = {
+            question.id: question
+            for question in Question.objects.filter(id__in=answers.values("question_id"))
+        }
 
-        for answer in answers:
-            q = answer.question
-            questions_map[q.id] = q
-            answers_map[q.id].append(answer)
+        rows = answers.only(
+            "question_id", "value_int", "value_text", "created_at"
+        ).order_by("question_id", "answer_date").iterator(chunk_size=HISTORY_CHUNK_SIZE)
 
-        serializer = QuestionHistorySerializer(
-            list(questions_map.values()),
-            many=True,
-            context={"answers_map": answers_map}
+        return StreamingHttpResponse(
+            streaming_content(request, stream_history(questions, rows)),
+            content_type="application/json"
         )
 
-        return Response(serializer.data)
+
+class AnswerStatsView(generics.GenericAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    @extend_schema(
+        summary="Статистика ответов пользователя",
+        description=(
+                "Возвращает текущую серию дней с ответами и показатели по вопросам с оценкой (choice).\n\n"
+                "Особенности:\n"
+                "- streak - дней подряд с ответами; если сегодня ответов ещё нет, серия считается до вчера\n"
+                "- mean_7 и mean_30 - средние оценки за последние 7 и 30 дней\n"
+                "- min, max и answered_days считаются за последние days дней (по умолчанию 30)\n"
+                "- question (можно несколько) ограничивает вопросы\n"
+        ),
+        tags=["Рефлексия"],
+        parameters=[
+            OpenApiParameter("days", int, description="Окно для min, max и answered_days, 1-365"),
+            OpenApiParameter("question", int, many=True, description="id вопроса"),
+        ],
+        responses={
+            status.HTTP_200_OK: OpenApiResponse(
+                response=AnswerStatsSerializer,
+                examples=[
+                    OpenApiExample(
+                        "Пример",
+                        value={
+                            "streak": 5,
+                            "questions": [
+                                {
+                                    "id": 1,
+                                    "text": "Оцените день",
+                                    "mean_7": 4.14,
+                                    "mean_30": 3.8,
+                                    "min": 2,
+                                    "max": 5,
+                                    "answered_days": 24
+                                }
+                            ]
+                        }
+                    )
+                ]
+            )
+        },
+    )
+    def get(self, request):
+        params = AnswerStatsQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        params = params.validated_data
+
+        today = local_today()
+        data = {
+            "streak": answer_streak(request.user, today),
+            "questions": question_stats(request.user, today, params["days"], params.get("question")),
+        }
+
+        return Response(AnswerStatsSerializer(data).data)
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class RouteConfig(AppConfig):
     name = 'route'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,50 @@
+# Generated by Django 6.0.1 on 2026-10-17 20:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('library', '0006_libraryfile_variants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Module',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=255)),
+                ('type', models.CharField(choices=[('theory', 'Теория'), ('practice', 'Практика'), ('reflection', 'Рефлексия')], max_length=20)),
+                ('order', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ModuleItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(choices=[('text', 'Текст'), ('file', 'Файл')], max_length=20)),
+                ('text', models.TextField(blank=True, null=True)),
+                ('order', models.PositiveIntegerField(default=0)),
+                ('library_file', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='library.libraryfile')),
+                ('module', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='route.module')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ModuleCompletion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('completed', models.BooleanField(default=False)),
+                ('module', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='route.module')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'module')},
+            },
+        ),
+    ]
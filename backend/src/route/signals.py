@@ -0,0 +1,25 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from library.models import Category, LibraryFile
+from . import snapshot
+from .models import Module, ModuleItem
+
+
+# Дерево модулей зависит от модулей, их элементов и файлов библиотеки, на которые ссылаются элементы
+@receiver(post_save, sender=Module)
+@receiver(post_delete, sender=Module)
+@receiver(post_save, sender=ModuleItem)
+@receiver(post_delete, sender=ModuleItem)
+@receiver(post_save, sender=LibraryFile)
+@receiver(post_delete, sender=LibraryFile)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_module_tree(sender, **kwargs):
+    snapshot.invalidate()
+
+
+@receiver(m2m_changed, sender=LibraryFile.categories.through)
+def invalidate_module_tree_categories(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        snapshot.invalidate()
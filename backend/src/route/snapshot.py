@@ -0,0 +1,89 @@
+import time
+from dataclasses import dataclass
+
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from rest_framework.renderers import JSONRenderer
+
+from core.query_plan import plan_queryset
+from .models import Module
+from .serializers import ModuleSerializer
+
+VERSION_KEY = "route:modules:version"
+SNAPSHOT_KEY = "route:modules:snapshot:{version}:{host}"
+
+# Версия хранится в общем кэше и меняется сигналами, поэтому бессрочна;
+# при недоступности общего кэша её срок ограничивает FALLBACK_TIMEOUT кэша
+VERSION_TIMEOUT = None
+SNAPSHOT_TIMEOUT = 60 * 60 * 24
+
+
+@dataclass
+class ModuleTreeSnapshot:
+    """
+        Материализованное дерево модулей
+
+        Поля:
+            - version (int): Версия дерева, меняется при любой правке модулей, элементов или файлов
+            - modules (bytes): Готовый JSON списка модулей
+            - details (dict[int, bytes]): Готовый JSON каждого модуля по его id
+    """
+    version: int
+    modules: bytes
+    details: dict
+
+    @property
+    def etag(self):
+        return f'"modules-{self.version}"'
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Версия из времени не повторяет ранее выданные ETag даже после потери кэша
+        version = time.time_ns() // 1000
+        if not cache.add(VERSION_KEY, version, VERSION_TIMEOUT):
+            version = cache.get(VERSION_KEY, version)
+    return version
+
+
+def invalidate():
+    """Смена версии дерева после фиксации транзакции с правкой"""
+    transaction.on_commit(lambda: cache.set(VERSION_KEY, time.time_ns() // 1000, VERSION_TIMEOUT))
+
+
+def build_snapshot(version, request):
+    """Сериализация дерева целиком; request нужен для абсолютных ссылок на файлы"""
+    renderer = JSONRenderer()
+    queryset = plan_queryset(Module.objects.order_by('order'), ModuleSerializer)
+    data = ModuleSerializer(queryset, many=True, context={"request": request}).data
+
+    return ModuleTreeSnapshot(
+        version=version,
+        modules=renderer.render(data),
+        details={module["id"]: renderer.render(module) for module in data},
+    )
+
+
+def get_snapshot(request):
+    version = get_version()
+    key = SNAPSHOT_KEY.format(version=version, host=request.get_host())
+
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_snapshot(version, request)
+        cache.set(key, snapshot, SNAPSHOT_TIMEOUT)
+    return snapshot
+
+
+def snapshot_response(request, snapshot, content):
+    """Ответ готовыми байтами с ETag; 304, если у клиента актуальная версия"""
+    if_none_match = request.headers.get("If-None-Match", "")
+    if snapshot.etag in [tag.strip() for tag in if_none_match.split(",")]:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(content, content_type="application/json")
+    response["ETag"] = snapshot.etag
+    response["Cache-Control"] = "private, no-cache"
+    return response
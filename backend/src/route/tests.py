@@ -1,3 +1,150 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.test import TestCase
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from library.models import Category, LibraryFile
+from .models import Module, ModuleItem
+
+
+class ModuleTreeQueryCountTest(TestCase):
+    """Дерево модулей загружается за постоянное число запросов"""
+
+    # модули, элементы (+ файл и автор через JOIN), категории файлов
+    EXPECTED_QUERIES = 3
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.categories = [Category.objects.create(name=f"Категория {i}") for i in range(3)]
+
+    def create_modules(self, count):
+        for i in range(count):
+            author = User.objects.create_user(username=f"author-{self.user.id}-{i}-{Module.objects.count()}")
+            module = Module.objects.create(title=f"Модуль {i}", type="theory", order=i)
+            ModuleItem.objects.create(module=module, type="text", text="Текст", order=0)
+            for j in range(2):
+                library_file = LibraryFile.objects.create(
+                    title=f"Материал {i}-{j}",
+                    file_type='document',
+                    author=author,
+                    file='library/test.pdf'
+                )
+                library_file.categories.set(self.categories)
+                ModuleItem.objects.create(module=module, type="file", library_file=library_file, order=j + 1)
+
+    def test_module_list_query_count_is_constant(self):
+        self.create_modules(2)
+        with self.assertNumQueries(self.EXPECTED_QUERIES):
+            response = self.client.get('/api/route/modules/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 2)
+
+        cache.clear()
+        self.create_modules(10)
+        with self.assertNumQueries(self.EXPECTED_QUERIES):
+            response = self.client.get('/api/route/modules/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 12)
+
+        file_item = response.json()[0]['items'][1]['library_file']
+        self.assertEqual(len(file_item['category_details']), 3)
+        self.assertTrue(file_item['author_name'].startswith('author-'))
+
+    def test_module_detail_query_count(self):
+        self.create_modules(3)
+        module = Module.objects.first()
+        with self.assertNumQueries(self.EXPECTED_QUERIES):
+            response = self.client.get(f'/api/route/modules/{module.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['items']), 3)
+
+
+class ModuleTreeSnapshotTest(TestCase):
+    """Дерево модулей отдаётся из снимка с ETag и пересобирается только после правок"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.module = Module.objects.create(title="Введение", type="theory", order=0)
+
+    def test_snapshot_served_without_queries(self):
+        response = self.client.get('/api/route/modules/')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/route/modules/')
+        self.assertEqual(response['ETag'], etag)
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/route/modules/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_edit_changes_version(self):
+        etag = self.client.get('/api/route/modules/')['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ModuleItem.objects.create(module=self.module, type="text", text="Новый текст", order=1)
+
+        response = self.client.get('/api/route/modules/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()[0]['items'][0]['text'], "Новый текст")
+
+    def test_related_edits_change_version(self):
+        author = User.objects.create_user(username='metodist')
+        library_file = LibraryFile.objects.create(
+            title="Памятка", file_type='document', author=author, file='library/test.pdf'
+        )
+        item = ModuleItem.objects.create(module=self.module, type="file", library_file=library_file, order=0)
+        category, other = Category.objects.create(name="Игры"), Category.objects.create(name="Чтение")
+        library_file.categories.add(other)
+
+        def rename_file():
+            library_file.title = "Новая памятка"
+            library_file.save()
+
+        def rename_category():
+            category.name = "Подвижные игры"
+            category.save()
+
+        def rename_module():
+            self.module.title = "Начало"
+            self.module.save()
+
+        edits = [
+            ("LibraryFile", rename_file),
+            ("categories add", lambda: library_file.categories.add(category)),
+            ("Category", rename_category),
+            ("categories remove", lambda: library_file.categories.remove(other)),
+            # Удаление категории снимает её с файла без сигнала m2m_changed
+            ("Category delete", category.delete),
+            ("Module", rename_module),
+            ("ModuleItem delete", item.delete),
+            ("Module delete", self.module.delete),
+        ]
+        for name, edit in edits:
+            with self.subTest(edit=name):
+                before = self.client.get('/api/route/modules/')
+                with self.captureOnCommitCallbacks(execute=True):
+                    edit()
+
+                after = self.client.get('/api/route/modules/', HTTP_IF_NONE_MATCH=before['ETag'])
+                self.assertEqual(after.status_code, 200)
+                self.assertNotEqual(after['ETag'], before['ETag'])
+                self.assertNotEqual(after.content, before.content)
+
+    def test_detail(self):
+        response = self.client.get(f'/api/route/modules/{self.module.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['title'], "Введение")
+
+        with self.assertNumQueries(0):
+            response = self.client.get(f'/api/route/modules/{self.module.id}/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get('/api/route/modules/999999/').status_code, 404)
@@ -1,11 +1,15 @@
+from asgiref.sync import sync_to_async
+from django.http import Http404
 from django.shortcuts import get_object_or_404
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import OpenApiResponse, OpenApiExample, extend_schema
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
+
+from core.query_plan import QueryPlanMixin
+from core.views import AsyncAPIViewMixin
+from . import snapshot
 from .models import Module, ModuleCompletion
 from .serializers import ModuleSerializer, ModuleCompletionSerializer
 
@@ -89,12 +93,20 @@ NOT_FOUND_COMPLETION_RESPONSE = OpenApiResponse(
         status.HTTP_401_UNAUTHORIZED: UNAUTHORIZED_RESPONSE
     }
 )
-@method_decorator(cache_page(120), name='dispatch')
-class ModuleListView(generics.ListAPIView):
-    queryset = Module.objects.all().order_by('order').prefetch_related('items__library_file')
+class ModuleListView(AsyncAPIViewMixin, QueryPlanMixin, generics.ListAPIView):
+    """
+        Дерево модулей отдаётся из версионного снимка (route.snapshot):
+        ORM не используется, пока модули и файлы не изменились, а клиент с актуальным ETag получает 304
+    """
+    queryset = Module.objects.all().order_by('order')
     serializer_class = ModuleSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    async def get(self, request, *args, **kwargs):
+        # Снимок почти всегда берётся из кэша; сборка при промахе остаётся синхронной
+        tree = await sync_to_async(snapshot.get_snapshot)(request)
+        return snapshot.snapshot_response(request, tree, tree.modules)
+
 
 @extend_schema(
     summary="Получение конкретного модуля",
@@ -133,12 +145,18 @@ class ModuleListView(generics.ListAPIView):
         status.HTTP_404_NOT_FOUND: NOT_FOUND_MODULE_RESPONSE
     }
 )
-@method_decorator(cache_page(120), name='dispatch')
-class ModuleDetailView(generics.RetrieveAPIView):
-    queryset = Module.objects.all().prefetch_related('items__library_file')
+class ModuleDetailView(QueryPlanMixin, generics.RetrieveAPIView):
+    queryset = Module.objects.all()
     serializer_class = ModuleSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    def retrieve(self, request, *args, **kwargs):
+        tree = snapshot.get_snapshot(request)
+        content = tree.details.get(kwargs['pk'])
+        if content is None:
+            raise Http404
+        return snapshot.snapshot_response(request, tree, content)
+
 
 @extend_schema(
     summary="Список выполненных модулей",
@@ -0,0 +1,19 @@
+# Generated by Django 6.0.1 on 2026-10-17 19:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0006_libraryfile_variants'),
+        ('users', '0002_profile_photo_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='favorites',
+            field=models.ManyToManyField(blank=True, related_name='favorited', to='library.libraryfile'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0.1 on 2026-10-17 21:20
+
+import users.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_profile_favorites'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='profile',
+            name='photo',
+            field=models.ImageField(blank=True, null=True, upload_to='profiles/', validators=[users.models.validate_image, users.models.validate_size], verbose_name='Фото профиля'),
+        ),
+    ]
@@ -1,17 +1,23 @@
 from PIL import Image
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
 from rest_framework.exceptions import ValidationError
 
+from core.authentication import invalidate_token, invalidate_user_tokens
+
 
 def validate_image(file):
+    # Только заголовок: полностью файл декодирует фоновая обработка (media.processing),
+    # некорректное фото она удаляет из профиля
     try:
         img = Image.open(file)
-        img.verify()
     except Exception:
         raise ValidationError("Некорректное изображение")
+    finally:
+        file.seek(0)
 
     if img.format not in ['JPEG', 'PNG']:
         raise ValidationError("Разрешены только JPEG и PNG")
@@ -41,6 +47,8 @@ class Profile(models.Model):
         null=True,
         blank=True
     )
+    # Пути WebP-вариантов фото {"thumb": ..., "medium": ...}, заполняются media.processing
+    photo_variants = models.JSONField(default=dict, blank=True, editable=False)
 
     favorites = models.ManyToManyField(
         'library.LibraryFile',
@@ -51,6 +59,12 @@ class Profile(models.Model):
     def __str__(self):
         return f"{self.full_name}"
 
+    def save(self, *args, **kwargs):
+        # Обработчики pre_save/post_save (перенос сводок monitoring) выполняются
+        # в одной транзакции с записью профиля
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
 
 # Сигналы, связывающие Profile с User
 @receiver(post_save, sender=User)
@@ -62,3 +76,16 @@ def create_user_profile(sender, instance, created, **kwargs):
 @receiver(post_save, sender=User)
 def save_user_profile(sender, instance, **kwargs):
     instance.profile.save()
+
+
+# Сброс кэша аутентификации по токену (core.authentication)
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=Profile)
+def invalidate_profile_tokens(sender, instance, **kwargs):
+    # После фиксации: иначе параллельный запрос успел бы закэшировать прежний профиль
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate_user_tokens(user_id))
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Profile
+from media.processing import variant_urls
+from .models import Profile, validate_image, validate_size
 
 
 class ProfileSerializer(serializers.ModelSerializer):
@@ -10,9 +11,16 @@ class ProfileSerializer(serializers.ModelSerializer):
     #     slug_field='slug'
     # )
 
+    # FileField вместо ImageField: полная проверка изображения (verify) - в фоновой обработке
+    photo = serializers.FileField(validators=[validate_image, validate_size], required=False, allow_null=True)
+    photo_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = Profile
-        fields = ['full_name', 'position', 'organization', 'photo']
+        fields = ['full_name', 'position', 'organization', 'photo', 'photo_variants']
+
+    def get_photo_variants(self, obj) -> dict:
+        return variant_urls(obj.photo_variants, self.context.get('request'))
 
 
 class UserSerializer(serializers.ModelSerializer):